@@ -0,0 +1,96 @@
+"""
+HTTP/JSON 接口服务吞吐量基准
+在当前进程中启动 SoilApiServer（随机端口），用多个保持连接的客户端并发发送 /recommend 请求，
+报告每秒请求数、每秒样本数和延迟分位数；--batch 大于 1 时每个请求批量提交多个样本。
+
+样本取自合成数据，--distinct 控制不同样本的数量（较小时评估缓存命中率高，接近重复查询的场景）。
+
+用法：
+    python benchmarks/bench_api.py [--requests 5000] [--connections 32] [--batch 1] [--distinct 500]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cotton_api import SoilApiServer  # noqa: E402
+from synthetic import synthetic_samples  # noqa: E402
+
+
+def build_bodies(distinct, batch):
+    samples = [
+        {"id": str(sample_id), "region": region, "area_mu": area_mu, "measurements": measurements}
+        for sample_id, region, area_mu, measurements in synthetic_samples(distinct)
+    ]
+    if batch <= 1:
+        return [json.dumps(s, ensure_ascii=False).encode("utf-8") for s in samples]
+    return [
+        json.dumps({"samples": [samples[(i + j) % distinct] for j in range(batch)]}, ensure_ascii=False).encode("utf-8")
+        for i in range(0, distinct, batch)
+    ]
+
+
+async def client(port, bodies, offset, count, latencies):
+    """单个保持连接的客户端：顺序发送 count 个请求"""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        for i in range(count):
+            body = bodies[(offset + i) % len(bodies)]
+            start = time.perf_counter()
+            writer.write(b"POST /recommend HTTP/1.1\r\nHost: bench\r\nContent-Type: application/json\r\n"
+                         b"Content-Length: " + str(len(body)).encode() + b"\r\n\r\n" + body)
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = next(int(line.split(b":")[1]) for line in head.split(b"\r\n")
+                          if line.lower().startswith(b"content-length"))
+            await reader.readexactly(length)
+            if not head.startswith(b"HTTP/1.1 200"):
+                raise RuntimeError(head.split(b"\r\n")[0].decode())
+            latencies.append(time.perf_counter() - start)
+    finally:
+        writer.close()
+
+
+async def run(args):
+    server = await SoilApiServer("127.0.0.1", 0, args.threads, args.max_concurrency).start()
+    bodies = build_bodies(args.distinct, args.batch)
+    try:
+        # 预热：每个请求体发送一次（填充评估缓存）
+        await client(server.port, bodies, 0, len(bodies), [])
+        latencies = []
+        per_client = max(1, args.requests // args.connections)
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            client(server.port, bodies, i * per_client, per_client, latencies) for i in range(args.connections)
+        ))
+        elapsed = time.perf_counter() - start
+    finally:
+        await server.close()
+
+    latencies.sort()
+    total = len(latencies)
+    print(f"请求 {total} 个，连接 {args.connections} 个，每请求 {args.batch} 个样本，"
+          f"计算线程 {args.threads}，并发上限 {args.max_concurrency}")
+    print(f"吞吐量：{total / elapsed:.0f} 请求/秒，{total * args.batch / elapsed:.0f} 样本/秒")
+    for q in (0.5, 0.9, 0.99):
+        print(f"延迟 p{int(q * 100)}：{latencies[min(total - 1, int(q * total))] * 1000:.2f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HTTP/JSON 接口服务吞吐量基准")
+    parser.add_argument("--requests", type=int, default=5000, help="请求总数（默认 5000）")
+    parser.add_argument("--connections", type=int, default=32, help="并发连接数（默认 32）")
+    parser.add_argument("--batch", type=int, default=1, help="每个请求的样本数（默认 1）")
+    parser.add_argument("--distinct", type=int, default=500, help="不同样本数（默认 500）")
+    parser.add_argument("--threads", type=int, default=4, help="服务计算线程数（默认 4）")
+    parser.add_argument("--max-concurrency", type=int, default=64, help="服务并发上限（默认 64）")
+    args = parser.parse_args(argv)
+    asyncio.run(run(args))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
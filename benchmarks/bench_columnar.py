@@ -0,0 +1,76 @@
+"""
+列式评估结果内存基准
+比较保存 N 个样本评估结果的内存占用（tracemalloc 统计的 Python 分配量）：
+    字典列表     每个样本保留 evaluate_soil 结果 + 综合建议（批量任务原来的保存方式）
+    仅评估字典   每个样本只保留 evaluate_soil 结果
+    列式         ColumnarResults（建议和报告在展示/导出时按需生成）
+
+用法：
+    python benchmarks/bench_columnar.py [--samples 100000]
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cotton_columnar import ColumnarResults  # noqa: E402
+from cotton_core import evaluate_soil, generate_comprehensive_recommendations  # noqa: E402
+from synthetic import iter_synthetic_samples  # noqa: E402
+
+
+def build_dicts(count, seed, with_recommendations):
+    output = []
+    for sample_id, region, area_mu, measurements in iter_synthetic_samples(count, seed):
+        results = evaluate_soil(measurements, region)
+        recs = generate_comprehensive_recommendations(results, region, area_mu) if with_recommendations else None
+        output.append((sample_id, region, area_mu, results, recs))
+    return output
+
+
+def build_columnar(count, seed):
+    return ColumnarResults.from_samples(iter_synthetic_samples(count, seed))
+
+
+def measure(build, *args):
+    """返回 (保留的内存 MB, 构建耗时 s)"""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build(*args)
+    elapsed = time.perf_counter() - start
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    gc.collect()
+    return retained / 1024 / 1024, elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="列式评估结果内存基准")
+    parser.add_argument("--samples", type=int, default=100000, help="样本数（默认 100000）")
+    parser.add_argument("--seed", type=int, default=42, help="合成样本随机种子（默认 42）")
+    args = parser.parse_args(argv)
+
+    columnar = build_columnar(args.samples, args.seed)
+    print(f"{args.samples} 个样本，{len(columnar)} 条检测结果（构建耗时含 tracemalloc 开销）")
+    cases = [
+        ("字典列表（评估+建议）", build_dicts, True),
+        ("仅评估字典", build_dicts, False),
+        ("列式 ColumnarResults", build_columnar, None),
+    ]
+    baseline = None
+    for label, build, with_recommendations in cases:
+        build_args = (args.samples, args.seed) + ((with_recommendations,) if with_recommendations is not None else ())
+        megabytes, elapsed = measure(build, *build_args)
+        baseline = baseline or megabytes
+        print(f"  {label:<24}{megabytes:>10.1f} MB  {megabytes * 1024 * 1024 / len(columnar):>8.0f} 字节/条  "
+              f"{baseline / megabytes:>6.1f}x  构建 {elapsed:.2f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
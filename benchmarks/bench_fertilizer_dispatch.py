@@ -0,0 +1,156 @@
+"""
+肥料用量计算微基准：预编译养分索引 vs 逐次字符串匹配
+
+legacy_* 为改造前的实现（养分名称子串判断 + 线性扫描 FERTILIZER_CONTENT），
+仅用于对比；两者在氮、磷、钾、有机质上的计算结果应完全一致。
+
+用法：
+    python benchmarks/bench_fertilizer_dispatch.py [--number 200000]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cotton_core import FertilizerCalculator  # noqa: E402
+
+
+def legacy_calculate_fertilizer_amount(deficiency_info, fertilizer_type, area_mu=1.0):
+    """改造前的 calculate_fertilizer_amount"""
+    calc = FertilizerCalculator
+    if deficiency_info["deficiency_kg_per_mu"] <= 0:
+        return {"fertilizer": fertilizer_type, "amount_per_mu": 0, "total_amount": 0,
+                "unit": "kg", "status": "无需补充"}
+    nutrient_name = deficiency_info["nutrient"]
+    if "氮" in nutrient_name:
+        nutrient_symbol, utilization = "N", calc.UTILIZATION_RATE["N"]
+    elif "磷" in nutrient_name:
+        nutrient_symbol, utilization = "P2O5", calc.UTILIZATION_RATE["P"]
+    elif "钾" in nutrient_name:
+        nutrient_symbol, utilization = "K2O", calc.UTILIZATION_RATE["K"]
+    elif "有机质" in nutrient_name:
+        nutrient_symbol, utilization = "有机质", calc.UTILIZATION_RATE["有机质"]
+    else:
+        nutrient_symbol, utilization = nutrient_name.split()[0], calc.UTILIZATION_RATE["微量元素"]
+    if fertilizer_type not in calc.FERTILIZER_CONTENT:
+        return {"error": "未知肥料类型"}
+    fertilizer = calc.FERTILIZER_CONTENT[fertilizer_type]
+    content = None
+    for key in fertilizer:
+        if key == nutrient_symbol or (nutrient_symbol in key):
+            content = fertilizer[key] / 100
+            break
+    if content is None:
+        if "有机" in fertilizer_type and "有机质" in nutrient_name:
+            content = fertilizer.get("有机质", 0.45) / 100
+        else:
+            return {"error": f"肥料{fertilizer_type}不含所需养分{nutrient_symbol}"}
+    deficiency_kg_per_mu = deficiency_info["deficiency_kg_per_mu"]
+    theoretical_amount_per_mu = deficiency_kg_per_mu / content
+    actual_amount_per_mu = theoretical_amount_per_mu / utilization
+    if deficiency_info["grade"] in ["极缺", "极低"]:
+        actual_amount_per_mu *= 1.2
+    elif deficiency_info["grade"] in ["缺", "低"]:
+        actual_amount_per_mu *= 1.0
+    else:
+        actual_amount_per_mu *= 0.8
+    total_amount = actual_amount_per_mu * area_mu
+    return {
+        "fertilizer": fertilizer_type,
+        "content": f"{fertilizer_type}含{nutrient_symbol} {fertilizer.get(nutrient_symbol, fertilizer.get('有机质', 0))}%",
+        "deficiency_per_mu": round(deficiency_kg_per_mu, 3),
+        "theoretical_per_mu": round(theoretical_amount_per_mu, 2),
+        "actual_per_mu": round(actual_amount_per_mu, 2),
+        "total_amount": round(total_amount, 2),
+        "unit": "kg",
+        "area": area_mu,
+        "utilization_rate": f"{utilization*100}%",
+    }
+
+
+def legacy_fertilizer_options(item_name):
+    """改造前 generate_comprehensive_recommendations 中的候选肥料选择"""
+    if "氮" in item_name:
+        return ["尿素", "磷酸二铵"]
+    elif "磷" in item_name:
+        return ["磷酸二铵", "过磷酸钙"]
+    elif "钾" in item_name:
+        return ["氯化钾", "硫酸钾"]
+    elif "锌" in item_name:
+        return ["硫酸锌"]
+    elif "硼" in item_name:
+        return ["硼砂"]
+    elif "锰" in item_name:
+        return ["硫酸锰"]
+    elif "铁" in item_name:
+        return ["硫酸亚铁"]
+    elif "铜" in item_name:
+        return ["硫酸铜"]
+    elif "钼" in item_name:
+        return ["钼酸铵"]
+    elif "有机质" in item_name:
+        return ["有机肥"]
+    return []
+
+
+def compiled_fertilizer_options(item_name):
+    entry = FertilizerCalculator.NUTRIENT_INDEX.get(item_name)
+    return entry["fertilizers"] if entry else ()
+
+
+# 每个养分取一个缺乏样例；微量元素在改造前会因符号取成中文名而直接返回错误，
+# 不具可比性，计时只使用前四个（氮、磷、钾、有机质）
+CASES = [
+    (FertilizerCalculator.calculate_deficiency(name, value), fert)
+    for name, value, fert in [
+        ("碱解氮 ppm", 45.0, "磷酸二铵"),
+        ("有效磷 ppm", 6.0, "过磷酸钙"),
+        ("速效钾 ppm", 120.0, "硫酸钾"),
+        ("有机质 g/kg", 11.0, "有机肥"),
+        ("锌 Zn (mg/kg)", 0.4, "硫酸锌"),
+        ("钼 Mo (mg/kg)", 0.05, "钼酸铵"),
+    ]
+]
+
+
+TIMED_CASES = CASES[:4]
+
+
+def run_amount(func):
+    for info, fert in TIMED_CASES:
+        func(info, fert, 10.0)
+
+
+def run_options(func):
+    for info, _ in TIMED_CASES:
+        func(info["nutrient"])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="预编译养分索引微基准")
+    parser.add_argument("--number", type=int, default=200000, help="每项调用次数（默认 200000）")
+    args = parser.parse_args(argv)
+
+    # 宏量养分与有机质的结果应与改造前完全一致
+    for info, fert in TIMED_CASES:
+        assert FertilizerCalculator.calculate_fertilizer_amount(info, fert, 10.0) == \
+            legacy_calculate_fertilizer_amount(info, fert, 10.0)
+
+    loops = max(1, args.number // len(TIMED_CASES))
+    calls = loops * len(TIMED_CASES)
+    print(f"{'项目':<28}{'改造前(µs/次)':>14}{'预编译(µs/次)':>14}{'加速比':>8}")
+    for label, runner, legacy, compiled in [
+        ("calculate_fertilizer_amount", run_amount,
+         legacy_calculate_fertilizer_amount, FertilizerCalculator.calculate_fertilizer_amount),
+        ("候选肥料选择", run_options, legacy_fertilizer_options, compiled_fertilizer_options),
+    ]:
+        before = min(timeit.repeat(lambda: runner(legacy), number=loops, repeat=3)) / calls * 1e6
+        after = min(timeit.repeat(lambda: runner(compiled), number=loops, repeat=3)) / calls * 1e6
+        print(f"{label:<28}{before:>14.3f}{after:>14.3f}{before / after:>8.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
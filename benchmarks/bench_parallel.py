@@ -0,0 +1,97 @@
+"""
+多进程并行评估的扩展效率基准
+对同一批合成样本，分别以单进程（当前进程内逐个计算）和不同进程数运行
+评估 → 建议 → 报告渲染，报告吞吐量、加速比和扩展效率（加速比 / 进程数）。
+--cli 时改为端到端测量命令行批处理 run_batch（逐块读表、评估、写出明细和 reports.zip），
+可检查读取块大小（--read-chunk）是否限制了同时工作的进程数。
+
+用法：
+    python benchmarks/bench_parallel.py [--samples 50000] [--workers 1,2,4,8,16,32] [--chunk-size 1000]
+    python benchmarks/bench_parallel.py --cli --samples 200000 --read-chunk 10000 --chunk-size 1000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cotton_cli import run_batch  # noqa: E402
+from cotton_parallel import ParallelAssessor, _assess_shard  # noqa: E402
+from synthetic import synthetic_frame, synthetic_samples  # noqa: E402
+
+
+def cli_scaling(sample_count, worker_counts, chunk_size, read_chunk, report_format):
+    """命令行批处理的端到端扩展效率（包含读表、写出和进程池启动）"""
+    with tempfile.TemporaryDirectory() as tmp:
+        input_path = os.path.join(tmp, "samples.csv")
+        synthetic_frame(sample_count).to_csv(input_path, index=False)
+        print(f"run_batch：样本数 {sample_count}，读取块 {read_chunk}，分发块 {chunk_size}")
+
+        def run(workers):
+            start = time.perf_counter()
+            run_batch(input_path, os.path.join(tmp, f"out{workers}"), chunksize=read_chunk, id_column="样本编号",
+                      report_format=report_format, zip_reports=True, workers=workers, parallel_chunk=chunk_size)
+            return time.perf_counter() - start
+
+        serial = run(1)
+        print(f"\n{'进程数':>6}{'耗时(s)':>10}{'样本/秒':>12}{'加速比':>8}{'效率':>8}")
+        print(f"{'串行':>6}{serial:>10.2f}{sample_count / serial:>12.0f}{1.0:>8.2f}{'-':>8}")
+        for workers in worker_counts:
+            if workers == 1:
+                continue
+            elapsed = run(workers)
+            speedup = serial / elapsed
+            print(f"{workers:>6}{elapsed:>10.2f}{sample_count / elapsed:>12.0f}{speedup:>8.2f}{speedup / workers:>8.0%}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="多进程并行评估扩展效率基准")
+    parser.add_argument("--samples", type=int, default=50000, help="样本数（默认 50000）")
+    parser.add_argument("--workers", default=None,
+                        help="逗号分隔的进程数列表（默认 1,2,4,... 直到 CPU 核数）")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="每块样本数（默认 1000）")
+    parser.add_argument("--report-format", default="text", help="渲染的报告格式（默认 text）")
+    parser.add_argument("--cli", action="store_true", help="端到端测量命令行批处理 run_batch")
+    parser.add_argument("--read-chunk", type=int, default=10000, help="--cli 时每块读取的样本数（默认 10000）")
+    args = parser.parse_args(argv)
+
+    cpu_count = os.cpu_count() or 1
+    if args.workers:
+        worker_counts = [int(w) for w in args.workers.split(",")]
+    else:
+        worker_counts = [1]
+        while worker_counts[-1] * 2 <= cpu_count:
+            worker_counts.append(worker_counts[-1] * 2)
+        if worker_counts[-1] != cpu_count:
+            worker_counts.append(cpu_count)
+
+    if args.cli:
+        cli_scaling(args.samples, worker_counts, args.chunk_size, args.read_chunk, args.report_format)
+        return 0
+
+    samples = synthetic_samples(args.samples)
+    print(f"样本数 {args.samples}，CPU 核数 {cpu_count}，块大小 {args.chunk_size}")
+
+    # 单进程基准：与子进程执行同样的计算
+    start = time.perf_counter()
+    _assess_shard(samples, args.report_format)
+    serial = time.perf_counter() - start
+    print(f"\n{'进程数':>6}{'耗时(s)':>10}{'样本/秒':>12}{'加速比':>8}{'效率':>8}")
+    print(f"{'串行':>6}{serial:>10.2f}{args.samples / serial:>12.0f}{1.0:>8.2f}{'-':>8}")
+
+    for workers in worker_counts:
+        with ParallelAssessor(workers, args.chunk_size, args.report_format) as assessor:
+            # 预热：启动全部子进程，避免把进程创建时间计入
+            list(assessor.map(samples[:workers]))
+            start = time.perf_counter()
+            count = sum(1 for _ in assessor.map(samples))
+            elapsed = time.perf_counter() - start
+        speedup = serial / elapsed
+        print(f"{workers:>6}{elapsed:>10.2f}{count / elapsed:>12.0f}{speedup:>8.2f}{speedup / workers:>8.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,211 @@
+"""
+评估流程基准套件
+使用合成样本（北疆/南疆两个区域、全部检测项目）测量计算核心各阶段：
+    evaluate_soil、calculate_deficiency、calculate_fertilizer_amount、
+    generate_comprehensive_recommendations、export_comprehensive_advice
+输出各阶段单次调用的延迟分位数、不同样本规模下整条流程（不经评估缓存）的吞吐量和峰值内存，
+可保存为基线 JSON，之后与基线比较，超出容差时以退出码 1 结束，便于在部署前发现性能回退。
+
+用法：
+    python benchmarks/bench_pipeline.py                                  # 默认 1k/100k/1M
+    python benchmarks/bench_pipeline.py --sizes 1k,100k --save-baseline baseline.json
+    python benchmarks/bench_pipeline.py --sizes 1k,100k --compare baseline.json --tolerance 0.15
+
+峰值内存用 tracemalloc 在单独一轮中测量（tracemalloc 会拖慢执行，不计入吞吐量），--skip-memory 可跳过。
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cotton_core import (  # noqa: E402
+    FertilizerCalculator,
+    current_knowledge_base,
+    evaluate_soil,
+    export_comprehensive_advice,
+    generate_comprehensive_recommendations,
+)
+from synthetic import iter_synthetic_samples, synthetic_samples  # noqa: E402
+
+STAGES = (
+    "evaluate_soil",
+    "calculate_deficiency",
+    "calculate_fertilizer_amount",
+    "generate_comprehensive_recommendations",
+    "export_comprehensive_advice",
+)
+
+PERCENTILES = (50, 90, 99)
+
+
+def parse_size(text):
+    """解析 1k / 100k / 1M 形式的样本数"""
+    text = text.strip().lower()
+    factor = {"k": 1000, "m": 1000000}.get(text[-1:], 1)
+    return int(float(text.rstrip("km")) * factor)
+
+
+def percentile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q / 100))]
+
+
+def run_pipeline(samples):
+    """完整流程：评估 → 综合建议（含缺乏量和肥料用量计算）→ 方案文本"""
+    count = 0
+    for _, region, area_mu, measurements in samples:
+        results = evaluate_soil(measurements, region)
+        recs = generate_comprehensive_recommendations(results, region, area_mu)
+        export_comprehensive_advice(region, recs, area_mu)
+        count += 1
+    return count
+
+
+def measure_stage_latency(samples):
+    """逐个调用各阶段并计时，返回 {阶段: 排序后的单次耗时列表（微秒）}"""
+    timer = time.perf_counter_ns
+    latencies = {stage: [] for stage in STAGES}
+    calc = FertilizerCalculator
+    for _, region, area_mu, measurements in samples:
+        start = timer()
+        results = evaluate_soil(measurements, region)
+        latencies["evaluate_soil"].append(timer() - start)
+
+        for item in results:
+            start = timer()
+            info = calc.calculate_deficiency(item["检测项目"], item["检测数值"], region)
+            latencies["calculate_deficiency"].append(timer() - start)
+            if info["deficiency_kg_per_mu"] > 0:
+                for fertilizer in calc.NUTRIENT_INDEX[item["检测项目"]]["fertilizers"]:
+                    start = timer()
+                    calc.calculate_fertilizer_amount(info, fertilizer, area_mu, region)
+                    latencies["calculate_fertilizer_amount"].append(timer() - start)
+
+        start = timer()
+        recs = generate_comprehensive_recommendations(results, region, area_mu)
+        latencies["generate_comprehensive_recommendations"].append(timer() - start)
+
+        start = timer()
+        export_comprehensive_advice(region, recs, area_mu)
+        latencies["export_comprehensive_advice"].append(timer() - start)
+    return {stage: sorted(v / 1000 for v in values) for stage, values in latencies.items()}
+
+
+def measure_throughput(size, seed):
+    """整条流程的吞吐量（样本/秒）；样本逐个生成，生成耗时单独扣除"""
+    start = time.perf_counter()
+    for _ in iter_synthetic_samples(size, seed):
+        pass
+    generate_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    run_pipeline(iter_synthetic_samples(size, seed))
+    elapsed = time.perf_counter() - start - generate_time
+    return size / max(elapsed, 1e-9)
+
+
+def measure_peak_memory(size, seed):
+    """整条流程运行期间 Python 分配的峰值内存（MB）"""
+    tracemalloc.start()
+    try:
+        run_pipeline(iter_synthetic_samples(size, seed))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 1024 / 1024
+
+
+def compare(current, baseline, tolerance):
+    """与基线比较，返回回退项说明列表（延迟、内存变大或吞吐量变小超过容差）"""
+    regressions = []
+    print(f"\n与基线比较（容差 {tolerance:.0%}）：")
+    checks = []
+    for stage, stats in current["latency_us"].items():
+        for key in ("p50", "p90"):
+            if stage in baseline.get("latency_us", {}):
+                checks.append((f"{stage} {key}", stats[key], baseline["latency_us"][stage][key], True))
+    for size, value in current["throughput"].items():
+        if size in baseline.get("throughput", {}):
+            checks.append((f"吞吐量 {size}", value, baseline["throughput"][size], False))
+    for size, value in current.get("peak_memory_mb", {}).items():
+        if size in baseline.get("peak_memory_mb", {}):
+            checks.append((f"峰值内存 {size}", value, baseline["peak_memory_mb"][size], True))
+
+    for label, value, base, lower_is_better in checks:
+        change = (value - base) / base if base else 0.0
+        worse = change > tolerance if lower_is_better else change < -tolerance
+        mark = "  ← 回退" if worse else ""
+        print(f"  {label:<48}{base:>12.2f} → {value:>12.2f}  ({change:+.1%}){mark}")
+        if worse:
+            regressions.append(label)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="评估流程基准套件")
+    parser.add_argument("--sizes", default="1k,100k,1M", help="逗号分隔的吞吐量测试样本数（默认 1k,100k,1M）")
+    parser.add_argument("--latency-samples", type=int, default=5000, help="测量分阶段延迟的样本数（默认 5000）")
+    parser.add_argument("--seed", type=int, default=42, help="合成样本随机种子（默认 42）")
+    parser.add_argument("--skip-memory", action="store_true", help="不测量峰值内存")
+    parser.add_argument("--save-baseline", metavar="PATH", help="将结果保存为基线 JSON")
+    parser.add_argument("--compare", metavar="PATH", help="与基线 JSON 比较")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="允许的性能变化比例（默认 0.15）")
+    args = parser.parse_args(argv)
+
+    sizes = [parse_size(s) for s in args.sizes.split(",") if s.strip()]
+    print(f"Python {platform.python_version()}，知识库版本 {current_knowledge_base().version}")
+
+    # 预热
+    run_pipeline(synthetic_samples(200, args.seed + 1))
+
+    latency = measure_stage_latency(synthetic_samples(args.latency_samples, args.seed))
+    print(f"\n分阶段延迟（µs/次，{args.latency_samples} 个样本）：")
+    print(f"  {'阶段':<44}{'调用次数':>10}" + "".join(f"{'p' + str(q):>10}" for q in PERCENTILES) + f"{'平均':>10}")
+    latency_stats = {}
+    for stage, values in latency.items():
+        stats = {f"p{q}": percentile(values, q) for q in PERCENTILES}
+        stats["mean"] = sum(values) / len(values)
+        stats["calls"] = len(values)
+        latency_stats[stage] = stats
+        print(f"  {stage:<44}{len(values):>10}" + "".join(f"{stats[f'p{q}']:>10.2f}" for q in PERCENTILES)
+              + f"{stats['mean']:>10.2f}")
+
+    print("\n整条流程（评估 → 综合建议 → 方案文本）：")
+    throughput, peak_memory = {}, {}
+    for size in sizes:
+        throughput[str(size)] = measure_throughput(size, args.seed)
+        line = f"  {size:>9} 个样本：{throughput[str(size)]:>10.0f} 样本/秒"
+        if not args.skip_memory:
+            peak_memory[str(size)] = measure_peak_memory(size, args.seed)
+            line += f"，峰值内存 {peak_memory[str(size)]:.2f} MB"
+        print(line)
+
+    current = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "knowledge_base": current_knowledge_base().version,
+        "latency_us": latency_stats,
+        "throughput": throughput,
+        "peak_memory_mb": peak_memory,
+    }
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(current, f, ensure_ascii=False, indent=2)
+        print(f"\n基线已保存到 {args.save_baseline}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.tolerance)
+        if regressions:
+            print(f"\n发现 {len(regressions)} 项性能回退")
+            return 1
+        print("\n未发现性能回退")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""
+选词填空题库加载基准
+比较每次启动（Streamlit 每次重跑脚本）加载题库的耗时和内存：
+    内联题库   题库写在脚本里的 Python 列表字面量，每次运行都创建全部题目字典
+    JSONL 索引 QuestionBank 只映射偏移索引文件（每题 8 字节），题目按题号读取
+
+题库为合成数据，规模默认 75 / 10000 / 100000 / 500000 题，写入临时目录。
+内联题库按执行字面量的方式计时：每次运行重新创建全部题目字典（字符串作为代码常量常驻内存，
+不计入“内联(MB)”，也不含编译字面量的耗时，实际开销更大）。首次打开 JSONL 时需扫描文件建立索引，单独列出。
+
+用法：
+    python benchmarks/bench_quiz_bank.py [--sizes 75,10000,100000,500000] [--repeat 5] [--reads 2000]
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_quiz_distractors import synthetic_bank  # noqa: E402
+from quiz_core import QuestionBank  # noqa: E402
+
+
+def median_ms(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def peak_mb(func):
+    tracemalloc.start()
+    try:
+        result = func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return peak / 1024 / 1024
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="选词填空题库加载基准")
+    parser.add_argument("--sizes", default="75,10000,100000,500000", help="逗号分隔的题库规模")
+    parser.add_argument("--repeat", type=int, default=5, help="每项重复次数，取中位数（默认 5）")
+    parser.add_argument("--reads", type=int, default=2000, help="按题号随机读取的次数（默认 2000）")
+    args = parser.parse_args(argv)
+
+    print(f"{'题库规模':>10}{'内联(ms)':>12}{'内联(MB)':>12}{'建索引(ms)':>12}"
+          f"{'打开(ms)':>12}{'打开(MB)':>12}{'读一题(µs)':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in (int(s) for s in args.sizes.split(",") if s.strip()):
+            bank = synthetic_bank(size)
+            path = os.path.join(tmp, f"bank_{size}.jsonl")
+            with open(path, "w", encoding="utf-8") as f:
+                for question in bank:
+                    f.write(json.dumps(question, ensure_ascii=False) + "\n")
+            # 原做法：脚本中的列表字面量，每次运行都按常量字符串重新创建题目字典
+            inline_ms = median_ms(lambda: [dict(question) for question in bank], args.repeat)
+            inline_mb = peak_mb(lambda: [dict(question) for question in bank])
+
+            start = time.perf_counter()
+            QuestionBank(path).close()
+            index_ms = (time.perf_counter() - start) * 1000
+
+            open_ms = median_ms(lambda: QuestionBank(path).close(), args.repeat)
+            open_mb = peak_mb(lambda: QuestionBank(path))
+
+            questions = QuestionBank(path)
+            rng = random.Random(1)
+            ids = [rng.randrange(len(questions)) for _ in range(args.reads)]
+            start = time.perf_counter()
+            for i in ids:
+                questions[i]
+            read_us = (time.perf_counter() - start) / len(ids) * 1e6
+            questions.close()
+            print(f"{size:>10}{inline_ms:>12.2f}{inline_mb:>12.2f}{index_ms:>12.1f}"
+                  f"{open_ms:>12.3f}{open_mb:>12.3f}{read_us:>12.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
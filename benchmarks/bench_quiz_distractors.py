@@ -0,0 +1,90 @@
+"""
+选词填空干扰项抽取基准
+比较每道题抽取 3 个干扰项的耗时：
+    原做法   每题重新收集全部答案并过滤出 wrong_pool，再 random.sample（随题库规模线性增长）
+    答案池   AnswerPool 在加载题库时构建一次，每题常数次随机取数
+    相似索引 DistractorIndex 按词形和拼写相似度挑选干扰项；分别统计构建耗时、
+             首次查询（计算并缓存近邻）和已缓存时每题的耗时
+
+题库为合成数据（随机单词答案），规模默认 75 / 1000 / 10000 / 100000 题。
+
+用法：
+    python benchmarks/bench_quiz_distractors.py [--sizes 75,1000,10000,100000] [--questions 2000]
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from quiz_core import AnswerPool, DistractorIndex  # noqa: E402
+
+
+def synthetic_bank(size, seed=42):
+    """合成题库：答案为随机小写单词，约 5% 的答案重复出现"""
+    rng = random.Random(seed)
+    bank = []
+    for i in range(size):
+        if bank and rng.random() < 0.05:
+            answer = rng.choice(bank)["answer"]
+        else:
+            answer = "".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 12)))
+        bank.append({"question": f"Question {i} _____.", "answer": answer, "translation": ""})
+    return bank
+
+
+def legacy_options(bank, correct_answer):
+    """原 prepare_new_question 的做法"""
+    all_answers = [q["answer"] for q in bank]
+    wrong_pool = [a for a in all_answers if a != correct_answer]
+    distractors = random.sample(wrong_pool, 3)
+    options = [correct_answer] + distractors
+    random.shuffle(options)
+    return options
+
+
+def per_question_us(func, questions):
+    start = time.perf_counter()
+    for correct_answer in questions:
+        func(correct_answer)
+    return (time.perf_counter() - start) / len(questions) * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="选词填空干扰项抽取基准")
+    parser.add_argument("--sizes", default="75,1000,10000,100000", help="逗号分隔的题库规模")
+    parser.add_argument("--questions", type=int, default=2000, help="每种规模模拟的出题次数（默认 2000）")
+    args = parser.parse_args(argv)
+
+    print(f"{'题库规模':>10}{'构建答案池(ms)':>16}{'原做法(µs/题)':>16}{'答案池(µs/题)':>16}{'加速':>10}"
+          f"{'构建索引(ms)':>14}{'首次查询(µs)':>14}{'索引(µs/题)':>14}")
+    for size in (int(s) for s in args.sizes.split(",") if s.strip()):
+        bank = synthetic_bank(size)
+        rng = random.Random(1)
+        questions = [rng.choice(bank)["answer"] for _ in range(args.questions)]
+
+        start = time.perf_counter()
+        pool = AnswerPool(bank)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        # 原做法在大题库上很慢，按规模减少模拟次数
+        legacy_questions = questions[:max(20, args.questions * 1000 // max(size, 1000))]
+        legacy = per_question_us(lambda answer: legacy_options(bank, answer), legacy_questions)
+        pooled = per_question_us(pool.build_options, questions)
+
+        start = time.perf_counter()
+        index = DistractorIndex(bank)
+        index_ms = (time.perf_counter() - start) * 1000
+        # 首次查询包含近邻的计算；之后同一答案的查询只取缓存
+        cold = per_question_us(index.neighbours, list(dict.fromkeys(questions)))
+        warm = per_question_us(index.build_options, questions)
+        print(f"{size:>10}{build_ms:>16.2f}{legacy:>16.1f}{pooled:>16.2f}{legacy / pooled:>9.0f}x"
+              f"{index_ms:>14.1f}{cold:>14.1f}{warm:>14.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
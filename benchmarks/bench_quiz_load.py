@@ -0,0 +1,266 @@
+"""
+选词填空并发会话负载测试
+启动一个 streamlit 服务器（子进程），用 websockets 按浏览器的协议模拟多个会话同时刷题：
+每个会话进入顺序模式，读题 --think 秒后点击正确答案，等待自动切题后继续，共答 --questions 题。
+客户端和浏览器一样处理 st.fragment(run_every=...) 的定时重跑（auto_rerun 消息）。
+
+每种并发数报告：
+    切题耗时   从点击正确答案到下一题显示（包含 1.5 秒的切题等待，超出部分为排队和执行耗时）
+    线程峰值   服务器进程的线程数峰值（原做法每个等待切题的会话占着一个 time.sleep 中的脚本线程）
+    CPU/题     服务器每答一题消耗的 CPU 时间
+可承载会话数：切题耗时 p95 不超过 1.5 秒 + --budget 秒的最大并发数。
+
+对比改动前后（旧版页面放在仓库目录下，才能导入 quiz_core）：
+    git show <改动前的提交>:英语选词填空.py > 英语选词填空_旧.py
+    python benchmarks/bench_quiz_load.py --page 英语选词填空_旧.py
+    python benchmarks/bench_quiz_load.py
+
+需要 websockets；服务器的线程数和 CPU 时间从 /proc 读取（仅 Linux，其他系统显示为 -）。
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import websockets  # noqa: E402
+from streamlit.proto.BackMsg_pb2 import BackMsg  # noqa: E402
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg  # noqa: E402
+
+from quiz_core import QuestionBank  # noqa: E402
+
+# 自动切题等待（与页面一致）
+AUTO_NEXT_DELAY = 1.5
+
+_RUN_FINISHED = (ForwardMsg.FINISHED_SUCCESSFULLY, ForwardMsg.FINISHED_FRAGMENT_RUN_SUCCESSFULLY)
+
+# 题目卡片的开头（从页面的 markdown 中找出当前题目）
+_CARD = '<div class="question-card">'
+
+
+def display_answers():
+    """页面中题目卡片的 HTML → 正确答案"""
+    answers = {}
+    for question in QuestionBank():
+        display = question["question"].replace("_____", '<span class="blank">_____</span>')
+        answers[display] = question["answer"]
+    return answers
+
+
+class QuizSession:
+    """一个模拟的浏览器会话"""
+
+    def __init__(self, url, answers):
+        self.url = url
+        self.answers = answers
+        self.buttons = {}
+        self.question = None
+        self.auto_reruns = {}
+        self.ws = None
+        # 已结束的运行次数（每次运行结束时通知等待方）
+        self.finished = 0
+        self._changed = asyncio.Event()
+
+    def _handle(self, msg):
+        kind = msg.WhichOneof("type")
+        if kind == "new_session":
+            # 整页重跑开始：元素和定时重跑都以本次运行为准
+            self.buttons = {}
+            self.question = None
+            self.auto_reruns = {}
+        elif kind == "delta" and msg.delta.WhichOneof("type") == "new_element":
+            element = msg.delta.new_element
+            element_type = element.WhichOneof("type")
+            if element_type == "button":
+                self.buttons[element.button.label] = element.button.id
+            elif element_type == "markdown" and _CARD in element.markdown.body:
+                body = element.markdown.body
+                start = body.index(_CARD) + len(_CARD)
+                self.question = body[start:body.index("</div>", start)].strip()
+        elif kind == "auto_rerun":
+            self.auto_reruns[msg.auto_rerun.fragment_id] = msg.auto_rerun.interval
+        elif kind == "stop_auto_rerun":
+            for fragment_id in msg.stop_auto_rerun.fragment_ids:
+                self.auto_reruns.pop(fragment_id, None)
+        elif kind == "script_finished" and msg.script_finished in _RUN_FINISHED:
+            self.finished += 1
+            self._changed.set()
+
+    async def _read(self):
+        """和浏览器一样持续接收服务器消息"""
+        async for data in self.ws:
+            msg = ForwardMsg()
+            msg.ParseFromString(data)
+            self._handle(msg)
+
+    async def _wait(self, predicate, timeout=None):
+        """等待某次运行结束后条件成立"""
+        async def wait():
+            while not predicate():
+                self._changed.clear()
+                await self._changed.wait()
+        await asyncio.wait_for(wait(), timeout)
+
+    async def request(self, button=None, fragment_id=None):
+        """发送一次重跑（可带按钮点击或片段），等待运行结束（中途 st.rerun 的运行继续等待）"""
+        back = BackMsg()
+        client_state = back.rerun_script
+        client_state.query_string = ""
+        client_state.page_script_hash = ""
+        if button is not None:
+            widget = client_state.widget_states.widgets.add()
+            widget.id = self.buttons[button]
+            widget.trigger_value = True
+        if fragment_id is not None:
+            client_state.fragment_id = fragment_id
+            client_state.is_auto_rerun = True
+        finished = self.finished
+        await self.ws.send(back.SerializeToString())
+        await self._wait(lambda: self.finished > finished, timeout=300)
+
+    async def run(self, questions, think, latencies):
+        async with websockets.connect(self.url, subprotocols=["streamlit"], max_size=None) as ws:
+            self.ws = ws
+            reader = asyncio.create_task(self._read())
+            try:
+                await self.request()
+                await self.request("📝 顺序")
+                for _ in range(questions):
+                    await asyncio.sleep(think)
+                    question = self.question
+                    start = time.perf_counter()
+                    await self.request(f"🔘 {self.answers[question]}")
+                    # 等待切题：旧版在点击后的运行中 sleep 再切题，新版由浏览器按 run_every 定时重跑片段切题
+                    while self.question == question:
+                        if not self.auto_reruns:
+                            raise RuntimeError("答对后没有自动切题")
+                        fragment_id, interval = next(iter(self.auto_reruns.items()))
+                        try:
+                            await self._wait(lambda: self.question != question, timeout=interval)
+                        except asyncio.TimeoutError:
+                            await self.request(fragment_id=fragment_id)
+                    latencies.append(time.perf_counter() - start)
+            finally:
+                reader.cancel()
+
+
+def read_proc(pid):
+    """服务器进程的 (线程数, CPU 秒)；没有 /proc 时返回 (None, None)"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            threads = next(int(line.split()[1]) for line in f if line.startswith("Threads:"))
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        cpu = (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+        return threads, cpu
+    except (OSError, StopIteration, ValueError, AttributeError):
+        return None, None
+
+
+async def run_level(url, answers, pid, sessions, questions, think):
+    latencies = []
+    peak_threads = 0
+    done = asyncio.Event()
+
+    async def monitor():
+        nonlocal peak_threads
+        while not done.is_set():
+            threads, _ = read_proc(pid)
+            if threads is not None:
+                peak_threads = max(peak_threads, threads)
+            await asyncio.sleep(0.05)
+
+    _, cpu_before = read_proc(pid)
+    watcher = asyncio.create_task(monitor())
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *(QuizSession(url, answers).run(questions, think, latencies) for _ in range(sessions)),
+        return_exceptions=True,
+    )
+    wall = time.perf_counter() - start
+    done.set()
+    await watcher
+    _, cpu_after = read_proc(pid)
+    errors = [r for r in results if isinstance(r, Exception)]
+    cpu_per_question = (cpu_after - cpu_before) / len(latencies) if latencies and cpu_before is not None else None
+    return latencies, wall, peak_threads or None, cpu_per_question, errors
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(page, port):
+    command = [
+        sys.executable, "-m", "streamlit", "run", page,
+        "--server.headless", "true", "--server.port", str(port), "--server.address", "127.0.0.1",
+        "--server.enableXsrfProtection", "false", "--server.fileWatcherType", "none",
+        "--browser.gatherUsageStats", "false",
+    ]
+    server = subprocess.Popen(command, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 60
+    while time.time() < deadline and server.poll() is None:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1):
+                return server
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError("streamlit 服务器启动超时")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="选词填空并发会话负载测试")
+    parser.add_argument("--page", default=os.path.join(ROOT, "英语选词填空.py"), help="页面脚本路径")
+    parser.add_argument("--sessions", default="10,50,100,200", help="逗号分隔的并发会话数")
+    parser.add_argument("--questions", type=int, default=5, help="每个会话答题数（默认 5）")
+    parser.add_argument("--think", type=float, default=0.5, help="每题读题时间（秒，默认 0.5）")
+    parser.add_argument("--budget", type=float, default=0.5, help="切题耗时超出 1.5 秒等待的允许值（秒，默认 0.5）")
+    args = parser.parse_args(argv)
+
+    answers = display_answers()
+    port = free_port()
+    server = start_server(args.page, port)
+    url = f"ws://127.0.0.1:{port}/_stcore/stream"
+    try:
+        # 预热：首次运行导入模块、构建题库和干扰项索引
+        asyncio.run(run_level(url, answers, server.pid, 1, 1, 0))
+
+        print(f"页面：{os.path.basename(args.page)}，每会话 {args.questions} 题，读题 {args.think} 秒")
+        print(f"{'并发会话':>8}{'完成题数':>10}{'切题p50(s)':>12}{'切题p95(s)':>12}{'线程峰值':>10}"
+              f"{'CPU/题(ms)':>12}{'失败会话':>10}")
+        capacity = 0
+        for sessions in (int(s) for s in args.sessions.split(",") if s.strip()):
+            latencies, wall, peak_threads, cpu, errors = asyncio.run(
+                run_level(url, answers, server.pid, sessions, args.questions, args.think))
+            if latencies:
+                ordered = sorted(latencies)
+                p50 = statistics.median(ordered)
+                p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+            else:
+                p50 = p95 = float("nan")
+            print(f"{sessions:>8}{len(latencies):>10}{p50:>12.2f}{p95:>12.2f}"
+                  f"{peak_threads if peak_threads is not None else '-':>10}"
+                  f"{cpu * 1000 if cpu is not None else float('nan'):>12.1f}{len(errors):>10}")
+            if errors:
+                print(f"{'':>8}失败示例：{errors[0]!r}")
+            elif p95 <= AUTO_NEXT_DELAY + args.budget:
+                capacity = sessions
+        print(f"\n切题耗时 p95 ≤ {AUTO_NEXT_DELAY + args.budget:g} 秒的最大并发会话数：{capacity or '无'}")
+    finally:
+        server.terminate()
+        server.wait()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
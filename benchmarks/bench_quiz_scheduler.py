@@ -0,0 +1,85 @@
+"""
+选词填空复习调度基准
+比较进入复习模式和统计看板的耗时：
+    原做法   status_map（0/1/2 列表）：每次进入错题模式遍历整个列表筛出错题并打乱，统计看板每次重跑遍历三遍
+    到期堆   ReviewScheduler：从小顶堆中按到期先后取出到期题（O(k log n)），统计数增量维护
+
+模拟学习者做过题库中的 20% 题目，其中 --due-ratio 比例的题已到期，每次取 --batch 道到期题。
+
+用法：
+    python benchmarks/bench_quiz_scheduler.py [--sizes 1000,100000,1000000] [--due-ratio 0.01] [--batch 20]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from quiz_core import QUALITY_CORRECT, QUALITY_WRONG, ReviewScheduler  # noqa: E402
+
+
+def per_call_us(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def legacy_review(status_map):
+    """原 start_practice('review') 的做法"""
+    indices = [i for i, status in enumerate(status_map) if status == 2]
+    random.shuffle(indices)
+    return indices
+
+
+def legacy_stats(status_map):
+    """原侧边栏统计看板的做法"""
+    done_q = sum(1 for s in status_map if s != 0)
+    correct_q = sum(1 for s in status_map if s == 1)
+    wrong_q = sum(1 for s in status_map if s == 2)
+    return done_q, correct_q, wrong_q
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="选词填空复习调度基准")
+    parser.add_argument("--sizes", default="1000,100000,1000000", help="逗号分隔的题库规模")
+    parser.add_argument("--due-ratio", type=float, default=0.01, help="做过的题中已到期的比例（默认 0.01）")
+    parser.add_argument("--batch", type=int, default=20, help="每次进入复习模式取出的到期题数（默认 20）")
+    parser.add_argument("--repeat", type=int, default=200, help="每项重复次数（默认 200）")
+    args = parser.parse_args(argv)
+
+    print(f"{'题库规模':>10}{'原错题模式(µs)':>16}{'堆取到期题(µs)':>16}{'原统计看板(µs)':>16}"
+          f"{'增量统计(µs)':>14}{'记录作答(µs)':>14}")
+    for size in (int(s) for s in args.sizes.split(",") if s.strip()):
+        rng = random.Random(42)
+        now = 1_000_000_000.0
+        status_map = [0] * size
+        scheduler = ReviewScheduler()
+        for question_id in rng.sample(range(size), size // 5):
+            wrong = rng.random() < 0.3
+            status_map[question_id] = 2 if wrong else 1
+            # 已到期的题按过去的时间记录，其余按当前时间记录（间隔未到）
+            reviewed_at = now - 7 * 86400 if rng.random() < args.due_ratio else now
+            scheduler.review(question_id, QUALITY_WRONG if wrong else QUALITY_CORRECT, now=reviewed_at)
+
+        # 原做法在大题库上较慢，按规模减少重复次数
+        legacy_repeat = max(3, args.repeat * 1000 // max(size, 1000))
+        review_legacy = per_call_us(lambda: legacy_review(status_map), legacy_repeat)
+        review_heap = per_call_us(lambda: scheduler.due(now, limit=args.batch), args.repeat)
+        stats_legacy = per_call_us(lambda: legacy_stats(status_map), legacy_repeat)
+        stats_heap = per_call_us(
+            lambda: (scheduler.done_count, scheduler.correct_count, scheduler.wrong_count), args.repeat)
+        question_ids = [rng.randrange(size) for _ in range(args.repeat)]
+        start = time.perf_counter()
+        for question_id in question_ids:
+            scheduler.review(question_id, QUALITY_CORRECT, now=now)
+        review_us = (time.perf_counter() - start) / len(question_ids) * 1e6
+        print(f"{size:>10}{review_legacy:>16.1f}{review_heap:>16.2f}{stats_legacy:>16.1f}"
+              f"{stats_heap:>14.2f}{review_us:>14.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""
+网页重跑延迟基准
+用 streamlit.testing 的 AppTest 在当前进程中运行 cotton_expert.py，模拟一组常见交互，
+报告每次交互的整页重跑耗时（中位数）。同时开启 cotton_metrics 统计：页面中以片段（st.fragment）
+运行的面板，在真实浏览器中只重跑片段本身，其耗时见 fragment_* 阶段。
+
+AppTest 每次交互都会整页重跑，因此“整页重跑”一列相当于未拆分片段时每次交互的耗时，
+fragment_* 阶段的耗时即拆分后计算器、方案预览、历史查询等面板交互的实际重跑耗时。
+
+用法：
+    python benchmarks/bench_rerun.py [--repeat 10] [--page cotton_expert.py]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# 必须在页面导入 cotton_metrics 之前设置
+os.environ["COTTON_METRICS"] = "1"
+os.environ.setdefault("COTTON_METRICS_FILE", os.path.join(tempfile.gettempdir(), "cotton_bench_rerun.prom"))
+
+import cotton_metrics  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+
+def find_button(at, label):
+    return next(button for button in at.button if button.label == label)
+
+
+def timed(timings, name, action):
+    start = time.perf_counter()
+    at = action()
+    timings.setdefault(name, []).append(time.perf_counter() - start)
+    if at.exception:
+        raise RuntimeError(f"{name}: {at.exception[0].message}")
+    return at
+
+
+def run_session(page, timings):
+    """模拟一次完整的使用过程"""
+    at = AppTest.from_file(page, default_timeout=60)
+    timed(timings, "首次加载", at.run)
+    at.number_input(key="om_input").set_value(10.0)
+    at.number_input(key="n_input").set_value(50.0)
+    at.number_input(key="p_input").set_value(8.0)
+    at.number_input(key="zn_input").set_value(0.4)
+    timed(timings, "开始评估", find_button(at, "🚀 开始评估").click().run)
+    timed(timings, "结果页重跑", at.run)
+    timed(timings, "打开计算器", find_button(at, "点击使用计算器").click().run)
+    timed(timings, "计算肥料用量", at.button(key="calc_btn").click().run)
+    timed(timings, "预览方案", find_button(at, "👁️ 预览方案内容").click().run)
+    timed(timings, "切换历史查询养分", at.selectbox(key="trend_nutrient").select_index(1).run)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="网页重跑延迟基准（AppTest）")
+    parser.add_argument("--repeat", type=int, default=10, help="重复模拟的次数（默认 10）")
+    parser.add_argument("--page", default=os.path.join(ROOT, "cotton_expert.py"), help="页面脚本路径")
+    args = parser.parse_args(argv)
+
+    # 预热：首次导入 pandas/altair 等模块的耗时不计入
+    run_session(args.page, {})
+    cotton_metrics.reset()
+
+    timings = {}
+    for _ in range(args.repeat):
+        run_session(args.page, timings)
+
+    print(f"整页重跑耗时（{args.repeat} 次中位数，ms）：")
+    for name, values in timings.items():
+        print(f"  {name:<16}{statistics.median(values) * 1000:>10.1f}")
+
+    stages = cotton_metrics.summary()
+    for row in stages:
+        if row["阶段"] == "rerun":
+            print(f"\n其中页面脚本执行（rerun 阶段，不含 AppTest 开销）：平均 {row['平均(ms)']:.1f} ms，"
+                  f"p50 {row['最近p50(ms)']:.1f} ms")
+    fragments = [row for row in stages if row["阶段"].startswith("fragment_")]
+    if fragments:
+        print("\n片段重跑耗时（片段函数体，ms）：")
+        for row in fragments:
+            print(f"  {row['阶段']:<28}平均 {row['平均(ms)']:>8.1f}  p50 {row['最近p50(ms)']:>8.1f}  次数 {row['次数']}")
+    else:
+        print("\n页面中没有以片段运行的面板（每次交互都整页重跑）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
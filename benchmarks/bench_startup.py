@@ -0,0 +1,68 @@
+"""
+启动耗时基准：比较无界面调用方导入计算核心的耗时
+
+- cotton_core：拆分后的纯计算模块（不加载 streamlit/pandas/numpy）
+- cotton_expert：原先唯一的入口，导入即加载 streamlit、pandas 并执行整个页面脚本
+
+每种方式在全新的 Python 子进程中重复导入若干次，报告中位数和最小值。
+
+用法：
+    python benchmarks/bench_startup.py [--repeat 10]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CASES = {
+    "python 空进程": "pass",
+    "import cotton_core": "import cotton_core",
+    "import cotton_expert": "import cotton_expert",
+}
+
+
+def time_import(statement, repeat):
+    """在新进程中执行导入语句，返回每次的墙钟耗时（毫秒）"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-c", statement],
+            cwd=REPO_ROOT,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            check=True,
+        )
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="计算核心导入耗时基准")
+    parser.add_argument("--repeat", type=int, default=10, help="每种方式重复次数（默认 10）")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for name, statement in CASES.items():
+        try:
+            results[name] = time_import(statement, args.repeat)
+        except subprocess.CalledProcessError:
+            print(f"{name:<24} 导入失败（缺少依赖？），跳过")
+
+    print(f"{'方式':<24}{'中位数(ms)':>12}{'最小值(ms)':>12}")
+    for name, timings in results.items():
+        print(f"{name:<24}{statistics.median(timings):>12.1f}{min(timings):>12.1f}")
+
+    if "import cotton_core" in results and "import cotton_expert" in results:
+        core = statistics.median(results["import cotton_core"])
+        full = statistics.median(results["import cotton_expert"])
+        print(f"\n无界面调用方启动耗时减少 {full - core:.1f} ms（{full / core:.1f} 倍）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
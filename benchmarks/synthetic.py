@@ -0,0 +1,52 @@
+"""
+基准测试用的合成样本生成器
+覆盖北疆/南疆两个区域和 RULES_DB 中的全部检测项目，数值在各分级阈值两侧随机分布，
+使缺乏、正常、丰富各种状态都会出现；固定随机种子保证结果可复现。
+"""
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cotton_core import RULES_DB  # noqa: E402
+
+REGIONS = ("北疆", "南疆")
+
+
+def synthetic_measurements(rng):
+    """生成一个样本的检测值字典（约一成项目缺测）"""
+    measurements = {}
+    for item_name, (thresholds, _) in RULES_DB.items():
+        if rng.random() < 0.1:
+            continue
+        # 在最低阈值的一半到最高阈值的 1.5 倍之间取值
+        measurements[item_name] = round(rng.uniform(thresholds[0] * 0.5, thresholds[-1] * 1.5), 3)
+    return measurements
+
+
+def iter_synthetic_samples(count, seed=42):
+    """逐个生成 count 个样本（不在内存中保存整批，适用于百万级吞吐量测试）"""
+    rng = random.Random(seed)
+    for i in range(count):
+        yield f"S{i:07d}", rng.choice(REGIONS), float(rng.choice((1, 5, 10, 20, 50))), synthetic_measurements(rng)
+
+
+def synthetic_samples(count, seed=42):
+    """
+    生成 count 个样本
+    返回: (样本编号, 区域, 面积, 检测值字典) 列表，格式与 iter_samples 一致
+    """
+    return list(iter_synthetic_samples(count, seed))
+
+
+def synthetic_frame(count, seed=42):
+    """生成样本表（DataFrame），列为 样本编号/区域/面积 及各检测项目"""
+    import pandas as pd
+
+    rows = []
+    for sample_id, region, area_mu, measurements in synthetic_samples(count, seed):
+        row = {"样本编号": sample_id, "区域": region, "面积": area_mu}
+        row.update(measurements)
+        rows.append(row)
+    return pd.DataFrame(rows, columns=["样本编号", "区域", "面积", *RULES_DB])
@@ -0,0 +1,327 @@
+"""
+新疆棉田土壤养分专家系统 - HTTP/JSON 接口服务
+基于 asyncio 的轻量 HTTP/1.1 服务（仅标准库），供农场管理系统直接调用计算核心，
+无需通过浏览器使用网页端，也没有 streamlit 每次交互重跑脚本的开销。
+
+接口（请求体均为 JSON，可为单个样本，也可为样本列表或 {"samples": [...]} 批量提交）：
+    POST /evaluate   评估养分等级
+    POST /recommend  评估 + 综合施肥建议
+    POST /report     施肥方案文本（"format": text/markdown/html，默认 text）
+    GET  /health     服务状态和知识库版本
+    GET  /metrics    分阶段耗时（Prometheus 文本格式，需设置 COTTON_METRICS=1）
+
+样本格式：
+    {"id": "F-001", "region": "南疆", "area_mu": 20, "measurements": {"有机质 g/kg": 10.5, "锌 Zn (mg/kg)": 0.4}}
+
+用法示例：
+    python cotton_api.py --host 0.0.0.0 --port 8000 --threads 4 --max-concurrency 64
+    curl -X POST localhost:8000/recommend -d '{"region": "南疆", "measurements": {"有机质 g/kg": 10.5}}'
+
+连接默认保持（keep-alive），同时进行的计算数受 --max-concurrency 限制，超出的请求排队等待。
+"""
+import argparse
+import asyncio
+import json
+import math
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from cotton_core import (
+    REPORT_EXTENSIONS,
+    assess_sample,
+    current_knowledge_base,
+    export_comprehensive_advice,
+    get_region_profile,
+    refresh_knowledge_base,
+)
+from cotton_metrics import prometheus_text, stage
+
+# 单个请求体的大小上限（字节）
+MAX_BODY_BYTES = 16 * 1024 * 1024
+
+# 单次批量请求的样本数上限
+MAX_BATCH_SIZE = 10000
+
+# 请求头的大小上限（字节）和空闲连接的保持时间（秒）
+MAX_HEADER_BYTES = 16 * 1024
+KEEPALIVE_TIMEOUT = 15.0
+
+_REASONS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    408: "Request Timeout", 411: "Length Required", 413: "Payload Too Large",
+    500: "Internal Server Error", 501: "Not Implemented",
+}
+
+
+class ApiError(Exception):
+    """返回给调用方的请求错误（HTTP 状态码 + 说明）"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _is_number(value):
+    """JSON 中的有限数值（排除 true/false 和 NaN/Infinity）"""
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def _parse_sample(sample):
+    """
+    校验单个样本，返回 (编号, 区域, 面积, 检测值字典)
+    各字段先检查类型，任何不合法的输入都抛出 ValueError，批量请求中只影响该样本
+    """
+    if not isinstance(sample, dict):
+        raise ValueError("样本必须是 JSON 对象")
+    sample_id = sample.get("id")
+    if sample_id is not None and (isinstance(sample_id, bool) or not isinstance(sample_id, (str, int))):
+        raise ValueError("id 必须是字符串或整数")
+    measurements = sample.get("measurements")
+    if not isinstance(measurements, dict) or not measurements:
+        raise ValueError("measurements 必须是非空的 {检测项目: 数值} 对象")
+    values = {}
+    for item_name, value in measurements.items():
+        if value is None:
+            continue
+        if not _is_number(value):
+            raise ValueError(f"{item_name} 的检测值必须是数值")
+        if value > 0:
+            values[item_name] = float(value)
+    area_mu = sample.get("area_mu", 1.0)
+    if not _is_number(area_mu) or area_mu <= 0:
+        raise ValueError("area_mu 必须是正数")
+    region = sample.get("region", "北疆")
+    if not isinstance(region, str):
+        raise ValueError("region 必须是区域名称字符串")
+    return sample_id, get_region_profile(region).name, float(area_mu), values
+
+
+def _evaluate(sample, options):
+    sample_id, region, area_mu, values = _parse_sample(sample)
+    return {"id": sample_id, "region": region, "area_mu": area_mu,
+            "results": assess_sample(values, region, area_mu).results}
+
+
+def _recommend(sample, options):
+    sample_id, region, area_mu, values = _parse_sample(sample)
+    assessment = assess_sample(values, region, area_mu)
+    return {"id": sample_id, "region": region, "area_mu": area_mu,
+            "results": assessment.results, "recommendations": assessment.recommendations}
+
+
+def _report(sample, options):
+    sample_id, region, area_mu, values = _parse_sample(sample)
+    fmt = sample.get("format", options.get("format", "text"))
+    if not isinstance(fmt, str) or fmt not in REPORT_EXTENSIONS:
+        raise ValueError(f"未知报告格式: {fmt}")
+    assessment = assess_sample(values, region, area_mu)
+    # 报告中的评估时间为本次请求的时间
+    with stage("report"):
+        report = export_comprehensive_advice(region, assessment.recommendations, area_mu, fmt)
+    return {"id": sample_id, "region": region, "area_mu": area_mu, "format": fmt, "report": report}
+
+
+ENDPOINTS = {
+    "/evaluate": _evaluate,
+    "/recommend": _recommend,
+    "/report": _report,
+}
+
+
+def handle_payload(path, payload):
+    """
+    处理一个请求体（在线程池中执行）
+    单个样本返回结果对象；批量请求返回 {"results": [...]}，单个样本出错时对应位置为 {"error": ...}，不影响其他样本
+    """
+    with stage("api_" + path.lstrip("/")):
+        return _handle_payload(ENDPOINTS[path], payload)
+
+
+def _handle_payload(handler, payload):
+    refresh_knowledge_base()
+    if isinstance(payload, dict) and "samples" not in payload:
+        try:
+            return handler(payload, {})
+        except ValueError as e:
+            raise ApiError(400, str(e)) from None
+    samples = payload.get("samples") if isinstance(payload, dict) else payload
+    options = payload if isinstance(payload, dict) else {}
+    if not isinstance(samples, list):
+        raise ApiError(400, "请求体必须是样本对象、样本列表或 {\"samples\": [...]}")
+    if len(samples) > MAX_BATCH_SIZE:
+        raise ApiError(413, f"单次最多提交 {MAX_BATCH_SIZE} 个样本")
+    results = []
+    for sample in samples:
+        try:
+            results.append(handler(sample, options))
+        except ValueError as e:
+            results.append({"id": sample.get("id") if isinstance(sample, dict) else None, "error": str(e)})
+    return {"results": results}
+
+
+class SoilApiServer:
+    """asyncio HTTP/1.1 服务：连接保持、请求体大小限制、计算并发数限制"""
+
+    def __init__(self, host="127.0.0.1", port=8000, threads=4, max_concurrency=64):
+        self.host = host
+        self.port = port
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="cotton-api")
+        self.max_concurrency = max_concurrency
+        self._semaphore = None
+        self._server = None
+        self._connections = set()
+
+    async def start(self):
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port,
+                                                  limit=MAX_HEADER_BYTES)
+        # 端口为 0 时使用系统分配的端口
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self):
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            # 结束仍保持着的连接
+            for task in self._connections:
+                task.cancel()
+            await asyncio.gather(*self._connections, return_exceptions=True)
+            await self._server.wait_closed()
+        self.executor.shutdown(wait=False)
+
+    async def _handle_connection(self, reader, writer):
+        task = asyncio.current_task()
+        self._connections.add(task)
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), KEEPALIVE_TIMEOUT)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    return
+                except asyncio.LimitOverrunError:
+                    await self._respond(writer, 400, {"error": "请求头过大"}, keep_alive=False)
+                    return
+                keep_alive = await self._handle_request(head, reader, writer)
+                if not keep_alive:
+                    return
+        except asyncio.CancelledError:
+            # 服务关闭时正常结束连接
+            pass
+        finally:
+            self._connections.discard(task)
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _handle_request(self, head, reader, writer):
+        """处理一个请求，返回连接是否保持"""
+        try:
+            request_line, *header_lines = head.decode("latin-1").split("\r\n")
+            method, target, version = request_line.split(" ", 2)
+        except ValueError:
+            await self._respond(writer, 400, {"error": "无法解析请求行"}, keep_alive=False)
+            return False
+        headers = {}
+        for line in header_lines:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        connection = headers.get("connection", "").lower()
+        keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+        path = target.split("?", 1)[0]
+
+        if "transfer-encoding" in headers:
+            await self._respond(writer, 501, {"error": "不支持分块传输，请提供 Content-Length"}, keep_alive=False)
+            return False
+        try:
+            length = int(headers.get("content-length", "0"))
+        except ValueError:
+            length = -1
+        if length < 0:
+            await self._respond(writer, 400, {"error": "Content-Length 无效"}, keep_alive=False)
+            return False
+        if length > MAX_BODY_BYTES:
+            await self._respond(writer, 413, {"error": f"请求体不能超过 {MAX_BODY_BYTES} 字节"}, keep_alive=False)
+            return False
+        try:
+            body = await asyncio.wait_for(reader.readexactly(length), KEEPALIVE_TIMEOUT) if length else b""
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError):
+            return False
+
+        status, response = await self._dispatch(method, path, body)
+        await self._respond(writer, status, response, keep_alive)
+        return keep_alive
+
+    async def _dispatch(self, method, path, body):
+        if path == "/health":
+            return 200, {"status": "ok", "knowledge_base": current_knowledge_base().version}
+        if path == "/metrics":
+            return 200, prometheus_text()
+        if path not in ENDPOINTS:
+            return 404, {"error": f"未知接口: {path}"}
+        if method != "POST":
+            return 405, {"error": "请使用 POST"}
+        try:
+            payload = json.loads(body or b"null")
+        except ValueError:
+            return 400, {"error": "请求体不是有效的 JSON"}
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            try:
+                return 200, await loop.run_in_executor(self.executor, handle_payload, path, payload)
+            except ApiError as e:
+                return e.status, {"error": e.message}
+            except Exception as e:  # 计算出错时返回 500，不中断服务
+                return 500, {"error": f"{type(e).__name__}: {e}"}
+
+    async def _respond(self, writer, status, payload, keep_alive):
+        # 字符串（/metrics）按纯文本返回，其余按 JSON 返回
+        if isinstance(payload, str):
+            body, content_type = payload.encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            body, content_type = json.dumps(payload, ensure_ascii=False).encode("utf-8"), "application/json; charset=utf-8"
+        head = (
+            f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+
+async def _serve(args):
+    server = await SoilApiServer(args.host, args.port, args.threads, args.max_concurrency).start()
+    print(f"服务已启动：http://{server.host}:{server.port}（知识库版本 {current_knowledge_base().version}）")
+    try:
+        await server.serve_forever()
+    finally:
+        await server.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="新疆棉田土壤养分 HTTP/JSON 接口服务")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址（默认 127.0.0.1）")
+    parser.add_argument("--port", type=int, default=8000, help="监听端口（默认 8000）")
+    parser.add_argument("--threads", type=int, default=4, help="计算线程数（默认 4）")
+    parser.add_argument("--max-concurrency", type=int, default=64, help="同时进行的计算请求数上限（默认 64）")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
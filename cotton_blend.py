@@ -0,0 +1,171 @@
+"""
+新疆棉田土壤养分专家系统 - 最低成本配肥
+根据 calculate_deficiency 得到的各养分缺乏量，在 FERTILIZER_CONTENT 中选择肥料组合，
+使所有养分都达到推荐施用量且总成本最低（线性规划，本地求解）。
+
+与 calculate_fertilizer_amount 逐个养分单独计算不同，磷酸二铵等复合肥同时提供的
+氮和磷只计算一次。
+
+用法示例：
+    optimizer = BlendOptimizer({"尿素": 2.5, "磷酸二铵": 3.6}, region)
+    deficiencies = [FertilizerCalculator.calculate_deficiency(name, value, region) for ...]
+    plan = optimizer.solve(deficiencies, area_mu=20)
+
+依赖 numpy 和 scipy（scipy.optimize.linprog，HiGHS 求解器）。
+"""
+import numpy as np
+from scipy.optimize import linprog
+
+from cotton_core import get_region_profile
+
+# 肥料参考价格（元/kg），可按当地实际价格传入覆盖
+DEFAULT_FERTILIZER_PRICES = {
+    "尿素": 2.3,
+    "碳酸氢铵": 0.9,
+    "磷酸二铵": 3.8,
+    "过磷酸钙": 0.9,
+    "钙镁磷肥": 0.9,
+    "氯化钾": 3.2,
+    "硫酸钾": 3.8,
+    "硫酸锌": 6.0,
+    "硼砂": 8.0,
+    "硫酸锰": 6.0,
+    "硫酸亚铁": 1.5,
+    "硫酸铜": 20.0,
+    "钼酸铵": 220.0,
+    "有机肥": 0.8
+}
+
+# 每个求解器缓存的不同需求组合数上限，超出后清空重建
+SOLUTION_CACHE_SIZE = 100000
+
+
+def nutrient_requirements(deficiencies, region="北疆"):
+    """
+    将缺乏量换算为每亩需施入的纯养分量（已考虑肥料利用率和缺乏程度）
+    deficiencies: calculate_deficiency 返回的字典列表
+    region: 区域名称或 RegionProfile，利用率和缺乏程度系数取自其所属的知识库版本（与计算缺乏量时一致）
+    返回: {养分符号: kg/亩}
+    """
+    kb = get_region_profile(region).kb
+    requirements = {}
+    for info in deficiencies:
+        if "error" in info or info["deficiency_kg_per_mu"] <= 0:
+            continue
+        entry = kb.nutrient_index.get(info["nutrient"])
+        if entry is None:
+            continue
+        need = info["deficiency_kg_per_mu"] / entry["utilization"] * kb.grade_factor.get(info["grade"], 0.8)
+        requirements[entry["symbol"]] = requirements.get(entry["symbol"], 0.0) + need
+    return requirements
+
+
+class BlendOptimizer:
+    """最低成本配肥求解器（养分含量矩阵在创建时编译一次，可重复求解）"""
+
+    def __init__(self, prices=None, region="北疆"):
+        """
+        prices: {肥料: 元/kg}，覆盖 DEFAULT_FERTILIZER_PRICES 中的同名项；
+                价格为 None 的肥料不参与配方
+        region: 区域名称或 RegionProfile，肥料含量、利用率等取自创建时该区域所属的知识库版本
+        """
+        self.profile = get_region_profile(region)
+        fertilizer_content = self.profile.kb.fertilizer_content
+        merged = dict(DEFAULT_FERTILIZER_PRICES)
+        merged.update(prices or {})
+        unknown = set(merged) - set(fertilizer_content)
+        if unknown:
+            raise ValueError(f"未知肥料类型: {'、'.join(sorted(unknown))}")
+
+        self.fertilizers = [f for f, price in merged.items() if price is not None]
+        self.prices = np.array([merged[f] for f in self.fertilizers], dtype=float)
+        if (self.prices < 0).any():
+            raise ValueError("肥料价格不能为负数")
+
+        # 养分含量矩阵：行 = 养分符号，列 = 肥料，值为含量小数
+        self.symbols = sorted({s for f in self.fertilizers for s in fertilizer_content[f]})
+        self.content = np.zeros((len(self.symbols), len(self.fertilizers)))
+        for j, fertilizer in enumerate(self.fertilizers):
+            for symbol, percent in fertilizer_content[fertilizer].items():
+                self.content[self.symbols.index(symbol), j] = percent / 100
+        self._symbol_rows = {s: i for i, s in enumerate(self.symbols)}
+        self._cache = {}
+
+    def solve(self, deficiencies, area_mu=1.0):
+        """
+        求解单个样本的最低成本配方
+        deficiencies: calculate_deficiency 返回的字典列表
+        返回: {"blend": [{肥料, 每亩用量, 总用量, 每亩成本}], "cost_per_mu", "total_cost", "supplied"}，
+              无法满足时返回 {"error": ...}
+        """
+        requirements = nutrient_requirements(deficiencies, self.profile)
+        missing = [s for s in requirements if s not in self._symbol_rows]
+        if missing:
+            return {"error": f"没有可用肥料提供养分: {'、'.join(missing)}"}
+
+        key = tuple(sorted((s, round(v, 6)) for s, v in requirements.items()))
+        if key not in self._cache:
+            if len(self._cache) >= SOLUTION_CACHE_SIZE:
+                self._cache.clear()
+            self._cache[key] = self._solve_per_mu(key)
+        amounts = self._cache[key]
+        if isinstance(amounts, str):
+            return {"error": amounts}
+        return self._format(amounts, area_mu)
+
+    def solve_batch(self, deficiency_lists, areas=None):
+        """
+        批量求解多个样本（需求相同的样本只求解一次）
+        deficiency_lists: 每个样本的缺乏信息列表
+        areas: 每个样本的面积（亩），默认均为 1
+        """
+        if areas is None:
+            areas = [1.0] * len(deficiency_lists)
+        return [self.solve(d, a) for d, a in zip(deficiency_lists, areas)]
+
+    def _solve_per_mu(self, key):
+        """求每亩各肥料用量；返回数组或错误信息"""
+        amounts = np.zeros(len(self.fertilizers))
+        if not key:
+            return amounts
+        rows = [self._symbol_rows[s] for s, _ in key]
+        need = np.array([v for _, v in key])
+        sub = self.content[rows]
+        # 只保留能提供所需养分的肥料
+        cols = np.flatnonzero(sub.any(axis=0))
+        sub = sub[:, cols]
+
+        if (np.count_nonzero(sub, axis=0) == 1).all():
+            # 每种候选肥料只提供一种所需养分：各养分独立选单位养分最便宜的肥料即为最优解
+            for i in range(len(rows)):
+                candidates = np.flatnonzero(sub[i])
+                unit_cost = self.prices[cols[candidates]] / sub[i, candidates]
+                best = candidates[np.argmin(unit_cost)]
+                amounts[cols[best]] += need[i] / sub[i, best]
+            return amounts
+
+        result = linprog(self.prices[cols], A_ub=-sub, b_ub=-need, bounds=(0, None), method="highs")
+        if result.status != 0:
+            return f"配方求解失败: {result.message}"
+        amounts[cols] = result.x
+        return amounts
+
+    def _format(self, amounts, area_mu):
+        blend = []
+        for j in np.flatnonzero(amounts > 1e-9):
+            per_mu = float(amounts[j])
+            blend.append({
+                "fertilizer": self.fertilizers[j],
+                "per_mu": round(per_mu, 2),
+                "total_amount": round(per_mu * area_mu, 2),
+                "cost_per_mu": round(per_mu * float(self.prices[j]), 2)
+            })
+        supplied = self.content @ amounts
+        cost_per_mu = float(self.prices @ amounts)
+        return {
+            "blend": blend,
+            "cost_per_mu": round(cost_per_mu, 2),
+            "total_cost": round(cost_per_mu * area_mu, 2),
+            "area": area_mu,
+            "supplied": {s: round(float(supplied[i]), 3) for i, s in enumerate(self.symbols) if supplied[i] > 1e-9}
+        }
@@ -0,0 +1,277 @@
+"""
+新疆棉田土壤养分专家系统 - 命令行批处理
+逐块读取 CSV/Parquet 样本表，为每个样本生成施肥建议明细和方案文本，不依赖 streamlit。
+
+用法示例：
+    python cotton_cli.py samples.csv -o output/
+    python cotton_cli.py samples.parquet -o output/ --chunksize 20000 --id-column 样本编号
+    python cotton_cli.py samples.csv -o output/ --report-format html --zip
+    python cotton_cli.py samples.parquet -o output/ --workers 32 --parallel-chunk 2000
+    python cotton_cli.py samples.csv -o output/ --store cotton_samples.db --field-column 田块编号 --date-column 采样日期
+
+输入表每行一个样本，检测项目列名与 RULES_DB 一致（如 "有机质 g/kg"、"碱解氮 ppm"），
+另可包含区域列（北疆/南疆）和面积列（亩）。
+"""
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from datetime import date
+
+import pandas as pd
+
+from cotton_core import (
+    REGION_PROFILES,
+    REPORT_EXTENSIONS,
+    ReportArchive,
+    assess_sample,
+    assessment_cache_info,
+    iter_samples,
+    render_report,
+    report_name,
+)
+from cotton_parallel import ParallelAssessor
+from cotton_store import SampleStore, normalize_date
+
+# 建议明细表的列及类型（固定类型，保证分块写出的 Parquet 结构一致）
+RECOMMENDATION_COLUMNS = {
+    "样本编号": "string",
+    "区域": "string",
+    "面积(亩)": "float64",
+    "养分": "string",
+    "状态": "string",
+    "当前值": "float64",
+    "目标范围": "string",
+    "缺乏量(kg/亩)": "float64",
+    "缺乏量(ppm)": "float64",
+    "推荐肥料": "string",
+    "肥料用量": "string",
+    "建议": "string",
+}
+
+
+def read_chunks(path, chunksize):
+    """按块读取 CSV/Parquet 样本表，内存占用与文件大小无关"""
+    if path.lower().endswith(".parquet"):
+        import pyarrow.parquet as pq
+        parquet_file = pq.ParquetFile(path)
+        offset = 0
+        for batch in parquet_file.iter_batches(batch_size=chunksize):
+            chunk = batch.to_pandas()
+            chunk.index = pd.RangeIndex(offset, offset + len(chunk))
+            offset += len(chunk)
+            yield chunk
+    else:
+        yield from pd.read_csv(path, chunksize=chunksize)
+
+
+class RecommendationWriter:
+    """分块追加写出建议明细（CSV 或 Parquet）"""
+
+    def __init__(self, path):
+        self.path = path
+        self.is_parquet = path.lower().endswith(".parquet")
+        self._parquet_writer = None
+        self._header_written = False
+
+    def write(self, rows):
+        frame = pd.DataFrame(rows, columns=list(RECOMMENDATION_COLUMNS)).astype(RECOMMENDATION_COLUMNS)
+        if self.is_parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self._parquet_writer is None:
+                self._parquet_writer = pq.ParquetWriter(self.path, table.schema)
+            self._parquet_writer.write_table(table)
+        else:
+            frame.to_csv(self.path, mode="a" if self._header_written else "w",
+                         header=not self._header_written, index=False, encoding="utf-8-sig")
+            self._header_written = True
+
+    def close(self):
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+
+
+def flatten_recommendations(sample_id, region, area_mu, fertilizer_recs):
+    """将单个样本的嵌套建议展开为明细行"""
+    rows = []
+    for rec in fertilizer_recs:
+        kb = rec.get("知识库建议", {})
+        calc = rec.get("通用计算建议", {})
+        amounts = "; ".join(
+            f"{fert['fertilizer']} {fert['actual_per_mu']:.2f} kg/亩"
+            for fert in calc.get("肥料用量", [])
+        )
+        rows.append({
+            "样本编号": str(sample_id),
+            "区域": region,
+            "面积(亩)": area_mu,
+            "养分": rec["养分"],
+            "状态": rec["状态"],
+            "当前值": rec["当前值"],
+            "目标范围": rec["目标范围"],
+            "缺乏量(kg/亩)": rec["缺乏量(kg/亩)"],
+            "缺乏量(ppm)": rec["缺乏量(ppm)"],
+            "推荐肥料": kb.get("推荐肥料"),
+            "肥料用量": amounts or None,
+            "建议": rec.get("建议"),
+        })
+    return rows
+
+
+def run_batch(input_path, output_dir, chunksize=10000, region_column="区域", area_column="面积",
+              id_column=None, default_region="北疆", write_reports=True, output_format=None,
+              report_format="text", zip_reports=False, workers=1, parallel_chunk=1000,
+              store_path=None, field_column="田块编号", date_column="采样日期"):
+    """
+    批量评估样本表并写出结果
+    report_format: 方案文本格式（text/markdown/html）
+    zip_reports: 为 True 时所有方案流式写入 reports.zip，而不是逐个文件
+    workers: 并行进程数，1 表示在当前进程中逐个计算
+    parallel_chunk: 并行时每次分发给子进程的样本数（样本跨读取块连续分发，读取块大小不限制同时工作的进程数）
+    store_path: 样本历史库路径，给出时每个样本连同田块编号、采样日期一起存入库中
+    field_column / date_column: 田块编号列和采样日期列（缺少田块编号时使用样本编号，缺少日期时使用当天；
+        日期无法识别的样本在标准错误输出中逐行提示，不存入历史库）
+    返回: 处理的样本数
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    if output_format is None:
+        output_format = "parquet" if input_path.lower().endswith(".parquet") else "csv"
+    writer = RecommendationWriter(os.path.join(output_dir, f"recommendations.{output_format}"))
+    report_dir = os.path.join(output_dir, "reports")
+    archive = None
+    if write_reports and zip_reports:
+        archive = ReportArchive(os.path.join(output_dir, "reports.zip"), report_format)
+    elif write_reports:
+        os.makedirs(report_dir, exist_ok=True)
+
+    assessor = None
+    if workers > 1:
+        # 并行时报告在子进程中渲染，主进程只负责写出
+        assessor = ParallelAssessor(workers, parallel_chunk, report_format if write_reports else None)
+
+    store = SampleStore(store_path) if store_path else None
+    today = date.today().isoformat()
+    # 各样本的 (田块编号, 采样日期)，按样本顺序排队，与按输入顺序产出的评估结果一一对应
+    row_keys = deque()
+
+    def read_samples():
+        """逐块读取样本表，跨块连续产出样本（并行时各块的样本进入同一个进程池，块边界处不等待）"""
+        for chunk in read_chunks(input_path, chunksize):
+            if store is not None:
+                # iter_samples 每行产出一个样本，田块编号和日期按行顺序对应
+                fields = chunk[field_column].tolist() if field_column in chunk.columns else [None] * len(chunk)
+                dates = chunk[date_column].tolist() if date_column in chunk.columns else [None] * len(chunk)
+                row_keys.extend(zip(fields, dates))
+            yield from iter_samples(chunk, region_column, area_column, id_column, default_region)
+
+    sample_count = 0
+    rows = []
+    records = []
+    # 已写出的报告文件名（样本编号重复时加序号，不覆盖之前的报告）
+    used_names = set()
+    try:
+        samples = read_samples()
+        if assessor is not None:
+            assessed = assessor.map(samples)
+        else:
+            # 相同区域、面积和检测值的样本直接复用缓存结果
+            assessed = (
+                (sample_id, region, area_mu) + assess_sample(measurements, region, area_mu)[:2] + (None,)
+                for sample_id, region, area_mu, measurements in samples
+            )
+        for sample_id, region, area_mu, results, recs, report in assessed:
+            rows.extend(flatten_recommendations(sample_id, region, area_mu, recs))
+            if store is not None:
+                field_id, sampled_on = row_keys.popleft()
+                if pd.isna(field_id) or str(field_id).strip() == "":
+                    field_id = sample_id
+                if pd.isna(sampled_on) or str(sampled_on).strip() == "":
+                    sampled_on = today
+                try:
+                    sampled_on = normalize_date(sampled_on)
+                except ValueError as e:
+                    # 日期无法识别的样本照常生成建议，只是不存入历史库，其余样本继续处理
+                    print(f"样本 {sample_id}：{e}，未存入历史库", file=sys.stderr)
+                else:
+                    records.append((field_id, region, sampled_on, area_mu, results, recs))
+            if write_reports:
+                name = report_name(sample_id, used_names)
+                if archive is not None and report is not None:
+                    archive.add_file(name + REPORT_EXTENSIONS[report_format], report)
+                elif archive is not None:
+                    archive.add(name, region, recs, area_mu)
+                else:
+                    path = os.path.join(report_dir, name + REPORT_EXTENSIONS[report_format])
+                    with open(path, "w", encoding="utf-8") as f:
+                        if report is not None:
+                            f.write(report)
+                        else:
+                            render_report(f, region, recs, area_mu, report_format)
+            sample_count += 1
+            # 每 chunksize 个样本写出一次明细和历史记录
+            if sample_count % chunksize == 0:
+                writer.write(rows)
+                rows = []
+                if store is not None:
+                    store.save_many(records)
+                    records = []
+        # 写出最后不足一块的部分（没有样本时也写出表头）
+        if sample_count % chunksize or not sample_count:
+            writer.write(rows)
+            if store is not None:
+                store.save_many(records)
+    finally:
+        writer.close()
+        if store is not None:
+            store.close()
+        if archive is not None:
+            archive.close()
+        if assessor is not None:
+            assessor.close()
+    return sample_count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="新疆棉田土壤养分批量评估（命令行）")
+    parser.add_argument("input", help="样本表路径（.csv 或 .parquet）")
+    parser.add_argument("-o", "--output-dir", default="output", help="输出目录（默认 output）")
+    parser.add_argument("--chunksize", type=int, default=10000, help="每块读取的样本数（默认 10000）")
+    parser.add_argument("--region-column", default="区域", help="区域列名（默认 区域）")
+    parser.add_argument("--area-column", default="面积", help="面积列名（默认 面积，单位亩）")
+    parser.add_argument("--id-column", default=None, help="样本编号列名（默认使用行号）")
+    parser.add_argument("--default-region", default="北疆", choices=list(REGION_PROFILES),
+                        help="缺少区域列或区域无效时使用的区域")
+    parser.add_argument("--output-format", choices=["csv", "parquet"], default=None,
+                        help="建议明细输出格式（默认与输入相同）")
+    parser.add_argument("--no-reports", action="store_true", help="不生成每个样本的方案文本")
+    parser.add_argument("--report-format", choices=list(REPORT_EXTENSIONS), default="text",
+                        help="方案文本格式（默认 text）")
+    parser.add_argument("--zip", action="store_true", help="将所有方案写入 reports.zip")
+    parser.add_argument("--workers", type=int, default=1, help="并行进程数（默认 1，不并行）")
+    parser.add_argument("--parallel-chunk", type=int, default=1000,
+                        help="并行时每次分发给子进程的样本数（默认 1000）")
+    parser.add_argument("--store", default=None, help="样本历史库路径（SQLite），给出时保存每个样本的评估结果")
+    parser.add_argument("--field-column", default="田块编号", help="田块编号列名（默认 田块编号）")
+    parser.add_argument("--date-column", default="采样日期", help="采样日期列名（默认 采样日期）")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    count = run_batch(
+        args.input, args.output_dir, args.chunksize, args.region_column, args.area_column,
+        args.id_column, args.default_region, not args.no_reports, args.output_format,
+        args.report_format, args.zip, args.workers, args.parallel_chunk,
+        args.store, args.field_column, args.date_column,
+    )
+    elapsed = time.perf_counter() - start
+    print(f"完成：共处理 {count} 个样本，用时 {elapsed:.1f} 秒，结果保存在 {args.output_dir}")
+    if args.workers <= 1:
+        cache = assessment_cache_info()
+        print(f"评估缓存：命中 {cache.hits} 次，未命中 {cache.misses} 次")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,277 @@
+"""
+新疆棉田土壤养分专家系统 - 紧凑列式评估结果
+evaluate_soil 为每个检测项目返回一个字典（中文键 + 等级字符串），综合建议里还有嵌套字典和格式化好的
+"12-20"、"46%" 等字符串，批量保存上百万个样本的结果要占用数 GB 内存。
+
+ColumnarResults 把所有样本的评估结果按列保存在 array 数组中：
+    检测项目、评估等级、状态    int8 编码（对应 items / grades / STATUS_LABELS 词表）
+    检测数值                    float64（与原始输入一致，分级边界判断不受精度影响）
+    缺乏量 (kg/亩)              float32（原结果保留 3 位小数，float32 足够精确还原）
+    样本区域、面积              每个样本一项，区域为 RegionProfile 词表编码
+每条检测结果约 19 字节，不再为每条结果创建字典和字符串；需要展示或导出时，
+再按需把单个样本还原为 evaluate_soil 格式的结果、综合建议或报告文本。
+
+用法示例：
+    columns = ColumnarResults.from_samples(iter_samples(frame, id_column="样本编号"))
+    columns.sample_results(0)        # 与 evaluate_soil 的结果相同
+    columns.recommendations(0)       # 与 generate_comprehensive_recommendations 的结果相同
+    columns.summary_frame()          # 批量汇总表（与 summarize_assessment 一致）
+    columns.to_arrow()               # pyarrow.Table（字典编码列，需安装 pyarrow）
+
+内存对比见 benchmarks/bench_columnar.py。
+"""
+import bisect
+from array import array
+
+from cotton_core import (
+    export_comprehensive_advice,
+    generate_comprehensive_recommendations,
+    get_region_profile,
+    grade_status,
+)
+
+# 状态编码
+STATUS_LABELS = ("缺乏", "正常", "丰富")
+_STATUS_CODES = {label: code for code, label in enumerate(STATUS_LABELS)}
+
+
+class ResultRow:
+    """单条检测结果的只读视图（不复制数据，属性在访问时才解码）"""
+
+    __slots__ = ("_columns", "_index")
+
+    def __init__(self, columns, index):
+        self._columns = columns
+        self._index = index
+
+    @property
+    def sample_index(self):
+        return self._columns._row_sample[self._index]
+
+    @property
+    def item_name(self):
+        return self._columns.items[self._columns._item[self._index]]
+
+    @property
+    def value(self):
+        return self._columns._value[self._index]
+
+    @property
+    def grade(self):
+        return self._columns.grades[self._columns._grade[self._index]]
+
+    @property
+    def status(self):
+        return STATUS_LABELS[self._columns._status[self._index]]
+
+    @property
+    def deficiency_kg_per_mu(self):
+        return round(self._columns._deficiency[self._index], 3)
+
+    def as_dict(self):
+        """还原为 evaluate_soil 格式的字典"""
+        return {"检测项目": self.item_name, "检测数值": self.value, "评估等级": self.grade, "状态": self.status}
+
+    def __repr__(self):
+        return f"ResultRow({self.item_name!r}, {self.value!r}, {self.grade!r}, {self.status!r})"
+
+
+class ColumnarResults:
+    """多个样本评估结果的列式存储（追加写入，按行或按样本读取）"""
+
+    def __init__(self):
+        # 词表：检测项目、评估等级、区域标准（RegionProfile，按区域名称和知识库版本编码，
+        # 知识库热重载生成的同名同版本标准共用一个编码）
+        self.items = []
+        self.grades = []
+        self.profiles = []
+        self._item_codes = {}
+        self._grade_codes = {}
+        self._profile_codes = {}
+        # (区域编码, 检测项目) → 预编译的分级规则
+        self._compiled = {}
+
+        # 每个样本一项
+        self.sample_ids = []
+        self._sample_region = array("b")
+        self._sample_area = array("d")
+        self._sample_offset = array("q", [0])
+
+        # 每条检测结果一项
+        self._row_sample = array("i")
+        self._item = array("b")
+        self._value = array("d")
+        self._grade = array("b")
+        self._status = array("b")
+        self._deficiency = array("f")
+
+    @classmethod
+    def from_samples(cls, samples):
+        """由 (样本编号, 区域, 面积, 检测值字典) 序列（如 iter_samples 的输出）构建"""
+        columns = cls()
+        columns.extend(samples)
+        return columns
+
+    def _code(self, vocabulary, codes, key, value=None):
+        code = codes.get(key)
+        if code is None:
+            if len(vocabulary) >= 127:
+                raise ValueError("词表超过 int8 编码范围")
+            code = codes[key] = len(vocabulary)
+            vocabulary.append(key if value is None else value)
+        return code
+
+    def _compile(self, region_code, profile, item_name):
+        """预编译一个区域+检测项目的分级规则：阈值、等级编码、状态编码、目标下限、换算系数"""
+        thresholds, grades = profile.rules[item_name]
+        grades = tuple(grades) + ("异常",)
+        standard = profile.standards.get(item_name)
+        compiled = (
+            self._code(self.items, self._item_codes, item_name),
+            thresholds,
+            tuple(self._code(self.grades, self._grade_codes, grade) for grade in grades),
+            tuple(_STATUS_CODES[grade_status(grade)] for grade in grades),
+            standard["target_range"][0] if standard is not None else None,
+            profile.kb.soil_conversion,
+        )
+        self._compiled[(region_code, item_name)] = compiled
+        return compiled
+
+    def append(self, sample_id, region, area_mu, measurements):
+        """评估一个样本并追加结果（分级规则与 evaluate_soil、calculate_deficiency 一致），返回样本序号"""
+        profile = get_region_profile(region)
+        region_code = self._code(self.profiles, self._profile_codes, (profile.name, profile.kb.version), profile)
+        sample_index = len(self.sample_ids)
+        rules = profile.rules
+        compiled_rules = self._compiled
+        for item_name, value in measurements.items():
+            if item_name not in rules or value is None:
+                continue
+            compiled = compiled_rules.get((region_code, item_name)) or self._compile(region_code, profile, item_name)
+            item_code, thresholds, grade_codes, status_codes, target_min, conversion = compiled
+            index = bisect.bisect_right(thresholds, value)
+            if not 0 <= index < len(grade_codes) - 1:
+                index = len(grade_codes) - 1
+            if target_min is None:
+                deficiency = float("nan")
+            elif value >= target_min:
+                deficiency = 0.0
+            else:
+                deficiency = round((target_min - value) * conversion, 3)
+            self._row_sample.append(sample_index)
+            self._item.append(item_code)
+            self._value.append(value)
+            self._grade.append(grade_codes[index])
+            self._status.append(status_codes[index])
+            self._deficiency.append(deficiency)
+        self.sample_ids.append(sample_id)
+        self._sample_region.append(region_code)
+        self._sample_area.append(area_mu)
+        self._sample_offset.append(len(self._value))
+        return sample_index
+
+    def extend(self, samples):
+        for sample_id, region, area_mu, measurements in samples:
+            self.append(sample_id, region, area_mu, measurements)
+
+    def __len__(self):
+        """检测结果条数"""
+        return len(self._value)
+
+    @property
+    def sample_count(self):
+        return len(self.sample_ids)
+
+    @property
+    def nbytes(self):
+        """列数据占用的字节数（不含样本编号和词表）"""
+        arrays = (self._sample_region, self._sample_area, self._sample_offset, self._row_sample,
+                  self._item, self._value, self._grade, self._status, self._deficiency)
+        return sum(a.itemsize * len(a) for a in arrays)
+
+    def row(self, index):
+        return ResultRow(self, index)
+
+    def rows(self, sample_index=None):
+        """逐条检测结果的视图；sample_index 指定时只返回该样本的结果"""
+        if sample_index is None:
+            start, stop = 0, len(self)
+        else:
+            start, stop = self._sample_offset[sample_index], self._sample_offset[sample_index + 1]
+        return [ResultRow(self, i) for i in range(start, stop)]
+
+    def sample(self, sample_index):
+        """样本信息：(样本编号, RegionProfile, 面积)"""
+        return (self.sample_ids[sample_index], self.profiles[self._sample_region[sample_index]],
+                self._sample_area[sample_index])
+
+    def sample_results(self, sample_index):
+        """还原单个样本的评估结果（与 evaluate_soil 的返回值相同）"""
+        return [row.as_dict() for row in self.rows(sample_index)]
+
+    def recommendations(self, sample_index):
+        """按需生成单个样本的综合施肥建议"""
+        _, profile, area_mu = self.sample(sample_index)
+        return generate_comprehensive_recommendations(self.sample_results(sample_index), profile, area_mu)
+
+    def report(self, sample_index, fmt="text"):
+        """按需生成单个样本的施肥方案文本"""
+        _, profile, area_mu = self.sample(sample_index)
+        return export_comprehensive_advice(profile, self.recommendations(sample_index), area_mu, fmt)
+
+    def summary_frame(self):
+        """批量汇总表（每个样本一行，列与 summarize_assessment 相同）"""
+        import pandas as pd
+
+        lacking_code = _STATUS_CODES["缺乏"]
+        abundant_code = _STATUS_CODES["丰富"]
+        nutrient_names = [item_name.split()[0] for item_name in self.items]
+        rows = []
+        for sample_index, sample_id in enumerate(self.sample_ids):
+            start, stop = self._sample_offset[sample_index], self._sample_offset[sample_index + 1]
+            lacking = [nutrient_names[self._item[i]] for i in range(start, stop) if self._status[i] == lacking_code]
+            rows.append({
+                "样本编号": sample_id,
+                "区域": self.profiles[self._sample_region[sample_index]].name,
+                "面积(亩)": self._sample_area[sample_index],
+                "检测项数": stop - start,
+                "缺乏项数": len(lacking),
+                "丰富项数": sum(1 for i in range(start, stop) if self._status[i] == abundant_code),
+                "缺乏养分": "、".join(lacking),
+            })
+        return pd.DataFrame(rows)
+
+    def to_numpy(self):
+        """各列的 numpy 数组（与内部数组共享内存，不复制）"""
+        import numpy as np
+
+        return {
+            "sample": np.frombuffer(self._row_sample, dtype=np.int32),
+            "item": np.frombuffer(self._item, dtype=np.int8),
+            "value": np.frombuffer(self._value, dtype=np.float64),
+            "grade": np.frombuffer(self._grade, dtype=np.int8),
+            "status": np.frombuffer(self._status, dtype=np.int8),
+            "deficiency_kg_per_mu": np.frombuffer(self._deficiency, dtype=np.float32),
+        }
+
+    def to_arrow(self):
+        """转换为 pyarrow.Table（检测项目、等级、状态、区域为字典编码列），可直接写入 Parquet"""
+        import numpy as np
+        import pyarrow as pa
+
+        columns = self.to_numpy()
+        sample = columns["sample"]
+        regions = np.frombuffer(self._sample_region, dtype=np.int8)[sample]
+
+        def dictionary(codes, labels):
+            return pa.DictionaryArray.from_arrays(pa.array(codes, type=pa.int8()), pa.array(labels, type=pa.string()))
+
+        return pa.table({
+            "样本序号": pa.array(sample),
+            "区域": dictionary(regions, [profile.name for profile in self.profiles]),
+            "检测项目": dictionary(columns["item"], self.items),
+            "检测数值": pa.array(columns["value"]),
+            "评估等级": dictionary(columns["grade"], self.grades),
+            "状态": dictionary(columns["status"], list(STATUS_LABELS)),
+            "缺乏量(kg/亩)": pa.array(columns["deficiency_kg_per_mu"]),
+        })
@@ -0,0 +1,917 @@
+"""
+新疆棉田土壤养分专家系统 - 计算核心
+包含肥料知识库、养分评估与施肥量计算、建议生成和导出，不依赖 streamlit，
+可被 cotton_expert.py（网页）和 cotton_cli.py（命令行批处理）共同调用。
+
+导入本模块时只读取知识库文件 cotton_kb.json，不会加载 numpy/pandas（仅批量接口在调用时按需导入），
+后台进程可直接复用 FertilizerCalculator、evaluate_soil 等计算函数。
+"""
+import bisect
+import functools
+import hashlib
+import html
+import io
+import json
+import math
+import os
+import re
+import threading
+import time
+import zipfile
+from collections import namedtuple
+from datetime import datetime
+from types import MappingProxyType
+
+from cotton_metrics import stage
+
+# ================= 1. 知识库（cotton_kb.json） =================
+# 分级阈值、目标范围、肥料含量、利用率和施肥建议统一保存在带版本号的知识库文件中，
+# 加载时校验一次并编译为只读查找表（KnowledgeBase）。文件修改后调用 refresh_knowledge_base()
+# 即可热更新：新版本编译完成后整体替换当前引用，正在进行的评估继续使用原来的版本，互不阻塞。
+KNOWLEDGE_BASE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cotton_kb.json")
+
+# 检查知识库文件是否修改的最短间隔（秒）
+KNOWLEDGE_BASE_CHECK_INTERVAL = 2.0
+
+class KnowledgeBase:
+    """
+    编译后的知识库快照（只读）
+    每个检测项目的阈值只在文件中出现一次，评估等级（grades）和计算等级（calc_grades）共用同一组阈值
+    """
+    __slots__ = ("version", "source", "mtime", "knowledge", "principles", "rules", "standards",
+                 "fertilizer_content", "soil_conversion", "utilization_rate", "fertilizer_options",
+                 "grade_factor", "nutrient_index", "regions")
+    
+    def __init__(self, data, source=None, mtime=None):
+        """
+        data: 知识库文件解析后的字典
+        source / mtime: 文件路径和修改时间（用于热更新判断）
+        """
+        def fail(message):
+            raise ValueError(f"知识库{f' {source} ' if source else ''}无效: {message}")
+        
+        for key in ("version", "soil_conversion", "utilization_rate", "grade_factor", "fertilizer_content",
+                    "principles", "nutrients", "regions"):
+            if key not in data:
+                fail(f"缺少字段 {key}")
+        
+        fertilizer_content = {}
+        for fertilizer_type, content in data["fertilizer_content"].items():
+            if not content or any(not 0 < float(percent) <= 100 for percent in content.values()):
+                fail(f"肥料 {fertilizer_type} 的养分含量必须在 0-100% 之间")
+            fertilizer_content[fertilizer_type] = MappingProxyType({s: float(p) for s, p in content.items()})
+        utilization_rate = {key: float(rate) for key, rate in data["utilization_rate"].items()}
+        if any(not 0 < rate <= 1 for rate in utilization_rate.values()):
+            fail("肥料利用率必须在 0-1 之间")
+        
+        knowledge, rules, standards, options, index = {}, {}, {}, {}, {}
+        for item_name, nutrient in data["nutrients"].items():
+            thresholds = tuple(float(t) for t in nutrient["thresholds"])
+            grades, calc_grades = tuple(nutrient["grades"]), tuple(nutrient["calc_grades"])
+            if list(thresholds) != sorted(thresholds):
+                fail(f"{item_name} 的分级阈值必须递增")
+            if len(grades) != len(thresholds) + 1 or len(calc_grades) != len(thresholds) + 1:
+                fail(f"{item_name} 的等级数必须比阈值数多 1")
+            target_min, target_max = nutrient["target_range"]
+            if target_min > target_max:
+                fail(f"{item_name} 的目标范围下限不能大于上限")
+            if nutrient["utilization"] not in utilization_rate:
+                fail(f"{item_name} 的利用率类别 {nutrient['utilization']} 未定义")
+            symbol = nutrient["symbol"]
+            for fertilizer_type in nutrient["fertilizers"]:
+                if symbol not in fertilizer_content.get(fertilizer_type, {}):
+                    fail(f"{item_name} 的候选肥料 {fertilizer_type} 不含 {symbol}")
+            
+            knowledge[item_name] = nutrient.get("knowledge", {})
+            rules[item_name] = (thresholds, grades)
+            standards[item_name] = MappingProxyType({
+                "thresholds": thresholds,
+                "grades": calc_grades,
+                "target_range": (target_min, target_max)
+            })
+            options[item_name] = tuple(nutrient["fertilizers"])
+            
+            # 养分 → 养分符号、利用率、候选肥料及各肥料养分含量，计算时直接查表
+            utilization = utilization_rate[nutrient["utilization"]]
+            index[item_name] = MappingProxyType({
+                "symbol": symbol,
+                "utilization": utilization,
+                "utilization_label": f"{utilization*100}%",
+                "fertilizers": options[item_name],
+                "contents": MappingProxyType({
+                    fertilizer_type: (content[symbol] / 100, f"{fertilizer_type}含{symbol} {content[symbol]}%")
+                    for fertilizer_type, content in data["fertilizer_content"].items() if symbol in content
+                })
+            })
+        
+        set_ = object.__setattr__
+        set_(self, "version", str(data["version"]))
+        set_(self, "source", source)
+        set_(self, "mtime", mtime)
+        set_(self, "knowledge", knowledge)
+        set_(self, "principles", list(data["principles"]))
+        set_(self, "rules", MappingProxyType(rules))
+        set_(self, "standards", MappingProxyType(standards))
+        set_(self, "fertilizer_content", MappingProxyType(fertilizer_content))
+        set_(self, "soil_conversion", float(data["soil_conversion"]))
+        set_(self, "utilization_rate", MappingProxyType(utilization_rate))
+        set_(self, "fertilizer_options", MappingProxyType(options))
+        set_(self, "grade_factor", MappingProxyType({g: float(f) for g, f in data["grade_factor"].items()}))
+        set_(self, "nutrient_index", MappingProxyType(index))
+        # 区域标准依赖本快照，放在最后编译
+        set_(self, "regions", MappingProxyType({
+            name: RegionProfile(name, overrides, self) for name, overrides in data["regions"].items()
+        }))
+    
+    def __setattr__(self, key, value):
+        raise AttributeError("KnowledgeBase 为只读对象")
+    
+    def __repr__(self):
+        return f"KnowledgeBase(version={self.version!r}, source={self.source!r})"
+
+def load_knowledge_base(path=KNOWLEDGE_BASE_PATH):
+    """读取、校验并编译知识库文件，返回 KnowledgeBase（不替换当前版本）；文件无效时抛出 ValueError"""
+    mtime = os.stat(path).st_mtime_ns
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    try:
+        return KnowledgeBase(data, path, mtime)
+    except (KeyError, TypeError, AttributeError) as e:
+        raise ValueError(f"知识库 {path} 无效: 字段缺失或格式错误 ({type(e).__name__}: {e})") from e
+
+# 当前生效的知识库（整体替换引用，读取方无需加锁）
+_KNOWLEDGE_BASE = None
+_KNOWLEDGE_BASE_LOCK = threading.Lock()
+_KNOWLEDGE_BASE_STATE = {"checked_at": 0.0, "error": None}
+
+def current_knowledge_base():
+    """当前生效的知识库快照"""
+    return _KNOWLEDGE_BASE
+
+def reload_knowledge_base(path=None):
+    """
+    立即重新加载知识库文件并切换为新版本
+    文件无效时抛出 ValueError，当前版本保持不变
+    """
+    with _KNOWLEDGE_BASE_LOCK:
+        kb = load_knowledge_base(path or _KNOWLEDGE_BASE.source)
+        _activate_knowledge_base(kb)
+        # 评估缓存以 RegionProfile 为键，切换后清空，旧版本区域标准不再被缓存引用
+        assess_cached.cache_clear()
+        _KNOWLEDGE_BASE_STATE["error"] = None
+        return kb
+
+def refresh_knowledge_base():
+    """
+    知识库文件修改后自动热更新（至多每 KNOWLEDGE_BASE_CHECK_INTERVAL 秒检查一次文件修改时间）
+    另一线程正在加载时直接返回，不等待；新文件无效时继续使用当前版本，错误见 knowledge_base_error()
+    返回: 是否切换了新版本
+    """
+    now = time.monotonic()
+    if now - _KNOWLEDGE_BASE_STATE["checked_at"] < KNOWLEDGE_BASE_CHECK_INTERVAL:
+        return False
+    if not _KNOWLEDGE_BASE_LOCK.acquire(blocking=False):
+        return False
+    try:
+        _KNOWLEDGE_BASE_STATE["checked_at"] = now
+        kb = _KNOWLEDGE_BASE
+        try:
+            if os.stat(kb.source).st_mtime_ns == kb.mtime:
+                return False
+            _activate_knowledge_base(load_knowledge_base(kb.source))
+            assess_cached.cache_clear()
+        except (OSError, ValueError) as e:
+            _KNOWLEDGE_BASE_STATE["error"] = f"{type(e).__name__}: {e}"
+            return False
+        _KNOWLEDGE_BASE_STATE["error"] = None
+        return True
+    finally:
+        _KNOWLEDGE_BASE_LOCK.release()
+
+def knowledge_base_error():
+    """最近一次热更新失败的原因（成功时为 None）"""
+    return _KNOWLEDGE_BASE_STATE["error"]
+
+def _activate_knowledge_base(kb):
+    """
+    切换当前知识库：重新绑定模块级查找表，并在原 REGION_PROFILES 字典中逐个替换区域标准
+    （运行时注册的自定义区域按新标准重新编译）
+    """
+    global _KNOWLEDGE_BASE, FERTILIZER_KNOWLEDGE, GENERAL_PRINCIPLES, RULES_DB
+    custom = {name: profile.overrides for name, profile in REGION_PROFILES.items() if name not in kb.regions}
+    profiles = dict(kb.regions)
+    for name, overrides in custom.items():
+        profiles[name] = RegionProfile(name, {k: dict(v) for k, v in overrides.items()}, kb)
+    
+    calc = FertilizerCalculator
+    calc.NUTRIENT_STANDARDS = kb.standards
+    calc.FERTILIZER_CONTENT = kb.fertilizer_content
+    calc.SOIL_CONVERSION = kb.soil_conversion
+    calc.UTILIZATION_RATE = kb.utilization_rate
+    calc.FERTILIZER_OPTIONS = kb.fertilizer_options
+    calc.GRADE_FACTOR = kb.grade_factor
+    calc.NUTRIENT_INDEX = kb.nutrient_index
+    FERTILIZER_KNOWLEDGE = kb.knowledge
+    GENERAL_PRINCIPLES = kb.principles
+    RULES_DB = kb.rules
+    _KNOWLEDGE_BASE = kb
+    REGION_PROFILES.update(profiles)
+
+# ================= 2. 核心评估逻辑 =================
+# 基础分级标准 RULES_DB（检测项目 → (阈值, 等级)）由知识库加载，其他区域见 REGION_PROFILES
+
+def evaluate_soil(measurements, region="北疆"):
+    """
+    评估土壤养分状况
+    region: 区域名称或 RegionProfile，决定使用的分级标准
+    """
+    rules = get_region_profile(region).rules
+    results = []
+    for item_name, value in measurements.items():
+        if item_name not in rules or value is None:
+            continue
+        thresholds, grades = rules[item_name]
+        index = bisect.bisect_right(thresholds, value)
+        grade = grades[index] if 0 <= index < len(grades) else "异常"
+        
+        results.append({
+            "检测项目": item_name,
+            "检测数值": value,
+            "评估等级": grade,
+            "状态": grade_status(grade)
+        })
+    return results
+
+def grade_status(grade):
+    """根据评估等级判断状态（缺乏/丰富/正常）"""
+    if "缺" in grade or "低" in grade: 
+        return "缺乏"
+    elif "丰" in grade or "高" in grade: 
+        return "丰富"
+    return "正常"
+
+def evaluate_soil_batch(samples, region="北疆"):
+    """
+    批量评估土壤养分状况（向量化）
+    samples: DataFrame，每行一个样本，每列一个 RULES_DB 检测项目
+    region: 区域名称或 RegionProfile
+    返回: DataFrame，每个检测项目对应 "<项目>_评估等级" 与 "<项目>_状态" 两列，
+          缺测（空值）的单元格结果为空，分级结果与 evaluate_soil 一致
+    """
+    import numpy as np
+    import pandas as pd
+    
+    rules = get_region_profile(region).rules
+    columns = {}
+    for item_name in samples.columns:
+        if item_name not in rules:
+            continue
+        thresholds, grades = rules[item_name]
+        values = pd.to_numeric(samples[item_name], errors="coerce").to_numpy(dtype=float)
+        missing = np.isnan(values)
+        
+        # searchsorted(side="right") 与 bisect_right 的分级边界一致
+        index = np.searchsorted(np.asarray(thresholds, dtype=float), values, side="right")
+        index[missing] = 0
+        
+        grade_labels = np.array(grades, dtype=object)
+        status_labels = np.array([grade_status(g) for g in grades], dtype=object)
+        grade_col = grade_labels[index]
+        status_col = status_labels[index]
+        grade_col[missing] = None
+        status_col[missing] = None
+        
+        columns[f"{item_name}_评估等级"] = grade_col
+        columns[f"{item_name}_状态"] = status_col
+    return pd.DataFrame(columns, index=samples.index)
+
+def iter_samples(frame, region_column="区域", area_column="面积", id_column=None,
+                 default_region="北疆", default_area=1.0):
+    """
+    逐行读取样本表（每行一个样本）
+    返回: (样本编号, 区域, 面积, 有效检测值字典) 的迭代器
+    空值和 0 视为未检测，与网页端输入规则一致
+    """
+    item_columns = [c for c in frame.columns if c in RULES_DB]
+    for label, row in zip(frame.index, frame.to_dict("records")):
+        sample_id = row.get(id_column) if id_column else label
+        region = row.get(region_column)
+        region = region.strip() if isinstance(region, str) else None
+        if region not in REGION_PROFILES:
+            region = default_region
+        area_mu = _to_float(row.get(area_column))
+        if area_mu is None or area_mu <= 0:
+            area_mu = default_area
+        measurements = {}
+        for item_name in item_columns:
+            value = _to_float(row[item_name])
+            if value is not None and value > 0:
+                measurements[item_name] = value
+        yield sample_id, region, float(area_mu), measurements
+
+def _to_float(value):
+    """转换为浮点数，空值或非数值返回 None"""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(value) else value
+
+# ================= 3. 通用施肥量计算模块 =================
+class FertilizerCalculator:
+    """通用肥料施用量计算器"""
+    
+    # 以下查找表由当前知识库设置（见 _activate_knowledge_base），计算时优先使用区域标准所属的知识库快照：
+    # NUTRIENT_STANDARDS 养分丰缺标准、FERTILIZER_CONTENT 肥料养分含量（%）、
+    # SOIL_CONVERSION 土壤养分单位转换系数（mg/kg 到 kg/亩，耕层 20cm、容重 1.2g/cm³ 时为 0.15）、
+    # UTILIZATION_RATE 肥料利用率、FERTILIZER_OPTIONS 各养分的候选肥料（按推荐顺序）、
+    # GRADE_FACTOR 按缺乏程度调整用量的系数（其他等级按 0.8 计）、NUTRIENT_INDEX 养分 → 计算参数的预编译索引
+    NUTRIENT_STANDARDS = {}
+    FERTILIZER_CONTENT = {}
+    SOIL_CONVERSION = 0.15
+    UTILIZATION_RATE = {}
+    FERTILIZER_OPTIONS = {}
+    GRADE_FACTOR = {}
+    NUTRIENT_INDEX = {}
+    
+    @staticmethod
+    def calculate_deficiency(nutrient_name, current_value, region="北疆"):
+        """
+        计算养分缺乏量（每亩）
+        nutrient_name: 养分名称
+        current_value: 当前测定值
+        region: 区域名称或 RegionProfile，决定使用的丰缺标准
+        """
+        profile = get_region_profile(region)
+        standards = profile.standards
+        if nutrient_name not in standards:
+            return {"error": "未知养分"}
+        
+        std = standards[nutrient_name]
+        target_min, target_max = std["target_range"]
+        
+        # 判断是否需要补充
+        if current_value >= target_min:
+            deficiency_ppm = 0
+            deficiency_kg_per_mu = 0
+            status = "充足"
+        else:
+            # 计算达到目标下限的缺乏量（每kg/亩）
+            deficiency_ppm = target_min - current_value
+            deficiency_kg_per_mu = deficiency_ppm * profile.kb.soil_conversion
+            status = "缺乏"
+        
+        # 确定缺乏程度
+        thresholds = std["thresholds"]
+        index = bisect.bisect_right(thresholds, current_value)
+        grade = std["grades"][index] if 0 <= index < len(std["grades"]) else "异常"
+        
+        return {
+            "nutrient": nutrient_name,
+            "current_value": current_value,
+            "target_min": target_min,
+            "target_max": target_max,
+            "deficiency_ppm": round(deficiency_ppm, 3),
+            "deficiency_kg_per_mu": round(deficiency_kg_per_mu, 3),
+            "status": status,
+            "grade": grade
+        }
+    
+    @staticmethod
+    def calculate_fertilizer_amount(deficiency_info, fertilizer_type, area_mu=1.0, region=None):
+        """
+        计算所需肥料用量
+        deficiency_info: 缺乏信息字典
+        fertilizer_type: 肥料类型
+        area_mu: 面积（亩）
+        region: 区域名称或 RegionProfile，使用其所属的知识库版本；默认为当前知识库
+        """
+        if deficiency_info["deficiency_kg_per_mu"] <= 0:
+            return {
+                "fertilizer": fertilizer_type,
+                "amount_per_mu": 0,
+                "total_amount": 0,
+                "unit": "kg",
+                "status": "无需补充"
+            }
+        
+        # 查预编译索引获取养分符号、利用率和肥料含量
+        kb = get_region_profile(region).kb if region is not None else _KNOWLEDGE_BASE
+        entry = kb.nutrient_index.get(deficiency_info["nutrient"])
+        if entry is None:
+            return {"error": "未知养分"}
+        if fertilizer_type not in kb.fertilizer_content:
+            return {"error": "未知肥料类型"}
+        
+        nutrient_symbol = entry["symbol"]
+        utilization = entry["utilization"]
+        content_info = entry["contents"].get(fertilizer_type)
+        if content_info is None:
+            return {"error": f"肥料{fertilizer_type}不含所需养分{nutrient_symbol}"}
+        content, content_label = content_info
+        
+        # 计算理论用量（每亩）
+        deficiency_kg_per_mu = deficiency_info["deficiency_kg_per_mu"]
+        theoretical_amount_per_mu = deficiency_kg_per_mu / content
+        
+        # 考虑肥料利用率
+        actual_amount_per_mu = theoretical_amount_per_mu / utilization
+        
+        # 根据缺乏程度调整（极缺增加20%，一般缺乏不变，其他减少20%）
+        actual_amount_per_mu *= kb.grade_factor.get(deficiency_info["grade"], 0.8)
+        
+        # 计算总面积用量
+        total_amount = actual_amount_per_mu * area_mu
+        
+        return {
+            "fertilizer": fertilizer_type,
+            "content": content_label,
+            "deficiency_per_mu": round(deficiency_kg_per_mu, 3),
+            "theoretical_per_mu": round(theoretical_amount_per_mu, 2),
+            "actual_per_mu": round(actual_amount_per_mu, 2),
+            "total_amount": round(total_amount, 2),
+            "unit": "kg",
+            "area": area_mu,
+            "utilization_rate": entry["utilization_label"]
+        }
+
+# ================= 3.1 区域标准 =================
+class RegionProfile:
+    """
+    区域评估标准（预编译、只读）
+    在知识库基础标准（RULES_DB / NUTRIENT_STANDARDS）上叠加区域差异，创建后不可修改，
+    评估和计算时显式传入，多个会话或线程并发使用不同区域时互不影响，无需加锁
+    rule_hashes: 每个检测项目所依赖规则的版本哈希，规则修改后只有对应项目的哈希变化
+    """
+    __slots__ = ("name", "overrides", "rules", "standards", "rule_hashes", "kb")
+    
+    def __init__(self, name, overrides=None, kb=None):
+        """
+        name: 区域名称
+        overrides: {检测项目: {"thresholds": [...], "target_range": (下限, 上限)}}，
+                   未给出的项目和字段沿用基础标准
+        kb: 所依据的知识库快照，默认为当前知识库
+        """
+        kb = kb or _KNOWLEDGE_BASE
+        overrides = {item_name: dict(override) for item_name, override in (overrides or {}).items()}
+        unknown = set(overrides) - set(kb.rules)
+        if unknown:
+            raise ValueError(f"区域标准包含未知检测项目: {'、'.join(sorted(unknown))}")
+        
+        rules = {}
+        for item_name, (thresholds, grades) in kb.rules.items():
+            thresholds = tuple(float(t) for t in overrides.get(item_name, {}).get("thresholds", thresholds))
+            if len(thresholds) != len(grades) - 1 or list(thresholds) != sorted(thresholds):
+                raise ValueError(f"{item_name} 的分级阈值必须为 {len(grades) - 1} 个递增数值")
+            rules[item_name] = (thresholds, tuple(grades))
+        
+        standards = {}
+        for item_name, std in kb.standards.items():
+            override = overrides.get(item_name, {})
+            target_min, target_max = override.get("target_range", std["target_range"])
+            if target_min > target_max:
+                raise ValueError(f"{item_name} 的目标范围下限不能大于上限")
+            standards[item_name] = MappingProxyType({
+                "thresholds": tuple(float(t) for t in override.get("thresholds", std["thresholds"])),
+                "grades": tuple(std["grades"]),
+                "target_range": (target_min, target_max)
+            })
+        
+        object.__setattr__(self, "name", name)
+        object.__setattr__(self, "overrides", MappingProxyType(overrides))
+        object.__setattr__(self, "rules", MappingProxyType(rules))
+        object.__setattr__(self, "standards", MappingProxyType(standards))
+        object.__setattr__(self, "rule_hashes", MappingProxyType({
+            item_name: rule_hash(rules[item_name], standards.get(item_name), kb)
+            for item_name in rules
+        }))
+        object.__setattr__(self, "kb", kb)
+    
+    def __setattr__(self, key, value):
+        raise AttributeError("RegionProfile 为只读对象")
+    
+    def __reduce__(self):
+        # 按名称和区域差异重建（在接收方的当前知识库上编译），以便传给子进程
+        return RegionProfile, (self.name, {k: dict(v) for k, v in self.overrides.items()})
+    
+    def __str__(self):
+        return self.name
+    
+    def __repr__(self):
+        return f"RegionProfile({self.name!r})"
+
+def rule_hash(rule, standard=None, kb=None):
+    """
+    单个检测项目的规则版本哈希
+    只包含决定入库结果（评估等级、状态、每亩缺乏量）的分级阈值与等级、目标范围、土壤换算系数，
+    其中任一项变化都会得到不同的哈希；利用率、肥料含量等只影响施肥建议，不参与；kb 默认为当前知识库
+    """
+    kb = kb or _KNOWLEDGE_BASE
+    parts = [tuple(rule)]
+    if standard is not None:
+        parts.append((tuple(standard["thresholds"]), tuple(standard["grades"]), tuple(standard["target_range"])))
+    parts.append(kb.soil_conversion)
+    return hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()[:16]
+
+# 已注册的区域标准（由知识库 regions 编译：北疆为基础标准，南疆有机质分级与目标值较低）
+REGION_PROFILES = {}
+
+def register_region_profile(name, overrides=None):
+    """注册（或替换）自定义区域标准，返回编译好的 RegionProfile"""
+    profile = RegionProfile(name, overrides)
+    REGION_PROFILES[name] = profile
+    return profile
+
+def get_region_profile(region="北疆"):
+    """按名称获取区域标准；传入 RegionProfile 时原样返回"""
+    if isinstance(region, RegionProfile):
+        return region
+    try:
+        return REGION_PROFILES[region]
+    except KeyError:
+        raise ValueError(f"未知区域: {region}") from None
+
+_activate_knowledge_base(load_knowledge_base())
+
+# ================= 4. 集成通用计算功能的施肥建议生成 =================
+def generate_comprehensive_recommendations(results, region="北疆", area_mu=1.0):
+    """
+    生成综合施肥建议（结合知识库和通用计算）
+    """
+    recommendations = []
+    calculator = FertilizerCalculator()
+    profile = get_region_profile(region)
+    knowledge = profile.kb.knowledge
+    
+    for item in results:
+        item_name = item["检测项目"]
+        current_value = item["检测数值"]
+        status = item["状态"]
+        grade = item["评估等级"]
+        nutrient_name = item_name.split()[0]
+        
+        # 通用缺乏量计算（不传入面积参数）
+        deficiency_info = calculator.calculate_deficiency(item_name, current_value, profile)
+        
+        # 基础信息
+        rec = {
+            "养分": nutrient_name,
+            "状态": f"{status} ({grade})",
+            "当前值": current_value,
+            "目标范围": f"{deficiency_info['target_min']}-{deficiency_info['target_max']}",
+            "缺乏量(kg/亩)": deficiency_info["deficiency_kg_per_mu"],
+            "缺乏量(ppm)": deficiency_info["deficiency_ppm"]
+        }
+        
+        # 根据不同状态生成建议
+        if status == "缺乏":
+            # 获取知识库建议
+            if item_name in knowledge and "缺乏" in knowledge[item_name]:
+                kb_advice = knowledge[item_name]["缺乏"]
+                rec["知识库建议"] = {
+                    "推荐肥料": kb_advice["肥料类型"],
+                    "施用方法": "；".join(kb_advice["施用方法"]),
+                    "注意事项": kb_advice.get("注意事项", ""),
+                    "来源": kb_advice.get("来源", "")
+                }
+            
+            # 通用计算建议
+            if deficiency_info["deficiency_kg_per_mu"] > 0:
+                # 查预编译索引获取该养分的候选肥料
+                entry = profile.kb.nutrient_index.get(item_name)
+                fertilizer_options = entry["fertilizers"] if entry else ()
+                
+                if fertilizer_options:
+                    # 计算各种肥料的用量（传入面积参数）
+                    fert_calcs = []
+                    for fert in fertilizer_options:
+                        calc = calculator.calculate_fertilizer_amount(
+                            deficiency_info, fert, area_mu, profile  # 传入面积
+                        )
+                        if "error" not in calc and calc.get("total_amount", 0) > 0:
+                            fert_calcs.append(calc)
+                    
+                    if fert_calcs:
+                        rec["通用计算建议"] = {
+                            "需要补充": f"{deficiency_info['deficiency_kg_per_mu']} kg/亩（以纯养分计）",
+                            "肥料用量": fert_calcs
+                        }
+        
+        elif status == "丰富":
+            if item_name in knowledge and "丰富" in knowledge[item_name]:
+                rec["建议"] = knowledge[item_name]["丰富"]
+            else:
+                rec["建议"] = "养分充足，无需补充"
+        
+        else:  # 正常
+            rec["建议"] = "保持现有施肥管理"
+        
+        recommendations.append(rec)
+    
+    return recommendations
+
+# ================= 5. 导出功能增强 =================
+# 报告模板：每种格式一组片段，加载时预编译为格式化函数，渲染时按顺序逐段写入输出流
+_RULE = "=" * 70
+_THIN_RULE = "-" * 70
+
+REPORT_TEMPLATES = {
+    "text": {
+        "header": (_RULE + "\n新疆棉田土壤养分施肥建议方案（综合版）\n" + _RULE + "\n"
+                   "评估时间: {time}\n种植区域: {region}\n面积: {area} 亩\n" + _THIN_RULE + "\n\n"),
+        "lacking_title": "【需重点补充的养分及施用量计算】\n\n",
+        "lacking_item": "■ {name} ({status})\n  当前含量: {value} | 目标范围: {target}\n"
+                        "  养分缺乏量: {deficiency} kg/亩（纯养分）\n\n",
+        "kb": "  📚 知识库建议：\n     推荐肥料: {fertilizer}\n     施用方法: {methods}\n",
+        "kb_note": "     注意事项: {note}\n",
+        "kb_source": "     依据来源: {source}\n\n",
+        "calc": "  🧮 通用计算建议：\n     需要补充: {need}\n",
+        "fert": "     • {fertilizer}: {per_mu:.2f} kg/亩",
+        "fert_total": " (总面积{area}亩，共需{total:.2f} kg)",
+        "fert_content": " ({content})",
+        "fert_end": "\n",
+        "calc_end": "",
+        "utilization": "     注：考虑肥料利用率{rate}的推荐用量\n\n",
+        "abundant_title": "【养分充足项目】\n\n",
+        "abundant_item": "✓ {name}: {advice}\n",
+        "abundant_end": "\n",
+        "principles_title": "【综合施肥原则】\n",
+        "principle": "• {principle}\n",
+        "principles_end": "",
+        "footer": ("\n" + _THIN_RULE + "\n📊 计算说明：\n"
+                   "1. 通用计算基于：耕层深度20cm，土壤容重1.2g/cm³，1亩耕层土壤约150,000kg\n"
+                   "2. 养分换算：1 mg/kg = 0.15 kg/亩（纯养分）\n"
+                   "3. 肥料利用率参考：氮肥35%、磷肥20%、钾肥45%、微量元素10%\n"
+                   "4. 实际施肥请结合土壤质地、灌溉条件、产量目标等调整\n"
+                   + _RULE + "\n注：本建议结合知识库经验与通用计算，实际施肥请结合当地农技指导\n" + _RULE)
+    },
+    "markdown": {
+        "header": ("# 新疆棉田土壤养分施肥建议方案（综合版）\n\n"
+                   "- 评估时间: {time}\n- 种植区域: {region}\n- 面积: {area} 亩\n\n"),
+        "lacking_title": "## 需重点补充的养分及施用量计算\n\n",
+        "lacking_item": "### {name}（{status}）\n\n- 当前含量: {value} | 目标范围: {target}\n"
+                        "- 养分缺乏量: {deficiency} kg/亩（纯养分）\n\n",
+        "kb": "**📚 知识库建议**\n\n- 推荐肥料: {fertilizer}\n- 施用方法: {methods}\n",
+        "kb_note": "- 注意事项: {note}\n",
+        "kb_source": "- 依据来源: {source}\n\n",
+        "calc": "**🧮 通用计算建议**\n\n- 需要补充: {need}\n",
+        "fert": "- {fertilizer}: {per_mu:.2f} kg/亩",
+        "fert_total": " (总面积{area}亩，共需{total:.2f} kg)",
+        "fert_content": " ({content})",
+        "fert_end": "\n",
+        "calc_end": "\n",
+        "utilization": "注：考虑肥料利用率{rate}的推荐用量\n\n",
+        "abundant_title": "## 养分充足项目\n\n",
+        "abundant_item": "- ✓ {name}: {advice}\n",
+        "abundant_end": "\n",
+        "principles_title": "## 综合施肥原则\n\n",
+        "principle": "- {principle}\n",
+        "principles_end": "\n",
+        "footer": ("---\n\n### 📊 计算说明\n\n"
+                   "1. 通用计算基于：耕层深度20cm，土壤容重1.2g/cm³，1亩耕层土壤约150,000kg\n"
+                   "2. 养分换算：1 mg/kg = 0.15 kg/亩（纯养分）\n"
+                   "3. 肥料利用率参考：氮肥35%、磷肥20%、钾肥45%、微量元素10%\n"
+                   "4. 实际施肥请结合土壤质地、灌溉条件、产量目标等调整\n\n"
+                   "> 注：本建议结合知识库经验与通用计算，实际施肥请结合当地农技指导\n")
+    },
+    "html": {
+        "header": ("<!DOCTYPE html>\n<html lang=\"zh-CN\">\n<head>\n<meta charset=\"utf-8\">\n"
+                   "<title>新疆棉田土壤养分施肥建议方案</title>\n</head>\n<body>\n"
+                   "<h1>新疆棉田土壤养分施肥建议方案（综合版）</h1>\n"
+                   "<p>评估时间: {time}<br>种植区域: {region}<br>面积: {area} 亩</p>\n<hr>\n"),
+        "lacking_title": "<h2>需重点补充的养分及施用量计算</h2>\n",
+        "lacking_item": "<h3>■ {name} ({status})</h3>\n<p>当前含量: {value} | 目标范围: {target}<br>"
+                        "养分缺乏量: {deficiency} kg/亩（纯养分）</p>\n",
+        "kb": "<h4>📚 知识库建议</h4>\n<ul>\n<li>推荐肥料: {fertilizer}</li>\n<li>施用方法: {methods}</li>\n",
+        "kb_note": "<li>注意事项: {note}</li>\n",
+        "kb_source": "<li>依据来源: {source}</li>\n</ul>\n",
+        "calc": "<h4>🧮 通用计算建议</h4>\n<p>需要补充: {need}</p>\n<ul>\n",
+        "fert": "<li>{fertilizer}: {per_mu:.2f} kg/亩",
+        "fert_total": " (总面积{area}亩，共需{total:.2f} kg)",
+        "fert_content": " ({content})",
+        "fert_end": "</li>\n",
+        "calc_end": "</ul>\n",
+        "utilization": "<p>注：考虑肥料利用率{rate}的推荐用量</p>\n",
+        "abundant_title": "<h2>养分充足项目</h2>\n<ul>\n",
+        "abundant_item": "<li>✓ {name}: {advice}</li>\n",
+        "abundant_end": "</ul>\n",
+        "principles_title": "<h2>综合施肥原则</h2>\n<ul>\n",
+        "principle": "<li>{principle}</li>\n",
+        "principles_end": "</ul>\n",
+        "footer": ("<hr>\n<h3>📊 计算说明</h3>\n<ol>\n"
+                   "<li>通用计算基于：耕层深度20cm，土壤容重1.2g/cm³，1亩耕层土壤约150,000kg</li>\n"
+                   "<li>养分换算：1 mg/kg = 0.15 kg/亩（纯养分）</li>\n"
+                   "<li>肥料利用率参考：氮肥35%、磷肥20%、钾肥45%、微量元素10%</li>\n"
+                   "<li>实际施肥请结合土壤质地、灌溉条件、产量目标等调整</li>\n</ol>\n"
+                   "<p><em>注：本建议结合知识库经验与通用计算，实际施肥请结合当地农技指导</em></p>\n"
+                   "</body>\n</html>\n")
+    }
+}
+
+# 各格式报告文件的扩展名
+REPORT_EXTENSIONS = {"text": ".txt", "markdown": ".md", "html": ".html"}
+
+# 预编译：片段 → 绑定的 str.format，渲染时不再查找和解析模板
+_COMPILED_TEMPLATES = {
+    fmt: {name: fragment.format for name, fragment in fragments.items()}
+    for fmt, fragments in REPORT_TEMPLATES.items()
+}
+
+def _escape_for(fmt):
+    """各格式对文本字段的转义函数"""
+    if fmt == "html":
+        return html.escape
+    return str
+
+def render_report(sink, region, fertilizer_recs, area_mu=1.0, fmt="text", generated_at=None):
+    """
+    将综合施肥建议逐段写入 sink（任何带 write(str) 方法的对象，如文件、StringIO）
+    region: 区域名称或 RegionProfile（传入 RegionProfile 时使用其所属知识库的综合原则）
+    fmt: "text"（纯文本）、"markdown" 或 "html"
+    generated_at: 评估时间，默认当前时间
+    """
+    if fmt not in _COMPILED_TEMPLATES:
+        raise ValueError(f"未知报告格式: {fmt}")
+    t = _COMPILED_TEMPLATES[fmt]
+    esc = _escape_for(fmt)
+    write = sink.write
+    
+    generated_at = generated_at or datetime.now()
+    write(t["header"](time=generated_at.strftime('%Y-%m-%d %H:%M:%S'), region=esc(str(region)), area=area_mu))
+    
+    # 缺乏养分详细建议
+    lacking_items = [r for r in fertilizer_recs if "缺乏" in r["状态"]]
+    if lacking_items:
+        write(t["lacking_title"]())
+        for rec in lacking_items:
+            write(t["lacking_item"](name=esc(rec['养分']), status=esc(rec['状态']), value=rec['当前值'],
+                                    target=esc(rec['目标范围']), deficiency=rec['缺乏量(kg/亩)']))
+            
+            # 知识库建议
+            if "知识库建议" in rec:
+                kb = rec["知识库建议"]
+                write(t["kb"](fertilizer=esc(kb['推荐肥料']), methods=esc(kb['施用方法'])))
+                if kb['注意事项']:
+                    write(t["kb_note"](note=esc(kb['注意事项'])))
+                write(t["kb_source"](source=esc(kb['来源'])))
+            
+            # 通用计算建议
+            if "通用计算建议" in rec:
+                calc = rec["通用计算建议"]
+                write(t["calc"](need=esc(calc['需要补充'])))
+                for fert in calc["肥料用量"]:
+                    if isinstance(fert, dict) and "fertilizer" in fert:
+                        # 显示每亩用量和总用量
+                        write(t["fert"](fertilizer=esc(fert['fertilizer']), per_mu=fert.get('actual_per_mu', 0)))
+                        if area_mu > 1:
+                            write(t["fert_total"](area=area_mu, total=fert.get('total_amount', 0)))
+                        if "content" in fert:
+                            write(t["fert_content"](content=esc(fert['content'])))
+                        write(t["fert_end"]())
+                write(t["calc_end"]())
+                
+                # 获取肥料利用率
+                if calc["肥料用量"]:
+                    util_rate = calc["肥料用量"][0].get('utilization_rate', '30-50%')
+                    write(t["utilization"](rate=esc(util_rate)))
+    
+    # 丰富养分提醒
+    abundant_items = [r for r in fertilizer_recs if "丰富" in r["状态"]]
+    if abundant_items:
+        write(t["abundant_title"]())
+        for rec in abundant_items:
+            write(t["abundant_item"](name=esc(rec['养分']), advice=esc(rec.get('建议', '养分充足，无需补充'))))
+        write(t["abundant_end"]())
+    
+    # 综合原则
+    write(t["principles_title"]())
+    principles = region.kb.principles if isinstance(region, RegionProfile) else _KNOWLEDGE_BASE.principles
+    for principle in principles:
+        if fmt != "markdown":
+            principle = principle.replace('**', '')
+        write(t["principle"](principle=esc(principle)))
+    write(t["principles_end"]())
+    
+    # 计算说明
+    write(t["footer"]())
+
+def export_comprehensive_advice(region, fertilizer_recs, area_mu=1.0, fmt="text"):
+    """生成可导出的综合施肥建议文本"""
+    buffer = io.StringIO()
+    render_report(buffer, region, fertilizer_recs, area_mu, fmt)
+    return buffer.getvalue()
+
+class ReportArchive:
+    """
+    将多份报告逐份流式写入 zip 压缩包
+    每份报告边渲染边压缩写入，内存中不保留完整报告，适合成千上万个样本的批处理
+    压缩包内的文件名经 report_name 去重，重名时加序号，不会出现同名的成员
+    """
+    
+    def __init__(self, target, fmt="text"):
+        """target: zip 文件路径或可写的二进制文件对象"""
+        if fmt not in REPORT_EXTENSIONS:
+            raise ValueError(f"未知报告格式: {fmt}")
+        self.fmt = fmt
+        self._zip = zipfile.ZipFile(target, "w", compression=zipfile.ZIP_DEFLATED)
+        # 扩展名 → 已写入的文件名（不含扩展名）
+        self._used_names = {}
+    
+    def _member_name(self, name, extension):
+        """去重后的压缩包内文件名"""
+        used_names = self._used_names.setdefault(extension.lower(), set())
+        return report_name(name, used_names) + extension
+    
+    def add(self, name, region, fertilizer_recs, area_mu=1.0):
+        """写入一份报告，name 为压缩包内的文件名（不含扩展名），返回实际写入的文件名"""
+        filename = self._member_name(name, REPORT_EXTENSIONS[self.fmt])
+        entry = self._zip.open(filename, "w")
+        with io.TextIOWrapper(entry, encoding="utf-8") as sink:
+            render_report(sink, region, fertilizer_recs, area_mu, self.fmt)
+        return filename
+    
+    def add_file(self, filename, data):
+        """写入其他文件（如汇总表），data 为 str 或 bytes，返回实际写入的文件名"""
+        filename = self._member_name(*os.path.splitext(filename))
+        self._zip.writestr(filename, data)
+        return filename
+    
+    def close(self):
+        self._zip.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+
+def report_name(sample_id, used_names=None):
+    """
+    样本编号转为安全的报告文件名（不含扩展名）
+    used_names: 同一批报告已使用的文件名集合，给出时编号重复（或清理后相同）的样本依次加 _2、_3…… 后缀，
+    新文件名加入集合；按小写比较，在不区分大小写的文件系统上也不会互相覆盖
+    """
+    name = re.sub(r'[\\/:*?"<>|\s]+', "_", str(sample_id)).strip("._") or "sample"
+    if used_names is not None:
+        base = name
+        suffix = 1
+        while name.lower() in used_names:
+            suffix += 1
+            name = f"{base}_{suffix}"
+        used_names.add(name.lower())
+    return name
+
+def summarize_assessment(sample_id, region, area_mu, results):
+    """单个样本的汇总行（用于批量评估汇总表）"""
+    lacking = [item["检测项目"].split()[0] for item in results if item["状态"] == "缺乏"]
+    return {
+        "样本编号": sample_id,
+        "区域": str(region),
+        "面积(亩)": area_mu,
+        "检测项数": len(results),
+        "缺乏项数": len(lacking),
+        "丰富项数": sum(1 for item in results if item["状态"] == "丰富"),
+        "缺乏养分": "、".join(lacking)
+    }
+
+# ================= 6. 评估流程缓存 =================
+# 单个样本的评估结果：评估列表、综合建议（导出文本带有评估时间，不缓存，由调用方按需渲染）
+SampleAssessment = namedtuple("SampleAssessment", ["results", "recommendations"])
+
+# 缓存的样本数上限（按最近使用淘汰）
+ASSESSMENT_CACHE_SIZE = 4096
+
+def sample_cache_key(measurements, region="北疆", area_mu=1.0):
+    """
+    归一化样本输入，作为评估缓存的键
+    返回: (RegionProfile, 面积, ((检测项目, 数值), ...))
+    数值统一为浮点数，空值和未知项目被剔除；项目顺序保留（决定结果的展示顺序）
+    """
+    profile = get_region_profile(region)
+    items = tuple(
+        (item_name, float(value)) for item_name, value in measurements.items()
+        if item_name in profile.rules and value is not None and value == value
+    )
+    return profile, float(area_mu), items
+
+@functools.lru_cache(maxsize=ASSESSMENT_CACHE_SIZE)
+def assess_cached(cache_key):
+    """
+    按 sample_cache_key 生成的键执行 评估 → 综合建议
+    结果在调用方之间共享，不要修改返回的列表和字典；导出文本包含评估时间，每次用
+    export_comprehensive_advice / render_report 按当前时间渲染
+    """
+    profile, area_mu, items = cache_key
+    with stage("evaluate"):
+        results = evaluate_soil(dict(items), profile)
+    with stage("recommend"):
+        fertilizer_recs = generate_comprehensive_recommendations(results, profile, area_mu)
+    return SampleAssessment(results, fertilizer_recs)
+
+def assess_sample(measurements, region="北疆", area_mu=1.0):
+    """评估单个样本并生成建议（相同输入直接命中缓存）"""
+    return assess_cached(sample_cache_key(measurements, region, area_mu))
+
+def assessment_cache_info():
+    """缓存统计：hits（命中）、misses（未命中）、maxsize、currsize"""
+    return assess_cached.cache_info()
@@ -0,0 +1,257 @@
+"""
+新疆棉田土壤养分专家系统 - 网格变量施肥处方
+按网格采样点（投影坐标，单位米）对每个检测项目做反距离加权（IDW）插值，
+在每个网格单元上计算缺乏量和肥料用量，生成变量施肥处方图。
+
+插值与计算全部按块向量化（NumPy），单块内存与网格大小无关；给出输出目录时各图层直接写入
+内存映射的 .npy 文件，数百万单元的田块也不需要一次性载入内存。
+
+用法示例：
+    python cotton_grid.py points.csv -o grid/ --cell-size 5 --region 南疆
+    python cotton_grid.py points.csv -o grid/ --cell-size 2 --fertilizer 碱解氮=尿素 --format asc
+
+采样点表需包含 x、y 坐标列（米）和与 RULES_DB 一致的检测项目列（如 "有机质 g/kg"），空值视为未检测。
+"""
+import argparse
+import math
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from cotton_core import REGION_PROFILES, get_region_profile
+
+# 1 亩 = 10000/15 平方米
+SQUARE_METERS_PER_MU = 10000 / 15
+
+# 每块参与计算的 单元数 × 采样点数 上限（控制距离矩阵的内存，约 32 MB）
+CHUNK_ELEMENTS = 4_000_000
+
+# ESRI ASCII 栅格的空值
+ASC_NODATA = -9999
+
+
+class FieldGrid:
+    """田块规则网格（左下角坐标 + 单元边长，行号从北向南递增）"""
+
+    def __init__(self, xmin, ymin, cell_size, ncols, nrows):
+        if cell_size <= 0 or ncols < 1 or nrows < 1:
+            raise ValueError("网格单元边长和行列数必须为正数")
+        self.xmin = float(xmin)
+        self.ymin = float(ymin)
+        self.cell_size = float(cell_size)
+        self.ncols = int(ncols)
+        self.nrows = int(nrows)
+
+    @classmethod
+    def from_bounds(cls, xmin, ymin, xmax, ymax, cell_size):
+        """按范围生成网格（范围不是边长整数倍时向外扩展）"""
+        ncols = max(1, math.ceil((xmax - xmin) / cell_size))
+        nrows = max(1, math.ceil((ymax - ymin) / cell_size))
+        return cls(xmin, ymin, cell_size, ncols, nrows)
+
+    @property
+    def shape(self):
+        return self.nrows, self.ncols
+
+    @property
+    def cell_count(self):
+        return self.nrows * self.ncols
+
+    @property
+    def cell_area_mu(self):
+        """单个网格单元的面积（亩）"""
+        return self.cell_size ** 2 / SQUARE_METERS_PER_MU
+
+    def column_centers(self):
+        """各列单元中心的 x 坐标"""
+        return self.xmin + (np.arange(self.ncols) + 0.5) * self.cell_size
+
+    def row_centers(self, start=0, stop=None):
+        """第 start~stop-1 行单元中心的 y 坐标（第 0 行在最北）"""
+        rows = np.arange(start, self.nrows if stop is None else stop)
+        return self.ymin + (self.nrows - rows - 0.5) * self.cell_size
+
+    def __repr__(self):
+        return f"FieldGrid({self.nrows}×{self.ncols}, cell_size={self.cell_size})"
+
+
+def idw_weights(dx2, dy2, power=2.0):
+    """
+    反距离权重矩阵（单元数 × 采样点数），单元按行优先排列
+    dx2: 各列到各采样点的 x 方向距离平方（列数 × 采样点数），dy2: 各行的 y 方向距离平方（行数 × 采样点数）
+    规则网格上距离平方可分解为两者之和，每块只需一次广播加法；单元与采样点重合时插值等于实测值
+    """
+    d2 = (dy2[:, None, :] + dx2[None, :, :]).reshape(-1, dx2.shape[1])
+    np.maximum(d2, 1e-12, out=d2)
+    if power == 2:
+        return np.reciprocal(d2, out=d2)
+    return np.power(d2, -power / 2, out=d2)
+
+
+def _grade_factors(standard, kb):
+    """计算等级 → 用量调整系数（与 calculate_fertilizer_amount 一致）"""
+    return np.array([kb.grade_factor.get(grade, 0.8) for grade in standard["grades"]])
+
+
+def _layer(out_dir, name, shape, dtype=np.float32):
+    """图层数组：给出输出目录时为内存映射的 .npy 文件"""
+    if out_dir is None:
+        return np.empty(shape, dtype=dtype)
+    return np.lib.format.open_memmap(os.path.join(out_dir, name + ".npy"), mode="w+", dtype=dtype, shape=shape)
+
+
+def prescription_grid(points, grid, region="北疆", fertilizers=None, power=2.0, out_dir=None,
+                      x_column="x", y_column="y"):
+    """
+    生成变量施肥处方图
+    points: 采样点 DataFrame（坐标列 + 检测项目列）
+    grid: FieldGrid
+    fertilizers: {检测项目或养分简称: 肥料}，未指定的养分使用知识库中的第一种候选肥料
+    out_dir: 输出目录，给出时各图层写入内存映射的 .npy 文件
+    返回: (图层字典, 汇总)
+        图层字典: {图层名: (行, 列) 数组}，图层为 "<养分>_含量"、"<养分>_缺乏量"（kg/亩）、"<养分>_<肥料>"（kg/亩）
+        汇总: {养分: {"fertilizer", "total_kg", "deficient_cells", "mean_per_mu"}}
+    """
+    profile = get_region_profile(region)
+    kb = profile.kb
+    fertilizers = dict(fertilizers or {})
+    items = [c for c in points.columns if c in profile.rules]
+    if not items:
+        raise ValueError("采样点表中没有可识别的检测项目列")
+    if out_dir is not None:
+        os.makedirs(out_dir, exist_ok=True)
+
+    point_x = points[x_column].to_numpy(dtype=float)
+    point_y = points[y_column].to_numpy(dtype=float)
+    values = points[items].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+    values[values <= 0] = np.nan  # 与其他入口一致：0 视为未检测
+    measured = ~np.isnan(values)
+    values = np.where(measured, values, 0.0)
+    measured = measured.astype(float)
+
+    # 每个项目预先取出计算参数
+    plans = []
+    layers = {}
+    for k, item_name in enumerate(items):
+        nutrient = item_name.split()[0]
+        standard = profile.standards[item_name]
+        entry = kb.nutrient_index[item_name]
+        fertilizer = fertilizers.get(item_name) or fertilizers.get(nutrient) or (entry["fertilizers"] or (None,))[0]
+        if fertilizer is not None and fertilizer not in entry["contents"]:
+            raise ValueError(f"肥料{fertilizer}不含所需养分{entry['symbol']}")
+        plan = {
+            "column": k,
+            "nutrient": nutrient,
+            "fertilizer": fertilizer,
+            "target_min": standard["target_range"][0],
+            "thresholds": np.asarray(standard["thresholds"], dtype=float),
+            "factors": _grade_factors(standard, kb),
+            "rate": (1.0 / (entry["contents"][fertilizer][0] * entry["utilization"])) if fertilizer else None,
+            "value": _layer(out_dir, f"{nutrient}_含量", grid.shape).reshape(-1),
+            "deficiency": _layer(out_dir, f"{nutrient}_缺乏量", grid.shape).reshape(-1),
+            "amount": _layer(out_dir, f"{nutrient}_{fertilizer}", grid.shape).reshape(-1) if fertilizer else None,
+            "total": 0.0,
+            "deficient_cells": 0,
+        }
+        layers[f"{nutrient}_含量"] = plan["value"]
+        layers[f"{nutrient}_缺乏量"] = plan["deficiency"]
+        if fertilizer:
+            layers[f"{nutrient}_{fertilizer}"] = plan["amount"]
+        plans.append(plan)
+
+    cell_area_mu = grid.cell_area_mu
+    conversion = kb.soil_conversion
+    dx2 = np.square(np.subtract.outer(grid.column_centers(), point_x))
+    dy2 = np.square(np.subtract.outer(grid.row_centers(), point_y))
+    rows_per_chunk = max(1, CHUNK_ELEMENTS // (grid.ncols * len(point_x)))
+    for row in range(0, grid.nrows, rows_per_chunk):
+        row_stop = min(row + rows_per_chunk, grid.nrows)
+        start, stop = row * grid.ncols, row_stop * grid.ncols
+        weights = idw_weights(dx2, dy2[row:row_stop], power)
+        # 每个项目只用测过该项目的采样点：分子、分母各一次矩阵乘法
+        with np.errstate(invalid="ignore", divide="ignore"):
+            interpolated = (weights @ values) / (weights @ measured)
+        for plan in plans:
+            value = interpolated[:, plan["column"]]
+            deficiency = np.maximum(plan["target_min"] - value, 0.0) * conversion
+            plan["value"][start:stop] = value
+            plan["deficiency"][start:stop] = deficiency
+            if plan["amount"] is not None:
+                grade_index = np.searchsorted(plan["thresholds"], value, side="right")
+                amount = deficiency * plan["rate"] * plan["factors"][np.minimum(grade_index, len(plan["factors"]) - 1)]
+                plan["amount"][start:stop] = amount
+                plan["total"] += float(np.nansum(amount)) * cell_area_mu
+            plan["deficient_cells"] += int(np.count_nonzero(deficiency > 0))
+
+    summary = {}
+    for plan in plans:
+        summary[plan["nutrient"]] = {
+            "fertilizer": plan["fertilizer"],
+            "total_kg": round(plan["total"], 2),
+            "deficient_cells": plan["deficient_cells"],
+            "mean_per_mu": round(plan["total"] / (grid.cell_count * cell_area_mu), 3),
+        }
+        if out_dir is not None:
+            for array in (plan["value"], plan["deficiency"], plan["amount"]):
+                if array is not None:
+                    array.flush()
+    return {name: array.reshape(grid.shape) for name, array in layers.items()}, summary
+
+
+def write_asc(path, layer, grid, rows_per_write=1024):
+    """按 ESRI ASCII 栅格格式写出图层（空值写为 ASC_NODATA），逐块写入，适用于内存映射的大图层"""
+    with open(path, "w", encoding="ascii") as f:
+        f.write(f"ncols {grid.ncols}\nnrows {grid.nrows}\nxllcorner {grid.xmin}\nyllcorner {grid.ymin}\n"
+                f"cellsize {grid.cell_size}\nNODATA_value {ASC_NODATA}\n")
+        for row in range(0, grid.nrows, rows_per_write):
+            block = np.nan_to_num(np.asarray(layer[row:row + rows_per_write], dtype=float), nan=ASC_NODATA)
+            np.savetxt(f, block, fmt="%.4g")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="网格插值变量施肥处方")
+    parser.add_argument("points", help="采样点表（.csv 或 .parquet），包含 x、y 坐标列（米）和检测项目列")
+    parser.add_argument("-o", "--output-dir", default="grid_output", help="输出目录（默认 grid_output）")
+    parser.add_argument("--cell-size", type=float, default=5.0, help="网格单元边长（米，默认 5）")
+    parser.add_argument("--bounds", type=float, nargs=4, metavar=("XMIN", "YMIN", "XMAX", "YMAX"),
+                        help="网格范围（默认为采样点外接矩形）")
+    parser.add_argument("--region", default="北疆", choices=list(REGION_PROFILES), help="种植区域")
+    parser.add_argument("--fertilizer", action="append", default=[], metavar="养分=肥料",
+                        help="指定某养分使用的肥料，可重复，如 碱解氮=尿素")
+    parser.add_argument("--power", type=float, default=2.0, help="IDW 距离幂次（默认 2）")
+    parser.add_argument("--x-column", default="x", help="x 坐标列名（默认 x）")
+    parser.add_argument("--y-column", default="y", help="y 坐标列名（默认 y）")
+    parser.add_argument("--format", choices=["npy", "asc"], default="npy",
+                        help="处方图格式：npy（内存映射数组）或 asc（ESRI ASCII 栅格，另外写出）")
+    args = parser.parse_args(argv)
+
+    if args.points.lower().endswith(".parquet"):
+        points = pd.read_parquet(args.points)
+    else:
+        points = pd.read_csv(args.points)
+    if args.bounds:
+        grid = FieldGrid.from_bounds(*args.bounds, args.cell_size)
+    else:
+        grid = FieldGrid.from_bounds(points[args.x_column].min(), points[args.y_column].min(),
+                                     points[args.x_column].max(), points[args.y_column].max(), args.cell_size)
+    fertilizers = dict(item.split("=", 1) for item in args.fertilizer)
+
+    layers, summary = prescription_grid(points, grid, args.region, fertilizers, args.power, args.output_dir,
+                                        args.x_column, args.y_column)
+    if args.format == "asc":
+        for name, layer in layers.items():
+            write_asc(os.path.join(args.output_dir, name + ".asc"), layer, grid)
+
+    print(f"网格 {grid.nrows} 行 × {grid.ncols} 列（{grid.cell_count} 个单元，每单元 {grid.cell_area_mu:.4f} 亩）")
+    for nutrient, info in summary.items():
+        if info["fertilizer"]:
+            print(f"{nutrient}: {info['fertilizer']} 共 {info['total_kg']} kg，平均 {info['mean_per_mu']} kg/亩，"
+                  f"缺乏单元 {info['deficient_cells']} 个")
+    print(f"处方图已保存到 {args.output_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,178 @@
+"""
+新疆棉田土壤养分专家系统 - 分阶段耗时统计
+设置环境变量 COTTON_METRICS=1 后记录各阶段（评估、建议生成、表格着色、图表、导出、整页重跑等）的
+调用次数和耗时，供网页管理面板（页面地址加 ?admin=1）查看，并导出为 Prometheus 文本格式文件，
+可由 node_exporter 的 textfile 采集器读取。未开启时 stage() 返回共享的空上下文，几乎没有额外开销。
+
+用法示例：
+    from cotton_metrics import stage
+    with stage("evaluate"):
+        results = evaluate_soil(measurements, region)
+
+    COTTON_METRICS=1 COTTON_METRICS_FILE=/var/lib/node_exporter/cotton.prom streamlit run cotton_expert.py
+"""
+import os
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+
+# 是否开启统计（进程启动时读取环境变量）
+ENABLED = os.environ.get("COTTON_METRICS", "") == "1"
+
+# Prometheus 文本文件路径
+METRICS_FILE = os.environ.get("COTTON_METRICS_FILE", "cotton_metrics.prom")
+
+# 保留的最近耗时记录条数
+RECENT_SIZE = 500
+
+# 累计耗时直方图的分桶上限（秒）
+BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+_DISABLED = nullcontext()
+
+
+class _StageTimer:
+    """
+    计时上下文：退出时（包括异常退出）记录一次耗时
+    只有 Exception 计为失败；st.stop()/st.rerun()、KeyboardInterrupt 等
+    BaseException 属于控制流，照常记录耗时并向上抛出
+    """
+
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        failed = exc_type is not None and issubclass(exc_type, Exception)
+        record(self.name, time.perf_counter() - self.start, failed=failed)
+        return False
+
+
+class _StageStats:
+    __slots__ = ("count", "failures", "total", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.failures = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * len(BUCKETS)
+
+
+_lock = threading.Lock()
+_stats = {}
+_recent = deque(maxlen=RECENT_SIZE)
+
+
+def stage(name):
+    """
+    统计一个阶段的耗时：with stage("evaluate"): ...
+    未开启统计时返回空上下文
+    """
+    if not ENABLED:
+        return _DISABLED
+    return _StageTimer(name)
+
+
+def record(name, seconds, failed=False):
+    """记录一次耗时（秒）；未开启统计时忽略"""
+    if not ENABLED:
+        return
+    with _lock:
+        stats = _stats.get(name)
+        if stats is None:
+            stats = _stats[name] = _StageStats()
+        stats.count += 1
+        stats.total += seconds
+        if seconds > stats.max:
+            stats.max = seconds
+        if failed:
+            stats.failures += 1
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                stats.buckets[i] += 1
+        _recent.append((time.time(), name, seconds))
+
+
+def summary():
+    """
+    各阶段汇总（按累计耗时降序）
+    返回: [{"阶段", "次数", "失败", "平均(ms)", "最近p50(ms)", "最近p95(ms)", "最大(ms)", "累计(s)"}, ...]
+    """
+    with _lock:
+        stats = {name: (s.count, s.failures, s.total, s.max) for name, s in _stats.items()}
+        recent = list(_recent)
+    by_stage = {}
+    for _, name, seconds in recent:
+        by_stage.setdefault(name, []).append(seconds)
+    rows = []
+    for name, (count, failures, total, max_seconds) in stats.items():
+        samples = sorted(by_stage.get(name, ()))
+        p50 = samples[len(samples) // 2] if samples else 0.0
+        p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))] if samples else 0.0
+        rows.append({
+            "阶段": name, "次数": count, "失败": failures,
+            "平均(ms)": round(total / count * 1000, 3),
+            "最近p50(ms)": round(p50 * 1000, 3), "最近p95(ms)": round(p95 * 1000, 3),
+            "最大(ms)": round(max_seconds * 1000, 3), "累计(s)": round(total, 3),
+        })
+    rows.sort(key=lambda row: row["累计(s)"], reverse=True)
+    return rows
+
+
+def recent(name=None, limit=50):
+    """最近的耗时记录（新的在前）：[(时间戳, 阶段, 秒), ...]；name 指定时只返回该阶段"""
+    with _lock:
+        records = list(_recent)
+    if name is not None:
+        records = [r for r in records if r[1] == name]
+    return records[::-1][:limit]
+
+
+def reset():
+    """清空统计"""
+    with _lock:
+        _stats.clear()
+        _recent.clear()
+
+
+def prometheus_text():
+    """按 Prometheus 文本格式导出（直方图 cotton_stage_seconds + 失败计数 cotton_stage_failures_total）"""
+    with _lock:
+        stats = {name: (s.count, s.failures, s.total, list(s.buckets)) for name, s in _stats.items()}
+    lines = [
+        "# HELP cotton_stage_seconds 各阶段耗时（秒）",
+        "# TYPE cotton_stage_seconds histogram",
+    ]
+    for name, (count, _, total, buckets) in sorted(stats.items()):
+        label = name.replace("\\", "\\\\").replace('"', '\\"')
+        for bound, bucket_count in zip(BUCKETS, buckets):
+            lines.append(f'cotton_stage_seconds_bucket{{stage="{label}",le="{bound}"}} {bucket_count}')
+        lines.append(f'cotton_stage_seconds_bucket{{stage="{label}",le="+Inf"}} {count}')
+        lines.append(f'cotton_stage_seconds_sum{{stage="{label}"}} {total:.6f}')
+        lines.append(f'cotton_stage_seconds_count{{stage="{label}"}} {count}')
+    lines.append("# HELP cotton_stage_failures_total 各阶段异常退出次数")
+    lines.append("# TYPE cotton_stage_failures_total counter")
+    for name, (_, failures, _, _) in sorted(stats.items()):
+        label = name.replace("\\", "\\\\").replace('"', '\\"')
+        lines.append(f'cotton_stage_failures_total{{stage="{label}"}} {failures}')
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path=None):
+    """
+    写入 Prometheus 文本文件（先写临时文件再替换，采集器不会读到半个文件）
+    返回: 写入的路径
+    """
+    path = path or METRICS_FILE
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(prometheus_text())
+    os.replace(tmp_path, path)
+    return path
@@ -0,0 +1,112 @@
+"""
+新疆棉田土壤养分专家系统 - 多进程并行评估
+建议生成和报告渲染是逐样本的纯 Python 计算，受 GIL 限制无法用线程提速；
+这里把样本按块分发到 ProcessPoolExecutor，各进程独立计算，结果按原始顺序合并。
+样本序列边读边分发，同时在途的分块数有上限，整个批处理期间进程池保持满负荷，内存占用与样本总数无关。
+
+用法示例：
+    with ParallelAssessor(workers=32, chunk_size=2000, report_format="text") as assessor:
+        for sample_id, region, area_mu, results, recs, report in assessor.map(samples):
+            ...
+
+samples 为 iter_samples 产生的 (样本编号, 区域, 面积, 检测值字典) 序列。
+"""
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import cotton_core
+from cotton_core import assess_sample, export_comprehensive_advice, refresh_knowledge_base
+
+
+def _init_worker(region_profiles):
+    """子进程初始化：同步主进程中注册的区域标准（含自定义区域）"""
+    cotton_core.REGION_PROFILES.update(region_profiles)
+
+
+def _assess_shard(shard, report_format):
+    """在子进程中评估一块样本，返回与输入顺序一致的结果列表"""
+    # 知识库文件修改后，子进程在处理后续分块时切换到新版本
+    refresh_knowledge_base()
+    output = []
+    for sample_id, region, area_mu, measurements in shard:
+        assessment = assess_sample(measurements, region, area_mu)
+        if report_format is None:
+            report = None
+        else:
+            report = export_comprehensive_advice(region, assessment.recommendations, area_mu, report_format)
+        output.append((sample_id, region, area_mu, assessment.results, assessment.recommendations, report))
+    return output
+
+
+def _shards(samples, chunk_size):
+    iterator = iter(samples)
+    while True:
+        shard = list(islice(iterator, chunk_size))
+        if not shard:
+            return
+        yield shard
+
+
+class ParallelAssessor:
+    """多进程样本评估器（进程池在整个批处理期间复用）"""
+
+    def __init__(self, workers=None, chunk_size=1000, report_format=None, max_pending=None):
+        """
+        workers: 进程数，默认 CPU 核数
+        chunk_size: 每次分发给子进程的样本数；过小则进程间通信开销大，过大则负载不均
+        report_format: 需要在子进程中渲染的报告格式（text/markdown/html），None 表示不生成
+        max_pending: 同时在途（已提交、结果未取走）的分块数上限，默认进程数的 2 倍，
+            每个进程算完一块时下一块已在排队，又不会把整个输入读进内存
+        """
+        if chunk_size < 1:
+            raise ValueError("chunk_size 必须为正整数")
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.report_format = report_format
+        self.max_pending = max_pending or 2 * self.workers
+        if self.max_pending < 1:
+            raise ValueError("max_pending 必须为正整数")
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(dict(cotton_core.REGION_PROFILES),),
+        )
+
+    def map(self, samples):
+        """
+        并行评估样本序列，按输入顺序逐个产出
+        (样本编号, 区域, 面积, 评估结果, 综合建议, 报告文本或 None)
+        """
+        # Executor.map 会先把整个输入切块提交完；这里按需提交，在途分块数不超过 max_pending
+        pending = deque()
+        try:
+            for shard in _shards(samples, self.chunk_size):
+                if len(pending) >= self.max_pending:
+                    yield from pending.popleft().result()
+                pending.append(self._executor.submit(_assess_shard, shard, self.report_format))
+            while pending:
+                yield from pending.popleft().result()
+        finally:
+            # 调用方提前停止迭代时取消尚未开始的分块
+            for future in pending:
+                future.cancel()
+
+    def close(self):
+        self._executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def assess_frame_parallel(frame, workers=None, chunk_size=1000, report_format=None, **sample_options):
+    """
+    并行评估整个样本表，返回按行顺序排列的结果列表
+    sample_options: 传给 iter_samples 的列名等参数（region_column、area_column、id_column、default_region）
+    """
+    with ParallelAssessor(workers, chunk_size, report_format) as assessor:
+        return list(assessor.map(cotton_core.iter_samples(frame, **sample_options)))
@@ -0,0 +1,235 @@
+"""
+新疆棉田土壤养分专家系统 - 多季施肥规划模拟
+calculate_deficiency 只按一次采样结果计算当季缺乏量；这里按养分平衡逐季推算土壤速效养分的变化：
+
+    每季施肥量 = 培肥量（补足到目标下限，与 calculate_fertilizer_amount 相同，含缺乏程度系数）
+               + 维持量（预计产量的作物带走量扣除秸秆还田归还部分）
+               两者均按肥料养分含量和知识库利用率折算为肥料实物量
+    季末含量   = 季初含量 + (施入养分 × 实际利用率 − 实际带走量 + 秸秆归还量) ÷ 土壤换算系数
+
+蒙特卡洛模式下对每季的实际利用率和产量随机抽样，成千上万个情景在 NumPy 中按季整体计算，
+给出各季含量和用量的分布以及低于目标下限的概率。
+
+用法示例：
+    python cotton_simulate.py --region 南疆 --value 碱解氮=55 --value 有效磷=10 --value 速效钾=120 \\
+        --seasons 5 --yield 400 --scenarios 10000 --utilization-cv 0.2 --yield-cv 0.15
+
+说明：每种养分只按所选肥料中该养分的含量计算（与 calculate_fertilizer_amount 一致，不计复合肥中的其他养分）；
+作物带走量和秸秆中养分比例为参考值，可按当地试验结果修改 CROP_UPTAKE、STRAW_SHARE。
+"""
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+from cotton_core import REGION_PROFILES, get_region_profile
+
+# 参与模拟的检测项目（大量元素）
+SIMULATED_ITEMS = ("碱解氮 ppm", "有效磷 ppm", "速效钾 ppm")
+
+# 每生产 100 kg 籽棉吸收的养分（kg），按知识库养分符号
+CROP_UPTAKE = {"N": 5.0, "P2O5": 1.8, "K2O": 4.5}
+
+# 吸收的养分中留在秸秆里的比例（秸秆全量还田时归还土壤）
+STRAW_SHARE = {"N": 0.4, "P2O5": 0.3, "K2O": 0.65}
+
+# 随机抽样时利用率的取值范围
+UTILIZATION_BOUNDS = (0.02, 0.95)
+
+
+class SeasonSimulation:
+    """
+    多季模拟结果（数组形状中 S 为情景数、T 为季数、K 为养分数）
+    levels: (S, T+1, K) 各季初含量（最后一项为最后一季末）
+    fertilizer_kg: (S, T, K) 每季肥料实物用量（kg/亩）
+    buildup_kg / maintenance_kg: (S, T, K) 其中培肥量、维持量（kg/亩）
+    """
+
+    def __init__(self, items, fertilizers, target_min, levels, fertilizer_kg, buildup_kg, maintenance_kg, yields):
+        self.items = items
+        self.fertilizers = fertilizers
+        self.target_min = target_min
+        self.levels = levels
+        self.fertilizer_kg = fertilizer_kg
+        self.buildup_kg = buildup_kg
+        self.maintenance_kg = maintenance_kg
+        self.yields = yields
+
+    @property
+    def scenarios(self):
+        return self.levels.shape[0]
+
+    @property
+    def seasons(self):
+        return self.fertilizer_kg.shape[1]
+
+    def plan_frame(self, scenario=0):
+        """单个情景的逐季施肥计划（确定性模拟时即为规划结果）"""
+        rows = []
+        for season in range(self.seasons):
+            for k, item_name in enumerate(self.items):
+                rows.append({
+                    "季": season + 1,
+                    "养分": item_name.split()[0],
+                    "季初含量": round(float(self.levels[scenario, season, k]), 2),
+                    "肥料": self.fertilizers[k],
+                    "培肥用量(kg/亩)": round(float(self.buildup_kg[scenario, season, k]), 2),
+                    "维持用量(kg/亩)": round(float(self.maintenance_kg[scenario, season, k]), 2),
+                    "肥料用量(kg/亩)": round(float(self.fertilizer_kg[scenario, season, k]), 2),
+                    "季末含量": round(float(self.levels[scenario, season + 1, k]), 2),
+                })
+        return pd.DataFrame(rows)
+
+    def distribution_frame(self, percentiles=(5, 50, 95)):
+        """各季末含量和肥料用量的分位数，以及季末低于目标下限的情景比例"""
+        level_q = np.percentile(self.levels[:, 1:, :], percentiles, axis=0)
+        amount_q = np.percentile(self.fertilizer_kg, percentiles, axis=0)
+        below = (self.levels[:, 1:, :] < self.target_min).mean(axis=0)
+        rows = []
+        for season in range(self.seasons):
+            for k, item_name in enumerate(self.items):
+                row = {"季": season + 1, "养分": item_name.split()[0]}
+                for i, q in enumerate(percentiles):
+                    row[f"季末含量 p{q}"] = round(float(level_q[i, season, k]), 2)
+                for i, q in enumerate(percentiles):
+                    row[f"肥料用量 p{q}"] = round(float(amount_q[i, season, k]), 2)
+                row["低于目标概率"] = round(float(below[season, k]), 4)
+                rows.append(row)
+        return pd.DataFrame(rows)
+
+
+def simulate_seasons(measurements, region="北疆", seasons=5, yield_kg=400.0, straw_return=1.0, fertilizers=None,
+                     scenarios=1, utilization_cv=0.0, yield_cv=0.0, seed=None):
+    """
+    多季施肥规划模拟
+    measurements: {检测项目: 数值}，只模拟其中的 SIMULATED_ITEMS
+    yield_kg: 预计籽棉产量（kg/亩），用于计算维持量和作物带走量
+    straw_return: 秸秆还田比例（0~1）
+    fertilizers: {检测项目或养分简称: 肥料}，未指定的养分使用知识库中的第一种候选肥料
+    scenarios: 情景数；utilization_cv、yield_cv 为实际利用率和产量的变异系数（0 表示按规划值，不随机）
+    返回: SeasonSimulation
+    """
+    profile = get_region_profile(region)
+    kb = profile.kb
+    fertilizers = dict(fertilizers or {})
+    items = [item_name for item_name in SIMULATED_ITEMS if measurements.get(item_name) is not None]
+    if not items:
+        raise ValueError(f"至少需要一项检测值：{'、'.join(SIMULATED_ITEMS)}")
+    if seasons < 1 or scenarios < 1:
+        raise ValueError("季数和情景数必须为正整数")
+    if not 0 <= straw_return <= 1:
+        raise ValueError("秸秆还田比例必须在 0~1 之间")
+
+    chosen, contents, utilization, uptake, straw_share, target_min = [], [], [], [], [], []
+    thresholds, factors = [], []
+    for item_name in items:
+        entry = kb.nutrient_index[item_name]
+        standard = profile.standards[item_name]
+        nutrient = item_name.split()[0]
+        fertilizer = fertilizers.get(item_name) or fertilizers.get(nutrient) or entry["fertilizers"][0]
+        if fertilizer not in entry["contents"]:
+            raise ValueError(f"肥料{fertilizer}不含所需养分{entry['symbol']}")
+        chosen.append(fertilizer)
+        contents.append(entry["contents"][fertilizer][0])
+        utilization.append(entry["utilization"])
+        uptake.append(CROP_UPTAKE[entry["symbol"]] / 100)
+        straw_share.append(STRAW_SHARE[entry["symbol"]])
+        target_min.append(standard["target_range"][0])
+        thresholds.append(standard["thresholds"])
+        # 等级 → 用量调整系数（与 calculate_fertilizer_amount 一致）
+        factors.append([kb.grade_factor.get(grade, 0.8) for grade in standard["grades"]])
+
+    contents = np.array(contents)
+    utilization = np.array(utilization)
+    uptake = np.array(uptake)
+    net_share = 1.0 - straw_return * np.array(straw_share)
+    target_min = np.array(target_min, dtype=float)
+    conversion = kb.soil_conversion
+
+    # 维持量按预计产量规划，每季相同
+    maintenance = yield_kg * uptake * net_share / (contents * utilization)
+
+    rng = np.random.default_rng(seed)
+    shape = (scenarios, seasons, len(items))
+    if utilization_cv > 0:
+        actual_utilization = utilization * rng.normal(1.0, utilization_cv, shape)
+        np.clip(actual_utilization, *UTILIZATION_BOUNDS, out=actual_utilization)
+    else:
+        actual_utilization = np.broadcast_to(utilization, shape)
+    if yield_cv > 0:
+        yields = np.maximum(yield_kg * rng.normal(1.0, yield_cv, (scenarios, seasons)), 0.0)
+    else:
+        yields = np.full((scenarios, seasons), float(yield_kg))
+
+    levels = np.empty((scenarios, seasons + 1, len(items)))
+    levels[:, 0, :] = [float(measurements[item_name]) for item_name in items]
+    buildup_kg = np.empty(shape)
+    fertilizer_kg = np.empty(shape)
+    for season in range(seasons):
+        level = levels[:, season, :]
+        deficiency = np.maximum(target_min - level, 0.0) * conversion
+        grade_factor = np.empty_like(level)
+        for k in range(len(items)):
+            grade_index = np.searchsorted(thresholds[k], level[:, k], side="right")
+            grade_factor[:, k] = np.asarray(factors[k])[np.minimum(grade_index, len(factors[k]) - 1)]
+        buildup = deficiency / (contents * utilization) * grade_factor
+        amount = buildup + maintenance
+        buildup_kg[:, season, :] = buildup
+        fertilizer_kg[:, season, :] = amount
+
+        supplied = amount * contents * actual_utilization[:, season, :]
+        removed = yields[:, season, None] * uptake * net_share
+        levels[:, season + 1, :] = np.maximum(level + (supplied - removed) / conversion, 0.0)
+
+    return SeasonSimulation(items, chosen, target_min, levels, fertilizer_kg, buildup_kg,
+                            np.broadcast_to(maintenance, shape), yields)
+
+
+def _parse_values(pairs):
+    """--value 碱解氮=55 → {"碱解氮 ppm": 55.0}"""
+    names = {item_name.split()[0]: item_name for item_name in SIMULATED_ITEMS}
+    measurements = {}
+    for pair in pairs:
+        name, _, value = pair.partition("=")
+        item_name = names.get(name.strip(), name.strip())
+        if item_name not in SIMULATED_ITEMS:
+            raise ValueError(f"不支持模拟的检测项目: {name}")
+        measurements[item_name] = float(value)
+    return measurements
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="多季施肥规划模拟（养分平衡 + 蒙特卡洛）")
+    parser.add_argument("--value", action="append", default=[], metavar="养分=含量",
+                        help="检测值，如 碱解氮=55（可重复，支持 碱解氮/有效磷/速效钾）")
+    parser.add_argument("--region", default="北疆", choices=list(REGION_PROFILES), help="种植区域")
+    parser.add_argument("--seasons", type=int, default=5, help="模拟季数（默认 5）")
+    parser.add_argument("--yield", dest="yield_kg", type=float, default=400.0, help="预计籽棉产量 kg/亩（默认 400）")
+    parser.add_argument("--straw-return", type=float, default=1.0, help="秸秆还田比例 0~1（默认 1）")
+    parser.add_argument("--fertilizer", action="append", default=[], metavar="养分=肥料",
+                        help="指定养分使用的肥料，如 碱解氮=尿素（可重复）")
+    parser.add_argument("--scenarios", type=int, default=1, help="蒙特卡洛情景数（默认 1，即确定性规划）")
+    parser.add_argument("--utilization-cv", type=float, default=0.2, help="实际利用率变异系数（默认 0.2）")
+    parser.add_argument("--yield-cv", type=float, default=0.15, help="产量变异系数（默认 0.15）")
+    parser.add_argument("--seed", type=int, default=None, help="随机种子")
+    args = parser.parse_args(argv)
+
+    try:
+        measurements = _parse_values(args.value)
+    except ValueError as e:
+        parser.error(str(e))
+    fertilizers = dict(item.split("=", 1) for item in args.fertilizer)
+    plan = simulate_seasons(measurements, args.region, args.seasons, args.yield_kg, args.straw_return, fertilizers)
+    print(f"逐季施肥计划（{args.region}，预计产量 {args.yield_kg:g} kg/亩，秸秆还田 {args.straw_return:.0%}）：")
+    print(plan.plan_frame().to_string(index=False))
+    if args.scenarios > 1:
+        simulation = simulate_seasons(measurements, args.region, args.seasons, args.yield_kg, args.straw_return,
+                                      fertilizers, args.scenarios, args.utilization_cv, args.yield_cv, args.seed)
+        print(f"\n{args.scenarios} 个情景（利用率变异 {args.utilization_cv:.0%}，产量变异 {args.yield_cv:.0%}）：")
+        print(simulation.distribution_frame().to_string(index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
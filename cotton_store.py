@@ -0,0 +1,288 @@
+"""
+新疆棉田土壤养分专家系统 - 样本历史库
+把每个评估过的样本（田块编号、区域、采样日期、检测值、等级）保存到本地 SQLite 数据库，
+按田块+日期、区域+日期、养分+状态建立索引，可毫秒级查询某田块多年的养分变化，
+或某区域所有缺某种养分的样本，无需重新读取原始化验文件。
+
+用法示例：
+    with SampleStore("cotton_samples.db") as store:
+        store.save("F-001", "南疆", "2025-04-10", 20, assessment.results, assessment.recommendations)
+        store.field_trend("F-001", "有机质")
+        store.deficient_samples("锌", region="南疆")
+        store.reevaluate_stale()   # 修改分级阈值/目标范围/利用率后，只重算受影响的项目
+
+也可在命令行执行增量重算：
+    python cotton_store.py cotton_samples.db
+"""
+import argparse
+import os
+import re
+import sqlite3
+import sys
+import threading
+from datetime import date, datetime
+
+from cotton_core import REGION_PROFILES, FertilizerCalculator, evaluate_soil, get_region_profile
+
+# 默认数据库文件（与本文件同目录，不随启动时的工作目录变化），可用环境变量 COTTON_SAMPLES_DB 指定
+DEFAULT_DB_PATH = os.environ.get(
+    "COTTON_SAMPLES_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cotton_samples.db")
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS samples (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    field_id TEXT NOT NULL,
+    region TEXT NOT NULL,
+    sampled_on TEXT NOT NULL,
+    area_mu REAL NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_samples_field_date ON samples (field_id, sampled_on);
+CREATE INDEX IF NOT EXISTS idx_samples_region_date ON samples (region, sampled_on);
+
+CREATE TABLE IF NOT EXISTS measurements (
+    sample_id INTEGER NOT NULL REFERENCES samples (id) ON DELETE CASCADE,
+    item TEXT NOT NULL,
+    nutrient TEXT NOT NULL,
+    value REAL NOT NULL,
+    grade TEXT NOT NULL,
+    status TEXT NOT NULL,
+    deficiency_kg_per_mu REAL,
+    rule_hash TEXT,
+    PRIMARY KEY (sample_id, item)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_measurements_nutrient_status ON measurements (nutrient, status, sample_id);
+"""
+
+
+# 可识别的日期写法：2024-03-01、2024/3/1、2024.03.01、20240301，后面可带时间（空格或 T 分隔）
+_DATE_PATTERN = re.compile(r"(\d{4})([-/.])(\d{1,2})\2(\d{1,2})|(\d{4})(\d{2})(\d{2})")
+
+
+def normalize_date(value):
+    """
+    日期统一为 YYYY-MM-DD 字符串
+    字符串接受 "-"、"/"、"." 分隔或 YYYYMMDD 紧凑写法，无法识别时抛出 ValueError（说明原始值）
+    """
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, float) and value.is_integer():
+        # 表格中有空值时 pandas 把 YYYYMMDD 整数列读成浮点数
+        value = int(value)
+    text = str(value).strip()
+    match = _DATE_PATTERN.match(text)
+    if match is not None and (match.end() == len(text) or text[match.end()] in " T"):
+        if match.group(1) is not None:
+            year, month, day = match.group(1, 3, 4)
+        else:
+            year, month, day = match.group(5, 6, 7)
+        try:
+            return date(int(year), int(month), int(day)).isoformat()
+        except ValueError:
+            pass
+    raise ValueError(f"无法识别的日期：{text!r}（应为 YYYY-MM-DD、YYYY/MM/DD、YYYY.MM.DD 或 YYYYMMDD）")
+
+
+class SampleStore:
+    """
+    样本历史库（SQLite，单个连接 + 写锁，可在多个线程/会话间共享）
+    数据库在首次保存时才打开（不存在时创建）；保存之前的查询对不存在的数据库返回空结果，不会创建文件
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connection(self, create=True):
+        """打开（首次调用时）并返回数据库连接；create 为 False 且数据库文件不存在时返回 None"""
+        if self._conn is None:
+            with self._lock:
+                if self._conn is None:
+                    if not create and self.path != ":memory:" and not os.path.exists(self.path):
+                        return None
+                    self._conn = self._open()
+        return self._conn
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys = ON")
+        if self.path != ":memory:":
+            conn.execute("PRAGMA journal_mode = WAL")
+        conn.executescript(SCHEMA)
+        self._migrate(conn)
+        return conn
+
+    @staticmethod
+    def _migrate(conn):
+        """旧版数据库补充 rule_hash 列（旧记录为空，首次增量重算时全部更新）"""
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(measurements)")}
+        with conn:
+            if "rule_hash" not in columns:
+                conn.execute("ALTER TABLE measurements ADD COLUMN rule_hash TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_measurements_item_hash ON measurements (item, rule_hash)")
+
+    def save(self, field_id, region, sampled_on, area_mu, results, recommendations=None):
+        """
+        保存一个样本
+        results: evaluate_soil 的评估结果；recommendations: 综合建议（用于记录缺乏量，可省略）
+        返回: 样本 id
+        """
+        return self.save_many([(field_id, region, sampled_on, area_mu, results, recommendations)])[0]
+
+    def save_many(self, records):
+        """
+        在一个事务中批量保存样本
+        records: (田块编号, 区域, 采样日期, 面积, 评估结果, 综合建议) 的可迭代对象
+        返回: 各样本 id 列表
+        """
+        created_at = datetime.now().isoformat(timespec="seconds")
+        sample_ids = []
+        conn = self._connection()
+        with self._lock, conn:
+            for field_id, region, sampled_on, area_mu, results, recommendations in records:
+                cursor = conn.execute(
+                    "INSERT INTO samples (field_id, region, sampled_on, area_mu, created_at) VALUES (?, ?, ?, ?, ?)",
+                    (str(field_id), str(region), normalize_date(sampled_on), float(area_mu), created_at),
+                )
+                sample_id = cursor.lastrowid
+                rule_hashes = get_region_profile(region).rule_hashes
+                deficiency = {rec["养分"]: rec["缺乏量(kg/亩)"] for rec in recommendations or ()}
+                conn.executemany(
+                    "INSERT INTO measurements (sample_id, item, nutrient, value, grade, status, deficiency_kg_per_mu, rule_hash) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (sample_id, item["检测项目"], item["检测项目"].split()[0], item["检测数值"],
+                         item["评估等级"], item["状态"], deficiency.get(item["检测项目"].split()[0]),
+                         rule_hashes.get(item["检测项目"]))
+                        for item in results
+                    ],
+                )
+                sample_ids.append(sample_id)
+        return sample_ids
+
+    def field_trend(self, field_id, nutrient=None):
+        """
+        某田块历次采样的养分变化（按采样日期排序）
+        nutrient: 养分简称（如 "有机质"、"锌"），省略时返回全部项目
+        """
+        sql = (
+            "SELECT s.id AS sample_id, s.sampled_on, s.region, m.nutrient, m.item, m.value, m.grade, m.status, "
+            "m.deficiency_kg_per_mu FROM samples s JOIN measurements m ON m.sample_id = s.id "
+            "WHERE s.field_id = ?"
+        )
+        params = [str(field_id)]
+        if nutrient:
+            sql += " AND m.nutrient = ?"
+            params.append(nutrient)
+        sql += " ORDER BY s.sampled_on, s.id, m.item"
+        return self._query(sql, params)
+
+    def deficient_samples(self, nutrient, region=None, since=None, until=None):
+        """
+        缺乏某养分的样本
+        nutrient: 养分简称（如 "锌"）；region: 区域；since/until: 采样日期范围（含）
+        """
+        sql = (
+            "SELECT s.id AS sample_id, s.field_id, s.region, s.sampled_on, s.area_mu, m.value, m.grade, "
+            "m.deficiency_kg_per_mu FROM measurements m JOIN samples s ON s.id = m.sample_id "
+            "WHERE m.nutrient = ? AND m.status = '缺乏'"
+        )
+        params = [nutrient]
+        if region:
+            sql += " AND s.region = ?"
+            params.append(region)
+        if since:
+            sql += " AND s.sampled_on >= ?"
+            params.append(normalize_date(since))
+        if until:
+            sql += " AND s.sampled_on <= ?"
+            params.append(normalize_date(until))
+        sql += " ORDER BY s.sampled_on, s.id"
+        return self._query(sql, params)
+
+    def reevaluate_stale(self):
+        """
+        增量重算：只重新评估规则哈希与当前标准不一致的检测项目（等级、状态、缺乏量），
+        其他项目和样本不变；库中出现未注册的区域时跳过
+        返回: {(区域, 检测项目): 更新的记录数}
+        """
+        conn = self._connection(create=False)
+        if conn is None:
+            return {}
+        with self._lock:
+            regions = [row[0] for row in conn.execute("SELECT DISTINCT region FROM samples")]
+        profiles = {region: REGION_PROFILES[region] for region in regions if region in REGION_PROFILES}
+        item_names = dict.fromkeys(item_name for profile in profiles.values() for item_name in profile.rule_hashes)
+        updated = {}
+        for item_name in item_names:
+            # 先用 (item, rule_hash) 索引取出库中已有的哈希，与当前标准完全一致时跳过整个项目
+            current_hashes = {profile.rule_hashes[item_name] for profile in profiles.values()}
+            with self._lock:
+                stored_hashes = {row[0] for row in conn.execute(
+                    "SELECT DISTINCT rule_hash FROM measurements WHERE item = ?", (item_name,))}
+            if len(current_hashes) == 1 and stored_hashes <= current_hashes:
+                continue
+            for region, profile in profiles.items():
+                current_hash = profile.rule_hashes[item_name]
+                with self._lock, conn:
+                    stale = conn.execute(
+                        "SELECT m.sample_id, m.value FROM measurements m JOIN samples s ON s.id = m.sample_id "
+                        "WHERE s.region = ? AND m.item = ? AND (m.rule_hash IS NULL OR m.rule_hash != ?)",
+                        (region, item_name, current_hash),
+                    ).fetchall()
+                    if not stale:
+                        continue
+                    rows = []
+                    for sample_id, value in stale:
+                        result = evaluate_soil({item_name: value}, profile)[0]
+                        deficiency = FertilizerCalculator.calculate_deficiency(item_name, value, profile)
+                        rows.append((result["评估等级"], result["状态"], deficiency.get("deficiency_kg_per_mu"),
+                                     current_hash, sample_id, item_name))
+                    conn.executemany(
+                        "UPDATE measurements SET grade = ?, status = ?, deficiency_kg_per_mu = ?, rule_hash = ? "
+                        "WHERE sample_id = ? AND item = ?",
+                        rows,
+                    )
+                updated[(region, item_name)] = len(rows)
+        return updated
+
+    def _query(self, sql, params):
+        conn = self._connection(create=False)
+        if conn is None:
+            return []
+        with self._lock:
+            return [dict(row) for row in conn.execute(sql, params)]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="样本历史库增量重算（规则修改后只更新受影响的项目）")
+    parser.add_argument("database", nargs="?", default=DEFAULT_DB_PATH, help=f"数据库路径（默认 {DEFAULT_DB_PATH}）")
+    args = parser.parse_args(argv)
+
+    with SampleStore(args.database) as store:
+        updated = store.reevaluate_stale()
+    for (region, item_name), count in sorted(updated.items()):
+        print(f"{region} {item_name}: 更新 {count} 条")
+    print(f"完成：共更新 {sum(updated.values())} 条记录")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
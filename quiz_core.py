@@ -0,0 +1,668 @@
+"""
+英语选词填空 - 出题核心
+题库读取、预计算和抽样逻辑，不依赖 streamlit，可被 英语选词填空.py 和基准脚本共同调用。
+
+题库保存在 quiz_bank.jsonl（每行一道题：question / answer / translation，可附加 year 等字段），
+网页版 选词填空练习v5.html 读取同一个文件。QuestionBank 首次打开时记录每行的字节偏移并保存为
+<题库>.idx，之后启动只映射偏移索引文件（每题 8 字节，不读入内存），按题号定位到对应行再解析，
+题目文本不常驻内存；题库文件修改后 refresh() 在原实例上重新打开，不会残留旧的文件句柄和映射。
+
+AnswerPool 在每次加载题库时构建一次：答案去重后保存为元组，并建立 答案 → 序号 的索引，
+每道题抽取干扰项时只做常数次随机取数，不再遍历整个题库。
+
+ReviewScheduler 按 SM-2 记录每道题的难度系数、复习间隔和到期时间，到期题放在小顶堆中按到期先后出题。
+
+DistractorIndex 在答案池的基础上按词形挑选干扰项：对每个答案提取词数、词形变化（-ing/-ed/-ly/-s）、
+按后缀推测的词性、长度和字母三元组，按 (词数, 词形) 分桶并按长度排序；每个答案只与桶内长度相近的
+少量候选打分，保留最相似的 top_k 个作为近邻（只差大小写或空格的答案只保留一个；每个答案首次出题时
+计算并缓存，不在页面启动时一次算完）。
+出题时从近邻中随机取 k 个，干扰项与正确答案词形相近、拼写相似，不能再凭词性或长度直接排除。
+构建索引需要读一遍题库，大题库可运行 python quiz_core.py --distractors 离线算好每道题的近邻并写入题目的
+distractors 字段，出题时直接从中抽取（pick_distractors），两个前端启动时都不再遍历题库。
+"""
+import argparse
+import bisect
+import heapq
+import json
+import math
+import mmap
+import os
+import random
+import re
+import sys
+import threading
+import time
+from array import array
+
+# 默认题库文件（与本文件同目录）
+QUIZ_BANK_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "quiz_bank.jsonl")
+
+# 偏移索引文件格式版本（索引头：版本、题库文件大小、修改时间、题数）
+_INDEX_VERSION = 1
+
+
+class QuestionBank:
+    """JSONL 题库的按题号读取（偏移索引常驻内存，题目按需解析）"""
+
+    def __init__(self, path=QUIZ_BANK_FILE, index_path=None):
+        self.path = path
+        self.index_path = index_path or path + ".idx"
+        # 多个会话共用同一个实例，seek + read 和重新打开需要加锁
+        self._lock = threading.Lock()
+        self._file = None
+        self._mapping = None
+        self._offsets = None
+        self._open()
+
+    def _stat_key(self):
+        stat = os.stat(self.path)
+        return stat.st_size, stat.st_mtime_ns
+
+    def _open(self):
+        """打开题库文件和偏移索引（调用方持有锁，或实例尚未共享）"""
+        self.version = self._stat_key()
+        mapping, offsets = self._load_index(*self.version)
+        self._file = open(self.path, "rb")
+        self._mapping = mapping
+        self._offsets = offsets
+        self._count = len(offsets) - 1
+
+    def _release(self):
+        """关闭文件句柄和索引映射（调用方持有锁）"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._mapping is not None:
+            self._offsets.release()
+            self._mapping.close()
+            self._mapping = None
+        self._offsets = None
+
+    @property
+    def closed(self):
+        return self._file is None
+
+    def refresh(self):
+        """
+        题库文件修改后在原实例上重新打开（先关闭旧的文件句柄和索引映射），返回是否重新打开；
+        每次只比较一次文件大小和修改时间，可在每次运行页面时调用；已关闭的实例不会被重新打开
+        """
+        if self.closed or self._stat_key() == self.version:
+            return False
+        with self._lock:
+            if self.closed or self._stat_key() == self.version:
+                return False
+            self._release()
+            self._open()
+        return True
+
+    def reopen(self):
+        """关闭后重新打开（题库文件被替换后使用）"""
+        with self._lock:
+            self._release()
+            self._open()
+
+    def _load_index(self, size, mtime_ns):
+        """
+        读取偏移索引，返回 (内存映射, 偏移数组)（内存映射索引文件，打开耗时和内存与题数无关）；
+        索引不存在或题库文件已修改时重新扫描并保存，此时内存映射为 None
+        """
+        try:
+            with open(self.index_path, "rb") as f:
+                header = array("q")
+                header.fromfile(f, 4)
+                if tuple(header) == (_INDEX_VERSION, size, mtime_ns, header[3]):
+                    mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                    offsets = memoryview(mapping)[header.itemsize * 4:].cast("q")
+                    if len(offsets) == header[3] + 1:
+                        return mapping, offsets
+                    offsets.release()
+                    mapping.close()
+        except (OSError, EOFError, ValueError):
+            pass
+        offsets = self._scan()
+        try:
+            tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                array("q", [_INDEX_VERSION, size, mtime_ns, len(offsets) - 1]).tofile(f)
+                offsets.tofile(f)
+            os.replace(tmp_path, self.index_path)
+        except OSError:
+            # 题库目录只读时不保存索引，每次启动重新扫描
+            pass
+        return None, offsets
+
+    def _scan(self):
+        """扫描题库文件，记录每道题（非空行）的起始偏移，最后一项为文件末尾"""
+        offsets = array("q")
+        position = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                if line.strip():
+                    offsets.append(position)
+                position += len(line)
+        offsets.append(position)
+        return offsets
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        """按题号读取一道题（题号从 0 开始）"""
+        with self._lock:
+            if not 0 <= index < self._count:
+                raise IndexError(f"题号超出范围：{index}")
+            start = self._offsets[index]
+            self._file.seek(start)
+            data = self._file.read(self._offsets[index + 1] - start)
+        return json.loads(data)
+
+    def __iter__(self):
+        """按顺序逐题读取（另开文件句柄，不影响按题号读取）"""
+        with open(self.path, "rb") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def close(self):
+        with self._lock:
+            self._release()
+            self._count = 0
+
+    def __del__(self):
+        # 没有显式关闭的实例（如被替换的缓存）回收时释放文件句柄和索引映射
+        if getattr(self, "_lock", None) is not None:
+            self.close()
+
+
+class AnswerPool:
+    """题库答案池（去重后的答案元组 + 答案 → 序号索引）"""
+
+    __slots__ = ("answers", "_index")
+
+    def __init__(self, bank):
+        """bank: 题目字典的序列，每道题包含 "answer" 字段"""
+        # dict.fromkeys 去重并保留首次出现的顺序；题库中重复的答案只保留一个，干扰项不会重复
+        self.answers = tuple(dict.fromkeys(question["answer"] for question in bank))
+        self._index = {answer: i for i, answer in enumerate(self.answers)}
+
+    def __len__(self):
+        return len(self.answers)
+
+    def sample_distractors(self, correct_answer, k=3, rng=random):
+        """
+        抽取 k 个互不相同且不等于正确答案的干扰项
+        答案数远大于 k 时按序号随机取数、遇到重复或正确答案重抽，期望常数次完成；
+        可选答案不足 k 个时返回全部可选答案
+        """
+        answers = self.answers
+        exclude = self._index.get(correct_answer)
+        available = len(answers) - (exclude is not None)
+        if available <= 2 * k:
+            pool = [answer for answer in answers if answer != correct_answer]
+            return rng.sample(pool, min(k, len(pool)))
+        chosen = []
+        seen = {exclude}
+        while len(chosen) < k:
+            i = rng.randrange(len(answers))
+            if i not in seen:
+                seen.add(i)
+                chosen.append(answers[i])
+        return chosen
+
+    def build_options(self, correct_answer, k=3, rng=random):
+        """正确答案 + k 个干扰项，顺序随机"""
+        options = [correct_answer] + self.sample_distractors(correct_answer, k, rng)
+        rng.shuffle(options)
+        return options
+
+
+# ================= 干扰项相似度索引 =================
+
+# 每个答案保留的近邻数（出题时从中随机取干扰项，保证同一道题的选项有变化）
+TOP_K = 8
+
+# 各分桶中参与打分的候选范围（按长度排序后，向两侧各取的个数）
+_BUCKET_WINDOW = 24
+_WORDS_WINDOW = 8
+_ALL_WINDOW = 4
+
+# 按后缀推测词性（只用于单个单词，短语按首词判断）
+_NOUN_SUFFIXES = ("tion", "sion", "ment", "ness", "ity", "ance", "ence", "ship", "ism", "age", "ure", "ude")
+_ADJ_SUFFIXES = ("ous", "ive", "able", "ible", "al", "ful", "less", "ic", "ent", "ant", "ary", "ite")
+_PREPOSITIONS = {"in", "on", "at", "by", "for", "to", "with", "due", "contrary", "compared", "behind", "because"}
+
+
+def normalize_answer(answer):
+    """忽略大小写和多余空格后的答案，用于判断两个答案是否相同"""
+    return " ".join(answer.lower().split())
+
+
+def word_form(word):
+    """词形变化：ing / ed / ly / s / base"""
+    if len(word) > 5 and word.endswith("ing"):
+        return "ing"
+    if len(word) > 4 and word.endswith("ed"):
+        return "ed"
+    if len(word) > 4 and word.endswith("ly"):
+        return "ly"
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is", "as")):
+        return "s"
+    return "base"
+
+
+def answer_features(answer):
+    """
+    答案特征：(词数, 词形, 词性, 长度, 字母三元组集合)
+    词数 3 个及以上的短语归为一类；短语的词形取首词，词性分为介词短语和其他短语
+    """
+    words = normalize_answer(answer).split()
+    head = words[0] if words else ""
+    form = word_form(head)
+    if len(words) > 1:
+        pos = "prep" if head in _PREPOSITIONS else "phrase"
+    elif form == "ly":
+        pos = "adv"
+    elif form in ("ing", "ed"):
+        pos = "verb"
+    elif head.endswith(_NOUN_SUFFIXES):
+        pos = "noun"
+    elif head.endswith(_ADJ_SUFFIXES):
+        pos = "adj"
+    else:
+        pos = ""
+    padded = f" {' '.join(words)} "
+    grams = frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+    return min(len(words), 3), form, pos, len(padded) - 2, grams
+
+
+def similarity(a, b):
+    """两个答案特征的相似度得分（越大越容易混淆）"""
+    a_words, a_form, a_pos, a_len, a_grams = a
+    b_words, b_form, b_pos, b_len, b_grams = b
+    score = 0.0
+    if a_words == b_words:
+        score += 2
+    if a_form == b_form:
+        score += 3
+    if a_pos and a_pos == b_pos:
+        score += 2
+    if a_grams and b_grams:
+        score += 2 * len(a_grams & b_grams) / len(a_grams | b_grams)
+    return score - abs(a_len - b_len) / 8
+
+
+def pick_distractors(correct_answer, candidates, k=3, rng=random, chosen=()):
+    """
+    在已选的干扰项 chosen 之后，从候选答案中随机补足 k 个干扰项；
+    与正确答案或彼此只差大小写、空格的候选只取一个，可选候选不足时返回全部
+    """
+    chosen = list(chosen)
+    seen = {normalize_answer(answer) for answer in chosen}
+    seen.add(normalize_answer(correct_answer))
+    pool = {}
+    for answer in candidates:
+        key = normalize_answer(answer)
+        if key not in seen:
+            pool.setdefault(key, answer)
+    return chosen + rng.sample(list(pool.values()), max(0, min(k - len(chosen), len(pool))))
+
+
+class _LengthBucket:
+    """按长度排序的答案序号，用于取长度相近的候选"""
+
+    __slots__ = ("lengths", "indices")
+
+    def __init__(self, indices, features):
+        indices = sorted(indices, key=lambda i: features[i][3])
+        self.indices = indices
+        self.lengths = [features[i][3] for i in indices]
+
+    def window(self, length, width):
+        center = bisect.bisect_left(self.lengths, length)
+        return self.indices[max(0, center - width):center + width]
+
+
+class DistractorIndex(AnswerPool):
+    """按词形和拼写相似度挑选干扰项的答案索引（构建一次，各会话共用）"""
+
+    __slots__ = ("top_k", "_keys", "_features", "_buckets", "_groups", "_all", "_neighbours")
+
+    def __init__(self, bank, top_k=TOP_K):
+        super().__init__(bank)
+        self.top_k = top_k
+        self._keys = [normalize_answer(answer) for answer in self.answers]
+        self._features = [answer_features(answer) for answer in self.answers]
+        buckets = {}
+        groups = {}
+        for i, (words, form, _, _, _) in enumerate(self._features):
+            buckets.setdefault((words, form), []).append(i)
+            groups.setdefault(words, []).append(i)
+        self._buckets = {key: _LengthBucket(indices, self._features) for key, indices in buckets.items()}
+        self._groups = {key: _LengthBucket(indices, self._features) for key, indices in groups.items()}
+        self._all = _LengthBucket(range(len(self.answers)), self._features)
+        # 答案序号 → 近邻答案元组（首次查询时计算）
+        self._neighbours = {}
+
+    def _rank(self, features, key):
+        """在同桶、同词数和全体答案中取长度相近的候选打分，返回得分最高的 top_k 个答案"""
+        words, form, _, length, _ = features
+        candidates = set(self._all.window(length, _ALL_WINDOW))
+        bucket = self._buckets.get((words, form))
+        if bucket is not None:
+            candidates.update(bucket.window(length, _BUCKET_WINDOW))
+        group = self._groups.get(words)
+        if group is not None:
+            candidates.update(group.window(length, _WORDS_WINDOW))
+        keys = self._keys
+        all_features = self._features
+        # 得分相同时序号小的在前，结果与集合遍历顺序无关
+        scored = sorted(((similarity(features, all_features[j]), -j) for j in candidates), reverse=True)
+        # 与正确答案相同（忽略大小写和空格）的答案不作为干扰项，彼此只差大小写或空格的答案只保留得分最高的一个
+        seen = {key}
+        best = []
+        for _, negative in scored:
+            if keys[-negative] not in seen:
+                seen.add(keys[-negative])
+                best.append(self.answers[-negative])
+                if len(best) == self.top_k:
+                    break
+        return tuple(best)
+
+    def neighbours(self, answer):
+        """与答案最相似的 top_k 个其他答案（按相似度降序）"""
+        i = self._index.get(answer)
+        if i is None:
+            # 不在题库中的答案临时计算，不缓存
+            return self._rank(answer_features(answer), normalize_answer(answer))
+        neighbours = self._neighbours.get(i)
+        if neighbours is None:
+            neighbours = self._neighbours[i] = self._rank(self._features[i], self._keys[i])
+        return neighbours
+
+    def precompute(self):
+        """一次算完所有答案的近邻，之后每次查询只是取缓存"""
+        for answer in self.answers:
+            self.neighbours(answer)
+        return self
+
+    def sample_distractors(self, correct_answer, k=3, rng=random):
+        """
+        从最相似的 top_k 个答案中随机取 k 个干扰项
+        近邻不足 k 个时（题库很小）用其余答案补足，仍不会与正确答案或彼此重复
+        """
+        neighbours = self.neighbours(correct_answer)
+        if len(neighbours) >= k:
+            return rng.sample(neighbours, k)
+        return pick_distractors(correct_answer, self.answers, k, rng, chosen=neighbours)
+
+
+# ================= 间隔重复复习（SM-2） =================
+
+# 作答质量（SM-2 的 0-5 分）：答对、答错、直接看答案
+QUALITY_CORRECT = 4
+QUALITY_WRONG = 1
+QUALITY_SHOWN = 0
+
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+DAY_SECONDS = 86400
+# 答错或看答案的题重新学习的间隔（秒）
+RELEARN_SECONDS = 60
+
+# 题目状态（与原 status_map 的取值一致）：0 未做、1 最近一次答对、2 最近一次答错
+STATUS_NEW, STATUS_CORRECT, STATUS_WRONG = 0, 1, 2
+
+# 备份格式版本（旧版备份为 0/1/2 状态列表）
+BACKUP_VERSION = 2
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _is_number(value):
+    return (_is_int(value) or isinstance(value, float)) and math.isfinite(value)
+
+
+class Card:
+    """一道题的复习记录"""
+
+    __slots__ = ("ease", "interval", "reps", "lapses", "due", "status")
+
+    def __init__(self, ease=DEFAULT_EASE, interval=0, reps=0, lapses=0, due=0.0, status=STATUS_NEW):
+        self.ease = ease
+        self.interval = interval  # 复习间隔（天）
+        self.reps = reps  # 连续答对次数
+        self.lapses = lapses  # 累计答错次数
+        self.due = due  # 到期时间（Unix 时间戳，秒）
+        self.status = status
+
+
+class ReviewScheduler:
+    """
+    按 SM-2 安排复习：每道做过的题记录难度系数、间隔和到期时间，到期时间放在小顶堆中，
+    取下一道到期题为 O(log n)。未做过的题不占内存；统计数按状态增量维护，不再遍历整个状态列表。
+    堆中的旧记录在出堆时按到期时间是否一致判断并丢弃（惰性删除），旧记录过多时整体重建。
+    """
+
+    def __init__(self):
+        self.cards = {}
+        self._heap = []
+        self._status_counts = [0, 0, 0]
+
+    def status(self, question_id):
+        card = self.cards.get(question_id)
+        return STATUS_NEW if card is None else card.status
+
+    @property
+    def done_count(self):
+        return len(self.cards)
+
+    @property
+    def correct_count(self):
+        return self._status_counts[STATUS_CORRECT]
+
+    @property
+    def wrong_count(self):
+        return self._status_counts[STATUS_WRONG]
+
+    def _schedule(self, question_id, card):
+        heapq.heappush(self._heap, (card.due, question_id))
+        if len(self._heap) > 2 * len(self.cards) + 64:
+            self._heap = [(c.due, qid) for qid, c in self.cards.items()]
+            heapq.heapify(self._heap)
+
+    def review(self, question_id, quality, now=None):
+        """记录一次作答（quality 为 0-5 分，3 分及以上算答对），更新间隔和到期时间，返回 Card"""
+        now = time.time() if now is None else now
+        card = self.cards.get(question_id)
+        if card is None:
+            card = self.cards[question_id] = Card()
+        else:
+            self._status_counts[card.status] -= 1
+        if quality >= 3:
+            if card.reps == 0:
+                card.interval = 1
+            elif card.reps == 1:
+                card.interval = 6
+            else:
+                card.interval = round(card.interval * card.ease)
+            card.reps += 1
+            card.due = now + card.interval * DAY_SECONDS
+            card.status = STATUS_CORRECT
+        else:
+            card.reps = 0
+            card.interval = 0
+            card.lapses += 1
+            card.due = now + RELEARN_SECONDS
+            card.status = STATUS_WRONG
+        card.ease = max(MIN_EASE, card.ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+        self._status_counts[card.status] += 1
+        self._schedule(question_id, card)
+        return card
+
+    def _pop_valid(self):
+        """弹出堆顶的有效记录 (到期时间, 题号)；堆空时返回 None"""
+        heap = self._heap
+        cards = self.cards
+        while heap:
+            due, question_id = heapq.heappop(heap)
+            card = cards.get(question_id)
+            if card is not None and card.due == due:
+                return due, question_id
+        return None
+
+    def next_due(self, now=None):
+        """最早到期的题号（未到期或没有做过的题时返回 None），不改变复习记录"""
+        now = time.time() if now is None else now
+        entry = self._pop_valid()
+        if entry is None:
+            return None
+        heapq.heappush(self._heap, entry)
+        return entry[1] if entry[0] <= now else None
+
+    def next_due_time(self):
+        """最早的到期时间（没有做过的题时返回 None）"""
+        entry = self._pop_valid()
+        if entry is None:
+            return None
+        heapq.heappush(self._heap, entry)
+        return entry[0]
+
+    def due(self, now=None, limit=None):
+        """已到期的题号，按到期时间先后排列（O(k log n)，k 为返回的题数）"""
+        now = time.time() if now is None else now
+        entries = []
+        while limit is None or len(entries) < limit:
+            entry = self._pop_valid()
+            if entry is None:
+                break
+            entries.append(entry)
+            if entry[0] > now:
+                break
+        for entry in entries:
+            heapq.heappush(self._heap, entry)
+        return [question_id for due, question_id in entries if due <= now]
+
+    def to_backup(self):
+        """导出为可 JSON 序列化的备份"""
+        return {
+            "version": BACKUP_VERSION,
+            "cards": [[qid, c.ease, c.interval, c.reps, c.lapses, c.due, c.status] for qid, c in self.cards.items()],
+        }
+
+    @classmethod
+    def from_backup(cls, data, bank_size, now=None):
+        """
+        从备份恢复；也接受旧版的 0/1/2 状态列表（答对的题 1 天后到期，答错的题立即到期）
+        格式不对、题号超出题库范围或复习参数类型/取值无效时抛出 ValueError
+        """
+        now = time.time() if now is None else now
+        scheduler = cls()
+        if isinstance(data, list):
+            if len(data) != bank_size:
+                raise ValueError("状态列表长度与题库不一致")
+            for question_id, status in enumerate(data):
+                if status == STATUS_CORRECT:
+                    card = Card(interval=1, reps=1, due=now + DAY_SECONDS, status=STATUS_CORRECT)
+                elif status == STATUS_WRONG:
+                    card = Card(lapses=1, due=now, status=STATUS_WRONG)
+                elif status == STATUS_NEW:
+                    continue
+                else:
+                    raise ValueError(f"未知的题目状态：{status!r}")
+                scheduler._add(question_id, card)
+        elif isinstance(data, dict) and data.get("version") == BACKUP_VERSION:
+            cards = data.get("cards", [])
+            if not isinstance(cards, list):
+                raise ValueError("复习记录应为列表")
+            for record in cards:
+                if not isinstance(record, list) or len(record) != 7:
+                    raise ValueError(f"无效的复习记录：{record!r}")
+                question_id, ease, interval, reps, lapses, due, status = record
+                if not (_is_int(question_id) and 0 <= question_id < bank_size
+                        and _is_number(ease) and ease >= MIN_EASE
+                        and all(_is_int(n) and n >= 0 for n in (interval, reps, lapses))
+                        and _is_number(due) and due >= 0
+                        and status in (STATUS_CORRECT, STATUS_WRONG) and _is_int(status)):
+                    raise ValueError(f"无效的复习记录：{record!r}")
+                scheduler._add(question_id, Card(float(ease), interval, reps, lapses, float(due), status))
+        else:
+            raise ValueError("无法识别的备份格式")
+        heapq.heapify(scheduler._heap)
+        return scheduler
+
+    def _add(self, question_id, card):
+        """恢复备份时加入一条记录（调用方最后统一 heapify）"""
+        old = self.cards.get(question_id)
+        if old is not None:
+            self._status_counts[old.status] -= 1
+        self.cards[question_id] = card
+        self._status_counts[card.status] += 1
+        self._heap.append((card.due, question_id))
+
+
+# ================= 命令行：建立索引、离线计算干扰项、同步网页版内置题库 =================
+
+# 网页版内置题库（读取不到 quiz_bank.jsonl 时使用）的起止标记
+_EMBED_PATTERN = re.compile(r"(const FALLBACK_QUESTION_BANK = \[\r?\n)(.*?)(\r?\n\s*\];)", re.S)
+
+
+def write_distractors(bank, top_k=TOP_K):
+    """
+    离线为每道题算好近邻答案，写入题目的 "distractors" 字段（先写临时文件再替换题库文件），返回题数
+    带有该字段的题目出题时直接从中抽取干扰项，Streamlit 版和网页版都不需要在启动后构建干扰项索引；
+    修改题库后重新运行一次
+    """
+    index = DistractorIndex(bank, top_k)
+    tmp_path = f"{bank.path}.{os.getpid()}.tmp"
+    count = 0
+    with open(tmp_path, "w", encoding="utf-8", newline="\n") as f:
+        for question in bank:
+            question["distractors"] = list(index.neighbours(question["answer"]))
+            f.write(json.dumps(question, ensure_ascii=False) + "\n")
+            count += 1
+    # 先关闭题库再替换（Windows 上不能替换仍打开着的文件）；调用前已关闭的题库替换后保持关闭
+    was_open = not bank.closed
+    bank.close()
+    os.replace(tmp_path, bank.path)
+    if was_open:
+        bank.reopen()
+    return count
+
+
+def embed_bank(bank, html_path):
+    """把题库写入网页版的内置题库数组（保留网页文件原有的换行符），返回写入的题数"""
+    with open(html_path, encoding="utf-8", newline="") as f:
+        html = f.read()
+    match = _EMBED_PATTERN.search(html)
+    if match is None:
+        raise ValueError(f"{html_path} 中没有找到 FALLBACK_QUESTION_BANK")
+    newline = "\r\n" if match.group(1).endswith("\r\n") else "\n"
+    lines = [" " * 12 + json.dumps(question, ensure_ascii=False) for question in bank]
+    html = html[:match.start(2)] + f",{newline}".join(lines) + html[match.end(2):]
+    with open(html_path, "w", encoding="utf-8", newline="") as f:
+        f.write(html)
+    return len(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="选词填空题库：建立偏移索引，离线计算干扰项，同步网页版内置题库")
+    parser.add_argument("bank", nargs="?", default=QUIZ_BANK_FILE, help="JSONL 题库文件（默认 quiz_bank.jsonl）")
+    parser.add_argument("--distractors", action="store_true", help="为每道题算好近邻答案，写入题库的 distractors 字段")
+    parser.add_argument("--embed", metavar="HTML", help="把题库写入网页版（如 选词填空练习v5.html）的内置题库")
+    args = parser.parse_args(argv)
+
+    bank = QuestionBank(args.bank)
+    print(f"题库 {args.bank}：{len(bank)} 题，索引 {bank.index_path}")
+    if args.distractors:
+        print(f"已写入干扰项：{write_distractors(bank)} 题")
+    if args.embed:
+        print(f"已写入 {args.embed}：{embed_bank(bank, args.embed)} 题")
+    bank.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
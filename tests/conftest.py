@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 各模块是仓库根目录下的脚本，测试从根目录导入
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
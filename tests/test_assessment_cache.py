@@ -0,0 +1,31 @@
+from cotton_core import (
+    assess_sample,
+    assessment_cache_info,
+    evaluate_soil,
+    generate_comprehensive_recommendations,
+    get_region_profile,
+    sample_cache_key,
+)
+
+
+def test_cache_key_normalizes_values_and_keeps_order():
+    key = sample_cache_key({"碱解氮 ppm": 40, "有机质 g/kg": 10.5, "锌 Zn (mg/kg)": None,
+                            "有效磷 ppm": float("nan"), "备注": 1}, "南疆", 5)
+    assert key == (get_region_profile("南疆"), 5.0, (("碱解氮 ppm", 40.0), ("有机质 g/kg", 10.5)))
+    assert sample_cache_key({"有机质 g/kg": 10}, "南疆", 5.0) == sample_cache_key({"有机质 g/kg": 10.0}, "南疆", 5)
+
+
+def test_equal_samples_share_one_assessment():
+    measurements = {"有机质 g/kg": 9.75, "碱解氮 ppm": 41.5}
+    first = assess_sample(measurements, "南疆", 3)
+    hits = assessment_cache_info().hits
+    second = assess_sample({"有机质 g/kg": 9.75, "碱解氮 ppm": 41.5, "备注": 0}, "南疆", 3.0)
+    assert second is first
+    assert assessment_cache_info().hits == hits + 1
+
+    results = evaluate_soil(measurements, "南疆")
+    assert first.results == results
+    assert first.recommendations == generate_comprehensive_recommendations(results, "南疆", 3)
+    # 区域或面积不同时分别计算
+    assert assess_sample(measurements, "北疆", 3) is not first
+    assert assess_sample(measurements, "南疆", 4) is not first
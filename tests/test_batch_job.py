@@ -0,0 +1,39 @@
+import io
+import zipfile
+
+import pandas as pd
+
+# 页面脚本在 streamlit 之外导入时以 bare 模式运行，可直接使用其中的类
+from cotton_expert import BatchJob
+
+
+def run_job(frame, report_format="text"):
+    job = BatchJob(frame, report_format)
+    job._thread.join(30)
+    assert job.finished
+    return job
+
+
+def test_batch_job_zips_reports_and_summary():
+    frame = pd.DataFrame({
+        "样本编号": ["F-1", "F-1", "F-2"],
+        "区域": ["南疆", "北疆", "北疆"],
+        "有机质 g/kg": [10.0, 12.0, 20.0],
+    })
+    job = run_job(frame, "markdown")
+    assert job.error is None
+    assert job.done == job.total == 3
+    assert job.frame is None
+    with zipfile.ZipFile(io.BytesIO(job.zip_bytes)) as archive:
+        names = archive.namelist()
+        summary = pd.read_csv(io.BytesIO(archive.read("汇总.csv")), encoding="utf-8-sig")
+    assert len(names) == len(set(names)) == 4
+    assert [name for name in names if name.endswith(".md")][:1] == ["F-1.md"]
+    assert summary["样本编号"].tolist() == ["F-1", "F-1", "F-2"]
+    assert job.summary["区域"].tolist() == ["南疆", "北疆", "北疆"]
+
+
+def test_batch_job_reports_error():
+    job = run_job(pd.DataFrame({"有机质 g/kg": [10.0]}), "pdf")
+    assert job.error
+    assert job.zip_bytes is None
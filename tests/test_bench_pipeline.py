@@ -0,0 +1,31 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+import bench_pipeline  # noqa: E402
+
+
+@pytest.mark.parametrize("text, size", [("1k", 1000), ("100K", 100000), ("1M", 1000000), ("2.5k", 2500), ("300", 300)])
+def test_parse_size(text, size):
+    assert bench_pipeline.parse_size(text) == size
+
+
+def test_baseline_round_trip_and_regression(tmp_path, capsys):
+    baseline_path = str(tmp_path / "baseline.json")
+    args = ["--sizes", "50", "--latency-samples", "50", "--skip-memory"]
+    assert bench_pipeline.main(args + ["--save-baseline", baseline_path]) == 0
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    assert set(baseline["latency_us"]) == set(bench_pipeline.STAGES)
+    assert baseline["throughput"]["50"] > 0
+
+    # 基线吞吐量远高于当前结果时判为回退
+    baseline["throughput"]["50"] *= 100
+    with open(baseline_path, "w", encoding="utf-8") as f:
+        json.dump(baseline, f)
+    assert bench_pipeline.main(args + ["--compare", baseline_path, "--tolerance", "0.9"]) == 1
+    assert "吞吐量 50" in capsys.readouterr().out
@@ -0,0 +1,25 @@
+import os
+import subprocess
+import sys
+
+import pandas as pd
+
+from cotton_core import iter_samples
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def imported_modules(code):
+    output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return set(output.stdout.split())
+
+
+def test_core_import_loads_no_heavy_dependency():
+    loaded = imported_modules(
+        "import sys, cotton_core; print(*[m for m in ('numpy', 'pandas', 'streamlit') if m in sys.modules])")
+    assert loaded == set()
+
+
+def test_iter_samples_skips_non_numeric_values():
+    frame = pd.DataFrame({"面积": ["abc"], "有机质 g/kg": ["12.5"], "碱解氮 ppm": ["n/a"]})
+    assert list(iter_samples(frame)) == [(0, "北疆", 1.0, {"有机质 g/kg": 12.5})]
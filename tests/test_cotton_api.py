@@ -0,0 +1,134 @@
+import asyncio
+import json
+
+import pytest
+
+import cotton_api
+from cotton_api import ApiError, SoilApiServer, handle_payload
+from cotton_core import assess_sample, current_knowledge_base
+
+GOOD_SAMPLE = {"id": "F-001", "region": "南疆", "area_mu": 20, "measurements": {"有机质 g/kg": 10.5}}
+
+
+def test_single_sample_matches_core_pipeline():
+    assessment = assess_sample({"有机质 g/kg": 10.5}, "南疆", 20)
+    assert handle_payload("/evaluate", GOOD_SAMPLE) == {
+        "id": "F-001", "region": "南疆", "area_mu": 20.0, "results": assessment.results}
+    response = handle_payload("/recommend", GOOD_SAMPLE)
+    assert response["recommendations"] == assessment.recommendations
+
+
+@pytest.mark.parametrize("payload", [
+    [GOOD_SAMPLE, {"measurements": {"有机质 g/kg": 30.0}}],
+    {"samples": [GOOD_SAMPLE, {"measurements": {"有机质 g/kg": 30.0}}], "format": "markdown"},
+])
+def test_batch_payload_forms(payload):
+    first, second = handle_payload("/report", payload)["results"]
+    assert first["id"] == "F-001"
+    assert (second["id"], second["region"], second["area_mu"]) == (None, "北疆", 1.0)
+    assert first["format"] == ("markdown" if isinstance(payload, dict) else "text")
+
+
+def test_invalid_sample_in_batch_reports_inline_error():
+    good, bad = handle_payload("/evaluate", [GOOD_SAMPLE, {"id": "F-002", "measurements": {}}])["results"]
+    assert good["results"] and bad == {"id": "F-002", "error": bad["error"]}
+    with pytest.raises(ApiError) as info:
+        handle_payload("/evaluate", {"measurements": {}})
+    assert info.value.status == 400
+
+
+@pytest.mark.parametrize("bad_sample", [
+    {"region": [], "measurements": {"有机质 g/kg": 10.5}},
+    {"region": {"name": "南疆"}, "measurements": {"有机质 g/kg": 10.5}},
+    {"region": "东疆", "measurements": {"有机质 g/kg": 10.5}},
+    {"measurements": []},
+    {"measurements": {"有机质 g/kg": "10.5"}},
+    {"measurements": {"有机质 g/kg": True}},
+    {"measurements": {"有机质 g/kg": float("nan")}},
+    {"area_mu": "20", "measurements": {"有机质 g/kg": 10.5}},
+    {"area_mu": float("inf"), "measurements": {"有机质 g/kg": 10.5}},
+    {"id": ["F-002"], "measurements": {"有机质 g/kg": 10.5}},
+    {"format": ["html"], "measurements": {"有机质 g/kg": 10.5}},
+    "F-003",
+    None,
+])
+def test_malformed_sample_reported_per_sample(bad_sample):
+    response = handle_payload("/report", [GOOD_SAMPLE, bad_sample, GOOD_SAMPLE])
+    first, bad, last = response["results"]
+    assert "error" in bad
+    assert first["id"] == last["id"] == "F-001"
+    assert "report" in first and "report" in last
+
+
+def test_malformed_single_sample_is_400():
+    with pytest.raises(ApiError) as info:
+        handle_payload("/recommend", {"region": [], "measurements": {"有机质 g/kg": 10.5}})
+    assert info.value.status == 400
+
+
+def test_malformed_batch_container_is_400():
+    with pytest.raises(ApiError) as info:
+        handle_payload("/evaluate", {"samples": {"id": 1}})
+    assert info.value.status == 400
+
+
+async def _raw_request(request):
+    server = await SoilApiServer(port=0, threads=1).start()
+    try:
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        writer.write(request)
+        await writer.drain()
+        response = await asyncio.wait_for(reader.read(), 10)
+        writer.close()
+        return response
+    finally:
+        await server.close()
+
+
+def _split_responses(data):
+    """按 Content-Length 拆分同一连接上的多个响应，返回 [(状态码, JSON)]"""
+    responses = []
+    while data:
+        head, rest = data.split(b"\r\n\r\n", 1)
+        length = int(next(line.split(b":")[1] for line in head.split(b"\r\n") if line.startswith(b"Content-Length")))
+        responses.append((int(head.split(b" ")[1]), json.loads(rest[:length])))
+        data = rest[length:]
+    return responses
+
+
+def test_keep_alive_connection_serves_several_requests():
+    body = json.dumps(GOOD_SAMPLE).encode()
+    post = b"POST /recommend HTTP/1.1\r\nHost: x\r\nContent-Length: %d\r\n\r\n" % len(body) + body
+    response = asyncio.run(_raw_request(
+        post + b"GET /health HTTP/1.1\r\nHost: x\r\n\r\n"
+        + b"GET /recommend HTTP/1.1\r\nHost: x\r\n\r\n"
+        + b"POST /missing HTTP/1.1\r\nHost: x\r\nConnection: close\r\nContent-Length: 0\r\n\r\n"))
+    (status, result), (_, health), (method_status, _), (missing_status, _) = _split_responses(response)
+    assert status == 200 and result["recommendations"]
+    assert health == {"status": "ok", "knowledge_base": current_knowledge_base().version}
+    assert (method_status, missing_status) == (405, 404)
+
+
+def test_oversized_body_is_rejected(monkeypatch):
+    monkeypatch.setattr(cotton_api, "MAX_BODY_BYTES", 10)
+    response = asyncio.run(_raw_request(b"POST /evaluate HTTP/1.1\r\nHost: x\r\nContent-Length: 11\r\n\r\n"))
+    assert response.startswith(b"HTTP/1.1 413 ")
+
+
+@pytest.mark.parametrize("length", ["-1", "abc"])
+def test_invalid_content_length_is_400(length):
+    response = asyncio.run(_raw_request(
+        f"POST /evaluate HTTP/1.1\r\nHost: x\r\nContent-Length: {length}\r\n\r\n".encode()))
+    head, body = response.split(b"\r\n\r\n", 1)
+    assert head.startswith(b"HTTP/1.1 400 ")
+    assert "Content-Length" in json.loads(body)["error"]
+
+
+def test_batch_over_http_keeps_other_results():
+    body = json.dumps([GOOD_SAMPLE, {"region": [], "measurements": {"有机质 g/kg": 1}}]).encode()
+    response = asyncio.run(_raw_request(
+        b"POST /evaluate HTTP/1.1\r\nHost: x\r\nConnection: close\r\nContent-Length: %d\r\n\r\n" % len(body) + body))
+    head, body = response.split(b"\r\n\r\n", 1)
+    assert head.startswith(b"HTTP/1.1 200 ")
+    good, bad = json.loads(body)["results"]
+    assert good["results"] and "error" in bad
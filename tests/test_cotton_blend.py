@@ -0,0 +1,79 @@
+import copy
+import json
+
+import pytest
+
+pytest.importorskip("scipy")
+
+from cotton_blend import BlendOptimizer, nutrient_requirements  # noqa: E402
+from cotton_core import KNOWLEDGE_BASE_PATH, FertilizerCalculator, KnowledgeBase, RegionProfile  # noqa: E402
+
+
+def deficiency(nutrient_name, value):
+    return FertilizerCalculator.calculate_deficiency(nutrient_name, value)
+
+
+def test_requirements_include_utilization_and_grade():
+    info = deficiency("碱解氮 ppm", 20)
+    requirements = nutrient_requirements([info, deficiency("速效钾 ppm", 500), {"error": "未知养分"}])
+    assert list(requirements) == ["N"]
+    assert requirements["N"] == pytest.approx(info["deficiency_kg_per_mu"] / 0.35 * 1.2)
+
+
+def test_single_nutrient_picks_cheapest_per_unit():
+    info = deficiency("碱解氮 ppm", 20)
+    plan = BlendOptimizer().solve([info], area_mu=10)
+    need = nutrient_requirements([info])["N"]
+    assert [item["fertilizer"] for item in plan["blend"]] == ["尿素"]
+    assert plan["blend"][0]["per_mu"] == round(need / 0.46, 2)
+    assert plan["total_cost"] == pytest.approx(plan["cost_per_mu"] * 10, rel=1e-3)
+
+
+def test_compound_fertilizer_counted_once():
+    deficiencies = [deficiency("碱解氮 ppm", 20), deficiency("有效磷 ppm", 5)]
+    requirements = nutrient_requirements(deficiencies)
+    plan = BlendOptimizer().solve(deficiencies)
+    for symbol, need in requirements.items():
+        assert plan["supplied"][symbol] >= need - 1e-3
+    # 不低于逐个养分单独选最便宜肥料的成本
+    separate = sum(BlendOptimizer().solve([info])["cost_per_mu"] for info in deficiencies)
+    assert plan["cost_per_mu"] <= separate + 0.01
+
+
+def test_prices_and_batch():
+    optimizer = BlendOptimizer({"尿素": None, "硫酸锌": None})
+    plans = optimizer.solve_batch([[deficiency("碱解氮 ppm", 20)], [deficiency("锌 Zn (mg/kg)", 0.2)]], [1, 2])
+    assert "尿素" not in [item["fertilizer"] for item in plans[0]["blend"]]
+    assert "Zn" in plans[1]["error"]
+    with pytest.raises(ValueError):
+        BlendOptimizer({"未知肥料": 1.0})
+    with pytest.raises(ValueError):
+        BlendOptimizer({"尿素": -1.0})
+
+
+@pytest.fixture
+def reloaded_profile():
+    """利用率和缺乏程度系数都改过的知识库快照（模拟热更新后的新版本）"""
+    with open(KNOWLEDGE_BASE_PATH, encoding="utf-8") as f:
+        data = json.load(f)
+    data = copy.deepcopy(data)
+    data["utilization_rate"] = {key: rate / 2 for key, rate in data["utilization_rate"].items()}
+    data["grade_factor"] = {grade: factor * 3 for grade, factor in data["grade_factor"].items()}
+    return RegionProfile("北疆", kb=KnowledgeBase(data))
+
+
+def test_requirements_follow_profile_kb(reloaded_profile):
+    info = FertilizerCalculator.calculate_deficiency("碱解氮 ppm", 20, "北疆")
+    base = nutrient_requirements([info], "北疆")
+    reloaded = nutrient_requirements([info], reloaded_profile)
+    assert set(base) == {"N"} and set(reloaded) == {"N"}
+    # 利用率减半、系数乘 3：需求为原来的 6 倍
+    assert reloaded["N"] == pytest.approx(base["N"] * 6)
+
+
+def test_optimizer_uses_its_profile(reloaded_profile):
+    info = FertilizerCalculator.calculate_deficiency("碱解氮 ppm", 20, "北疆")
+    base = BlendOptimizer(region="北疆").solve([info])
+    reloaded = BlendOptimizer(region=reloaded_profile).solve([info])
+    assert base["cost_per_mu"] > 0
+    assert reloaded["cost_per_mu"] == pytest.approx(base["cost_per_mu"] * 6, rel=1e-3)
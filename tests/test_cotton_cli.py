@@ -0,0 +1,60 @@
+import os
+import subprocess
+import sys
+
+import pandas as pd
+
+import cotton_cli
+from cotton_core import iter_samples
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def sample_frame():
+    return pd.DataFrame({
+        "样本编号": ["F-1", "F-2", "F-3"],
+        "区域": ["南疆", " 北疆 ", "东疆"],
+        "面积": [20, None, -1],
+        "有机质 g/kg": [10.0, 0, None],
+        "碱解氮 ppm": [35.0, 95.0, 50.0],
+        "备注": ["a", "b", "c"],
+    })
+
+
+def test_iter_samples_defaults_and_missing_values():
+    samples = list(iter_samples(sample_frame(), id_column="样本编号"))
+    assert samples == [
+        ("F-1", "南疆", 20.0, {"有机质 g/kg": 10.0, "碱解氮 ppm": 35.0}),
+        ("F-2", "北疆", 1.0, {"碱解氮 ppm": 95.0}),
+        ("F-3", "北疆", 1.0, {"碱解氮 ppm": 50.0}),
+    ]
+    # 没有编号列时使用行号
+    assert [sample[0] for sample in iter_samples(sample_frame())] == [0, 1, 2]
+
+
+def test_run_batch_csv_in_chunks(tmp_path):
+    input_path = str(tmp_path / "samples.csv")
+    sample_frame().to_csv(input_path, index=False)
+    output_dir = tmp_path / "out"
+    assert cotton_cli.run_batch(input_path, str(output_dir), chunksize=2, id_column="样本编号") == 3
+    recommendations = pd.read_csv(output_dir / "recommendations.csv", encoding="utf-8-sig")
+    assert list(recommendations.columns) == list(cotton_cli.RECOMMENDATION_COLUMNS)
+    assert set(recommendations["样本编号"]) == {"F-1", "F-2", "F-3"}
+    assert sorted(p.name for p in (output_dir / "reports").iterdir()) == ["F-1.txt", "F-2.txt", "F-3.txt"]
+    assert "南疆" in (output_dir / "reports" / "F-1.txt").read_text(encoding="utf-8")
+
+
+def test_run_batch_parquet_without_reports(tmp_path):
+    input_path = str(tmp_path / "samples.parquet")
+    sample_frame().to_parquet(input_path, index=False)
+    output_dir = tmp_path / "out"
+    assert cotton_cli.run_batch(input_path, str(output_dir), chunksize=2, write_reports=False) == 3
+    recommendations = pd.read_parquet(output_dir / "recommendations.parquet")
+    assert set(recommendations["样本编号"]) == {"0", "1", "2"}
+    assert not (output_dir / "reports").exists()
+
+
+def test_cli_does_not_import_streamlit():
+    code = "import sys, cotton_cli; print('streamlit' in sys.modules)"
+    output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert output.stdout.strip() == "False"
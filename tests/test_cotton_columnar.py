@@ -0,0 +1,83 @@
+import random
+
+import pytest
+
+from cotton_columnar import ColumnarResults
+from cotton_core import (
+    REGION_PROFILES,
+    RULES_DB,
+    FertilizerCalculator,
+    RegionProfile,
+    evaluate_soil,
+    generate_comprehensive_recommendations,
+    summarize_assessment,
+)
+
+
+def random_samples(count, seed=7):
+    """随机样本：数值落在阈值两侧，并包含恰好等于阈值的值、空值和未知项目"""
+    rng = random.Random(seed)
+    samples = []
+    for i in range(count):
+        measurements = {}
+        for item_name, (thresholds, _) in RULES_DB.items():
+            roll = rng.random()
+            if roll < 0.1:
+                continue
+            if roll < 0.2:
+                measurements[item_name] = float(rng.choice(thresholds))
+            elif roll < 0.25:
+                measurements[item_name] = None
+            else:
+                measurements[item_name] = round(rng.uniform(thresholds[0] * 0.5, thresholds[-1] * 1.5), 3)
+        measurements["未知项目"] = 1.0
+        samples.append((f"S-{i}", "南疆" if i % 3 else "北疆", float(i % 5 + 1), measurements))
+    return samples
+
+
+def test_results_match_dict_pipeline():
+    samples = random_samples(60)
+    columns = ColumnarResults.from_samples(samples)
+    assert columns.sample_count == 60
+    for index, (sample_id, region, area_mu, measurements) in enumerate(samples):
+        results = evaluate_soil(measurements, region)
+        assert columns.sample_results(index) == results
+        assert columns.recommendations(index) == generate_comprehensive_recommendations(results, region, area_mu)
+        assert columns.sample(index)[::2] == (sample_id, area_mu)
+        for row in columns.rows(index):
+            info = FertilizerCalculator.calculate_deficiency(row.item_name, row.value, region)
+            assert row.deficiency_kg_per_mu == info["deficiency_kg_per_mu"]
+        assert columns.summary_frame().iloc[index].to_dict() == summarize_assessment(sample_id, region, area_mu, results)
+    assert columns.report(1, "markdown").startswith("# ")
+
+
+def test_compact_columns_share_memory():
+    columns = ColumnarResults.from_samples(random_samples(20))
+    assert columns.nbytes / len(columns) < 30
+    arrays = columns.to_numpy()
+    assert len(arrays["value"]) == len(columns)
+    arrays["value"][0] = 123.0  # 与内部数组共享内存
+    assert columns.row(0).value == 123.0
+    assert repr(columns.row(1)).startswith("ResultRow(")
+
+
+def test_to_arrow_dictionary_columns():
+    pa = pytest.importorskip("pyarrow")
+    columns = ColumnarResults.from_samples(random_samples(10))
+    table = columns.to_arrow()
+    assert table.num_rows == len(columns)
+    assert pa.types.is_dictionary(table.schema.field("评估等级").type)
+    assert table.column("检测项目").to_pylist() == [row.item_name for row in columns.rows()]
+    assert table.column("区域").to_pylist()[0] == "北疆"
+
+
+def test_reloaded_profiles_share_region_code():
+    # 知识库热重载会重新编译区域标准；同名同版本的标准不应让区域词表增长
+    columns = ColumnarResults()
+    _, _, area_mu, measurements = random_samples(1)[0]
+    for i in range(200):
+        base = REGION_PROFILES["南疆"]
+        columns.append(f"S-{i}", RegionProfile(base.name, base.overrides), area_mu, measurements)
+    columns.append("S-北疆", "北疆", area_mu, measurements)
+    assert [profile.name for profile in columns.profiles] == ["南疆", "北疆"]
+    assert columns.sample_results(199) == evaluate_soil(measurements, "南疆")
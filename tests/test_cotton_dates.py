@@ -0,0 +1,42 @@
+from datetime import date, datetime
+
+import pandas as pd
+import pytest
+
+import cotton_cli
+from cotton_store import SampleStore, normalize_date
+
+
+@pytest.mark.parametrize("value", [
+    "2024-03-01", "2024/03/01", "2024.03.01", "2024/3/1", "2024.3.1", "20240301", " 2024-03-01 ",
+    "2024-03-01 08:30:00", "2024/03/01T08:30", 20240301, 20240301.0,
+    date(2024, 3, 1), datetime(2024, 3, 1, 8, 30), pd.Timestamp("2024-03-01 08:30"),
+])
+def test_normalize_date_accepted_formats(value):
+    assert normalize_date(value) == "2024-03-01"
+
+
+@pytest.mark.parametrize("value", ["2024/13/01", "2024-02-30", "2024-03/01", "03/01/2024", "2024030", "abc", ""])
+def test_normalize_date_rejects_invalid(value):
+    with pytest.raises(ValueError, match="无法识别的日期"):
+        normalize_date(value)
+
+
+def test_cli_bad_date_skips_row_and_continues(tmp_path, capsys):
+    samples = pd.DataFrame({
+        "田块编号": ["F-1", "F-2", "F-3"],
+        "采样日期": ["2024/03/01", "not a date", "20240415"],
+        "区域": ["北疆", "北疆", "南疆"],
+        "面积": [10, 20, 30],
+        "有机质 g/kg": [8.0, 12.0, 15.0],
+    })
+    input_path = tmp_path / "samples.csv"
+    samples.to_csv(input_path, index=False)
+    db_path = str(tmp_path / "samples.db")
+    count = cotton_cli.run_batch(str(input_path), str(tmp_path / "out"), write_reports=False, store_path=db_path)
+    assert count == 3
+    assert "not a date" in capsys.readouterr().err
+    with SampleStore(db_path) as store:
+        assert [row["sampled_on"] for row in store.field_trend("F-1")] == ["2024-03-01"]
+        assert store.field_trend("F-2") == []
+        assert [row["sampled_on"] for row in store.field_trend("F-3")] == ["2024-04-15"]
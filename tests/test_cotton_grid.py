@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import cotton_grid
+from cotton_core import FertilizerCalculator
+from cotton_grid import FieldGrid, prescription_grid, write_asc
+
+POINTS = pd.DataFrame({
+    "x": [2.5, 27.5, 12.5, 37.5],
+    "y": [2.5, 17.5, 12.5, 2.5],
+    "碱解氮 ppm": [30.0, 95.0, 58.0, None],
+    "有机质 g/kg": [10.0, 0, 14.0, 20.0],
+})
+
+
+def brute_force_idw(grid, column, power=2.0):
+    """逐单元直接计算的反距离加权（只用测过该项目的采样点）"""
+    values = pd.to_numeric(POINTS[column], errors="coerce").to_numpy(dtype=float)
+    used = values > 0
+    xs, ys, values = POINTS["x"].to_numpy()[used], POINTS["y"].to_numpy()[used], values[used]
+    result = np.empty(grid.shape)
+    for row, cy in enumerate(grid.row_centers()):
+        for col, cx in enumerate(grid.column_centers()):
+            d2 = np.maximum((xs - cx) ** 2 + (ys - cy) ** 2, 1e-12)
+            weights = d2 ** (-power / 2)
+            result[row, col] = (weights * values).sum() / weights.sum()
+    return result
+
+
+def test_field_grid_geometry():
+    grid = FieldGrid.from_bounds(0, 0, 41, 20, 5)
+    assert grid.shape == (4, 9)
+    assert grid.row_centers()[0] == 17.5  # 第 0 行在最北
+    assert grid.column_centers()[-1] == 42.5
+    assert grid.cell_area_mu == pytest.approx(25 / (10000 / 15))
+    with pytest.raises(ValueError):
+        FieldGrid(0, 0, 0, 1, 1)
+
+
+@pytest.mark.parametrize("power", [2.0, 3.0])
+def test_interpolation_matches_brute_force(power):
+    grid = FieldGrid.from_bounds(0, 0, 40, 20, 5)
+    layers, _ = prescription_grid(POINTS, grid, power=power)
+    for column, nutrient in [("碱解氮 ppm", "碱解氮"), ("有机质 g/kg", "有机质")]:
+        np.testing.assert_allclose(layers[f"{nutrient}_含量"], brute_force_idw(grid, column, power), rtol=1e-5)
+    # 单元中心与采样点重合时等于实测值
+    assert layers["碱解氮_含量"][3, 0] == pytest.approx(30.0)
+
+
+def test_cell_amounts_follow_fertilizer_calculator():
+    grid = FieldGrid.from_bounds(0, 0, 40, 20, 5)
+    layers, summary = prescription_grid(POINTS, grid, "南疆", {"碱解氮": "碳酸氢铵"})
+    values, amounts = layers["碱解氮_含量"], layers["碱解氮_碳酸氢铵"]
+    for value, amount in zip(values.ravel(), amounts.ravel()):
+        info = FertilizerCalculator.calculate_deficiency("碱解氮 ppm", float(value), "南疆")
+        expected = FertilizerCalculator.calculate_fertilizer_amount(info, "碳酸氢铵", 1)
+        assert amount == pytest.approx(expected.get("actual_per_mu", 0.0), rel=1e-3, abs=0.01)
+    assert summary["碱解氮"]["fertilizer"] == "碳酸氢铵"
+    assert summary["碱解氮"]["total_kg"] == pytest.approx(float(amounts.sum()) * grid.cell_area_mu, rel=1e-4)
+    assert summary["碱解氮"]["deficient_cells"] == int((layers["碱解氮_缺乏量"] > 0).sum())
+
+
+def test_chunked_memmap_output_matches(tmp_path, monkeypatch):
+    grid = FieldGrid.from_bounds(0, 0, 40, 20, 2)
+    expected, expected_summary = prescription_grid(POINTS, grid)
+    monkeypatch.setattr(cotton_grid, "CHUNK_ELEMENTS", 3 * grid.ncols * len(POINTS))
+    layers, summary = prescription_grid(POINTS, grid, out_dir=str(tmp_path))
+    assert summary == expected_summary
+    for name, layer in expected.items():
+        np.testing.assert_allclose(np.load(tmp_path / f"{name}.npy"), layer)
+
+
+def test_errors_and_asc_export(tmp_path):
+    grid = FieldGrid.from_bounds(0, 0, 40, 20, 10)
+    with pytest.raises(ValueError):
+        prescription_grid(POINTS, grid, fertilizers={"碱解氮": "氯化钾"})
+    with pytest.raises(ValueError):
+        prescription_grid(POINTS[["x", "y"]], grid)
+
+    layer = np.array([[1.5, np.nan], [2.0, 3.0]])
+    path = tmp_path / "layer.asc"
+    write_asc(str(path), layer, FieldGrid(0, 0, 10, 2, 2))
+    lines = path.read_text(encoding="ascii").splitlines()
+    assert lines[:6] == ["ncols 2", "nrows 2", "xllcorner 0.0", "yllcorner 0.0", "cellsize 10.0", "NODATA_value -9999"]
+    assert lines[6:] == ["1.5 -9999", "2 3"]
+
+
+def test_cli_writes_layers(tmp_path, capsys):
+    points_path = tmp_path / "points.csv"
+    POINTS.to_csv(points_path, index=False)
+    output_dir = tmp_path / "grid"
+    assert cotton_grid.main([str(points_path), "-o", str(output_dir), "--cell-size", "5", "--format", "asc",
+                             "--fertilizer", "碱解氮=尿素"]) == 0
+    assert (output_dir / "碱解氮_尿素.npy").exists() and (output_dir / "碱解氮_尿素.asc").exists()
+    assert "碱解氮: 尿素" in capsys.readouterr().out
@@ -0,0 +1,84 @@
+import os
+
+import pytest
+
+import cotton_metrics
+from cotton_api import handle_payload
+from cotton_metrics import stage
+
+
+@pytest.fixture
+def metrics(monkeypatch):
+    """开启统计并在前后清空，避免影响其他测试"""
+    monkeypatch.setattr(cotton_metrics, "ENABLED", True)
+    cotton_metrics.reset()
+    yield cotton_metrics
+    cotton_metrics.reset()
+
+
+def test_disabled_stage_is_shared_null_context():
+    assert not cotton_metrics.ENABLED
+    assert stage("evaluate") is stage("report")
+    with stage("evaluate"):
+        pass
+    cotton_metrics.record("evaluate", 1.0)
+    assert cotton_metrics.summary() == []
+
+
+def test_stage_records_counts_failures_and_buckets(metrics):
+    for seconds in (0.0005, 0.003, 0.2):
+        metrics.record("export", seconds)
+    with pytest.raises(RuntimeError):
+        with stage("export"):
+            raise RuntimeError("失败也计时")
+    with stage("chart"):
+        pass
+
+    rows = {row["阶段"]: row for row in metrics.summary()}
+    assert rows["export"]["次数"] == 4 and rows["export"]["失败"] == 1
+    assert rows["export"]["最大(ms)"] == 200.0
+    assert metrics.summary()[0]["阶段"] == "export"  # 按累计耗时降序
+    assert [name for _, name, _ in metrics.recent()] == ["chart", "export", "export", "export", "export"]
+    assert [seconds for _, _, seconds in metrics.recent("export", limit=2)][1] == 0.2
+
+    text = metrics.prometheus_text()
+    assert 'cotton_stage_seconds_bucket{stage="export",le="0.1"} 3' in text
+    assert 'cotton_stage_seconds_bucket{stage="export",le="0.25"} 4' in text
+    assert 'cotton_stage_seconds_bucket{stage="export",le="+Inf"} 4' in text
+    assert 'cotton_stage_seconds_count{stage="export"} 4' in text
+    assert 'cotton_stage_failures_total{stage="export"} 1' in text
+    assert 'cotton_stage_failures_total{stage="chart"} 0' in text
+
+
+def test_control_flow_exit_is_timed_but_not_a_failure(metrics):
+    # st.stop()/st.rerun() 抛出的是 BaseException 子类
+    class StopScript(BaseException):
+        pass
+
+    with pytest.raises(StopScript):
+        with stage("rerun"):
+            raise StopScript()
+
+    row = metrics.summary()[0]
+    assert row["阶段"] == "rerun" and row["次数"] == 1 and row["失败"] == 0
+
+def test_recent_is_bounded(metrics):
+    for i in range(metrics.RECENT_SIZE + 10):
+        metrics.record("evaluate", i / 1000)
+    assert len(metrics.recent(limit=None)) == metrics.RECENT_SIZE
+    assert metrics.summary()[0]["次数"] == metrics.RECENT_SIZE + 10
+
+
+def test_write_prometheus_replaces_file(metrics, tmp_path):
+    path = str(tmp_path / "cotton.prom")
+    metrics.record('a"b', 0.01)
+    assert metrics.write_prometheus(path) == path
+    with open(path, encoding="utf-8") as f:
+        assert 'stage="a\\"b"' in f.read()
+    assert os.listdir(tmp_path) == ["cotton.prom"]
+
+
+def test_api_requests_are_timed(metrics):
+    handle_payload("/evaluate", {"measurements": {"有机质 g/kg": 10.5}})
+    stages = {row["阶段"] for row in metrics.summary()}
+    assert "api_evaluate" in stages
@@ -0,0 +1,68 @@
+import os
+
+import pytest
+
+from cotton_core import assess_sample, current_knowledge_base
+
+pytest.importorskip("streamlit.testing.v1")
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+PAGE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cotton_expert.py")
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    # 样本历史库写在临时目录
+    monkeypatch.chdir(tmp_path)
+    return AppTest.from_file(PAGE, default_timeout=60).run()
+
+
+def test_assessment_view_matches_pipeline():
+    # 页面脚本在 streamlit 之外导入时以 bare 模式运行，缓存函数可直接调用
+    from cotton_expert import assessment_view
+
+    items = (("有机质 g/kg", 10.0), ("锌 Zn (mg/kg)", 0.4))
+    kb_key = (current_knowledge_base().version, 0)
+    assessment, df, chart_data = assessment_view(items, "南疆", 20.0, kb_key)
+    expected = assess_sample(dict(items), "南疆", 20.0)
+    assert assessment.results == expected.results
+    assert list(df["检测项目"]) == [row["检测项目"] for row in expected.results]
+    assert chart_data["数量"].sum() == 2
+
+
+def test_page_assessment_and_rerun(app):
+    assert not app.exception
+    app.sidebar.radio[0].set_value("南疆")
+    app.number_input(key="om_input").set_value(10.0)
+    app.number_input(key="zn_input").set_value(0.4)
+    app.sidebar.button[0].click().run()
+    assert not app.exception
+    assert app.metric
+    app.run()
+    assert not app.exception
+
+
+def test_calculator_fragment(app):
+    next(b for b in app.button if b.label == "点击使用计算器").click().run()
+    app.number_input(key="calc_amount").set_value(4.6)
+    app.button(key="calc_btn").click().run()
+    assert not app.exception
+    assert "10.0 kg/亩" in app.success[0].value
+
+
+def test_stopped_rerun_is_timed(tmp_path, monkeypatch):
+    import cotton_metrics
+
+    monkeypatch.setattr(cotton_metrics, "ENABLED", True)
+    monkeypatch.setattr(cotton_metrics, "METRICS_FILE", str(tmp_path / "cotton.prom"))
+    cotton_metrics.reset()
+    try:
+        app = AppTest.from_file(PAGE, default_timeout=60).run()
+        # 未输入任何指标时点击评估，页面提示后 st.stop()
+        app.sidebar.button[0].click().run()
+        assert not app.exception and app.warning
+        row = next(row for row in cotton_metrics.summary() if row["阶段"] == "rerun")
+        assert row["次数"] == 2 and row["失败"] == 0
+        assert (tmp_path / "cotton.prom").exists()
+    finally:
+        cotton_metrics.reset()
@@ -0,0 +1,99 @@
+import pickle
+
+import pandas as pd
+import pytest
+
+import cotton_cli
+from cotton_core import REGION_PROFILES, assess_sample, get_region_profile, iter_samples, register_region_profile
+from cotton_parallel import ParallelAssessor, assess_frame_parallel
+from cotton_store import SampleStore
+
+
+def sample_frame(count=10):
+    return pd.DataFrame({
+        "样本编号": [f"S-{i}" for i in range(count)],
+        "区域": ["南疆" if i % 2 else "北疆" for i in range(count)],
+        "面积": [i + 1 for i in range(count)],
+        "有机质 g/kg": [8.0 + i for i in range(count)],
+        "碱解氮 ppm": [30.0 + 7 * i for i in range(count)],
+    })
+
+
+def test_parallel_results_match_serial_in_order():
+    frame = sample_frame()
+    output = assess_frame_parallel(frame, workers=2, chunk_size=3, report_format="markdown", id_column="样本编号")
+    assert [row[0] for row in output] == list(frame["样本编号"])
+    for (sample_id, region, area_mu, results, recs, report), sample in zip(
+        output, iter_samples(frame, id_column="样本编号")
+    ):
+        assessment = assess_sample(sample[3], sample[1], sample[2])
+        assert (sample_id, region, area_mu) == sample[:3]
+        assert (results, recs) == (assessment.results, assessment.recommendations)
+        assert report.startswith("# ")
+
+
+def test_custom_region_reaches_workers():
+    register_region_profile("测试区", {"有机质 g/kg": {"thresholds": [5.0, 9.0, 11.0], "target_range": (9, 15)}})
+    try:
+        with ParallelAssessor(workers=2, chunk_size=1) as assessor:
+            output = list(assessor.map([("S-1", "测试区", 1.0, {"有机质 g/kg": 10.0})]))
+        assert output[0][3][0]["评估等级"] == "中"
+        assert output[0][5] is None
+    finally:
+        REGION_PROFILES.pop("测试区")
+
+
+def test_region_profile_pickles():
+    profile = get_region_profile("南疆")
+    restored = pickle.loads(pickle.dumps(profile))
+    assert (restored.name, dict(restored.rules), dict(restored.standards)) == \
+        (profile.name, dict(profile.rules), dict(profile.standards))
+    with pytest.raises(ValueError):
+        ParallelAssessor(workers=1, chunk_size=0)
+
+
+def test_cli_parallel_output_matches_serial(tmp_path):
+    input_path = str(tmp_path / "samples.csv")
+    sample_frame(25).to_csv(input_path, index=False)
+    outputs = {}
+    for workers in (1, 3):
+        output_dir = tmp_path / f"out{workers}"
+        assert cotton_cli.run_batch(input_path, str(output_dir), chunksize=10, id_column="样本编号",
+                                    workers=workers, parallel_chunk=4) == 25
+        reports = {p.name: p.read_text(encoding="utf-8").split("\n", 4)[4] for p in (output_dir / "reports").iterdir()}
+        outputs[workers] = ((output_dir / "recommendations.csv").read_bytes(), reports)
+    assert outputs[1] == outputs[3]
+    assert len(outputs[1][1]) == 25
+
+
+def test_map_bounds_pending_shards():
+    consumed = []
+
+    def samples():
+        for i in range(40):
+            consumed.append(i)
+            yield (f"S-{i}", "北疆", 1.0, {"有机质 g/kg": 8.0 + i})
+
+    with ParallelAssessor(workers=2, chunk_size=2, max_pending=3) as assessor:
+        output = assessor.map(samples())
+        first = next(output)
+        # 取到第一个结果时只读了 max_pending + 1 块
+        assert len(consumed) <= (3 + 1) * 2
+        assert [first[0]] + [row[0] for row in output] == [f"S-{i}" for i in range(40)]
+    with pytest.raises(ValueError):
+        ParallelAssessor(workers=1, max_pending=-1)
+
+
+def test_cli_parallel_store_rows_follow_samples_across_chunks(tmp_path):
+    frame = sample_frame(11)
+    frame["田块编号"] = [f"F-{i}" for i in range(11)]
+    input_path = str(tmp_path / "samples.csv")
+    frame.to_csv(input_path, index=False)
+    db_path = str(tmp_path / "samples.db")
+    # 读取块（3 个样本）与分发块（2 个样本）的边界互相错开
+    assert cotton_cli.run_batch(input_path, str(tmp_path / "out"), chunksize=3, id_column="样本编号",
+                                write_reports=False, workers=2, parallel_chunk=2, store_path=db_path) == 11
+    with SampleStore(db_path) as store:
+        for i in range(11):
+            (row,) = store.field_trend(f"F-{i}", "有机质")
+            assert row["value"] == 8.0 + i
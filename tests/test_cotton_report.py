@@ -0,0 +1,48 @@
+from datetime import datetime
+
+import pytest
+
+import cotton_core
+from cotton_api import handle_payload
+from cotton_parallel import _assess_shard
+
+SAMPLE = {"region": "南疆", "area_mu": 5, "measurements": {"有机质 g/kg": 7.5, "碱解氮 ppm": 40}}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """把报告中的评估时间固定为可控的值"""
+    now = [datetime(2024, 3, 1, 8, 0, 0)]
+
+    class FakeDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return now[0]
+
+    monkeypatch.setattr(cotton_core, "datetime", FakeDatetime)
+    return now
+
+
+def test_cached_assessment_has_no_report_text():
+    assessment = cotton_core.assess_sample(SAMPLE["measurements"], "南疆", 5)
+    assert not hasattr(assessment, "report_text")
+    assert cotton_core.assess_sample(SAMPLE["measurements"], "南疆", 5) is assessment
+
+
+def test_api_report_time_is_per_request(clock):
+    first = handle_payload("/report", SAMPLE)["report"]
+    clock[0] = datetime(2024, 3, 2, 9, 30, 0)
+    hits = cotton_core.assessment_cache_info().hits
+    second = handle_payload("/report", SAMPLE)["report"]
+    assert cotton_core.assessment_cache_info().hits == hits + 1
+    assert "2024-03-01 08:00:00" in first
+    assert "2024-03-02 09:30:00" in second
+
+
+def test_parallel_shard_report_time_is_per_call(clock):
+    shard = [("S-1", "南疆", 5.0, SAMPLE["measurements"])]
+    first = _assess_shard(shard, "text")[0][-1]
+    clock[0] = datetime(2024, 3, 3, 10, 0, 0)
+    second = _assess_shard(shard, "text")[0][-1]
+    assert "2024-03-01 08:00:00" in first
+    assert "2024-03-03 10:00:00" in second
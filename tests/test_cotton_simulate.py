@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+import cotton_simulate
+from cotton_core import FertilizerCalculator, current_knowledge_base
+from cotton_simulate import simulate_seasons
+
+N, P, K = cotton_simulate.SIMULATED_ITEMS
+
+
+def test_first_season_buildup_matches_calculator():
+    measurements = {N: 40.0, P: 10.0, K: 300.0}
+    plan = simulate_seasons(measurements, "南疆", seasons=1, yield_kg=0.0, fertilizers={"碱解氮": "尿素"})
+    assert plan.fertilizers[0] == "尿素"
+    for k, item_name in enumerate(plan.items):
+        info = FertilizerCalculator.calculate_deficiency(item_name, measurements[item_name], "南疆")
+        expected = FertilizerCalculator.calculate_fertilizer_amount(info, plan.fertilizers[k], 1, "南疆")
+        assert plan.buildup_kg[0, 0, k] == pytest.approx(expected.get("actual_per_mu", 0.0), rel=1e-3, abs=0.01)
+    # 不计作物带走时没有维持量
+    assert not plan.maintenance_kg.any()
+
+
+def test_buildup_moves_level_toward_target():
+    plan = simulate_seasons({N: 40.0}, "南疆", seasons=3, yield_kg=0.0)
+    kb = current_knowledge_base()
+    target = plan.target_min[0]
+    info = FertilizerCalculator.calculate_deficiency(N, 40.0, "南疆")
+    factor = kb.grade_factor.get(info["grade"], 0.8)
+    assert plan.levels[0, 1, 0] == pytest.approx(40.0 + (target - 40.0) * factor)
+    assert (np.diff(plan.levels[0, :, 0]) >= 0).all()
+
+
+def test_maintenance_keeps_sufficient_soil_level():
+    plan = simulate_seasons({N: 150.0, K: 300.0}, "北疆", seasons=4, yield_kg=450.0, straw_return=0.5)
+    assert not plan.buildup_kg.any()
+    assert (plan.maintenance_kg > 0).all()
+    np.testing.assert_allclose(plan.levels[0], np.tile([150.0, 300.0], (5, 1)))
+    frame = plan.plan_frame()
+    assert len(frame) == 8 and list(frame["季"].unique()) == [1, 2, 3, 4]
+
+
+def test_monte_carlo_is_reproducible():
+    args = ({N: 55.0, P: 10.0}, "南疆", 5, 400.0, 1.0, None, 200, 0.2, 0.15)
+    first, second = simulate_seasons(*args, seed=3), simulate_seasons(*args, seed=3)
+    assert first.levels.shape == (200, 6, 2) and first.scenarios == 200 and first.seasons == 5
+    np.testing.assert_array_equal(first.levels, second.levels)
+    assert first.levels[:, -1, 0].std() > 0
+
+    frame = first.distribution_frame()
+    assert len(frame) == 10
+    assert frame["低于目标概率"].between(0, 1).all()
+    assert (frame["季末含量 p5"] <= frame["季末含量 p95"]).all()
+
+    fixed = simulate_seasons({N: 55.0}, "南疆", 3, scenarios=4)
+    np.testing.assert_array_equal(fixed.levels[0], fixed.levels[3])
+
+
+@pytest.mark.parametrize("kwargs", [
+    {"measurements": {"有机质 g/kg": 10.0}},
+    {"measurements": {N: 50.0}, "seasons": 0},
+    {"measurements": {N: 50.0}, "straw_return": 1.5},
+    {"measurements": {N: 50.0}, "fertilizers": {"碱解氮": "氯化钾"}},
+])
+def test_invalid_input(kwargs):
+    with pytest.raises(ValueError):
+        simulate_seasons(**kwargs)
+
+
+def test_cli_prints_plan_and_distribution(capsys):
+    assert cotton_simulate.main(["--region", "南疆", "--value", "碱解氮=55", "--value", "速效钾=120",
+                                 "--seasons", "2", "--scenarios", "50", "--seed", "1"]) == 0
+    out = capsys.readouterr().out
+    assert "逐季施肥计划（南疆" in out and "50 个情景" in out
+    with pytest.raises(SystemExit):
+        cotton_simulate.main(["--value", "有机质=10"])
@@ -0,0 +1,115 @@
+import importlib
+import os
+from datetime import date, datetime
+
+import pandas as pd
+
+import cotton_cli
+import cotton_store
+from cotton_core import assess_sample, evaluate_soil
+from cotton_store import SampleStore
+
+
+def sample_results():
+    return evaluate_soil({"有机质 g/kg": 8.0, "锌 Zn (mg/kg)": 0.3}, "北疆")
+
+
+def save_history(store):
+    for field_id, region, sampled_on, zinc in [
+        ("F-1", "南疆", "2024-04-10", 0.2),
+        ("F-1", "南疆", datetime(2022, 4, 1, 9, 30), 0.8),
+        ("F-2", "北疆", date(2023, 5, 1), 0.4),
+        ("F-3", "南疆", "2023-06-01", 2.0),
+    ]:
+        assessment = assess_sample({"有机质 g/kg": 10.0, "锌 Zn (mg/kg)": zinc}, region, 5)
+        store.save(field_id, region, sampled_on, 5, assessment.results, assessment.recommendations)
+
+
+def test_field_trend_ordered_by_date(tmp_path):
+    with SampleStore(str(tmp_path / "samples.db")) as store:
+        save_history(store)
+        trend = store.field_trend("F-1", "锌")
+        assert [(row["sampled_on"], row["value"], row["status"]) for row in trend] == [
+            ("2022-04-01", 0.8, "正常"), ("2024-04-10", 0.2, "缺乏")]
+        assert trend[1]["deficiency_kg_per_mu"] > 0
+        assert len(store.field_trend("F-1")) == 4
+
+
+def test_deficient_samples_filters(tmp_path):
+    with SampleStore(str(tmp_path / "samples.db")) as store:
+        save_history(store)
+        assert [row["field_id"] for row in store.deficient_samples("锌")] == ["F-2", "F-1"]
+        assert [row["field_id"] for row in store.deficient_samples("锌", region="南疆")] == ["F-1"]
+        assert [row["field_id"] for row in store.deficient_samples("锌", since="2023-01-01", until=date(2023, 12, 31))] \
+            == ["F-2"]
+
+
+def test_queries_use_indexes(tmp_path):
+    with SampleStore(str(tmp_path / "samples.db")) as store:
+        save_history(store)
+        plan = " ".join(row["detail"] for row in store._query(
+            "EXPLAIN QUERY PLAN SELECT * FROM measurements WHERE nutrient = ? AND status = '缺乏'", ["锌"]))
+        assert "idx_measurements_nutrient_status" in plan
+        plan = " ".join(row["detail"] for row in store._query(
+            "EXPLAIN QUERY PLAN SELECT * FROM samples WHERE field_id = ? ORDER BY sampled_on", ["F-1"]))
+        assert "idx_samples_field_date" in plan
+
+
+def test_store_opens_database_on_first_save(tmp_path):
+    path = tmp_path / "samples.db"
+    store = SampleStore(str(path))
+    assert not path.exists()
+    # 保存之前的查询返回空结果，不创建数据库
+    assert store.field_trend("F-1") == []
+    assert store.deficient_samples("锌") == []
+    assert store.reevaluate_stale() == {}
+    assert not path.exists()
+
+    store.save("F-1", "北疆", "2024-03-01", 10, sample_results())
+    assert path.exists()
+    assert {row["item"] for row in store.field_trend("F-1")} == {"有机质 g/kg", "锌 Zn (mg/kg)"}
+    store.close()
+    store.close()
+
+
+def test_store_reads_existing_database(tmp_path):
+    path = str(tmp_path / "samples.db")
+    with SampleStore(path) as store:
+        store.save("F-1", "北疆", "2024-03-01", 10, sample_results())
+    with SampleStore(path) as store:
+        assert len(store.field_trend("F-1", "锌")) == 1
+
+
+def test_cli_stores_samples(tmp_path):
+    samples = pd.DataFrame({
+        "样本编号": ["S-1", "S-2"],
+        "田块编号": ["F-1", None],
+        "采样日期": ["2024-03-01", None],
+        "有机质 g/kg": [8.0, 20.0],
+    })
+    input_path = tmp_path / "samples.csv"
+    samples.to_csv(input_path, index=False)
+    db_path = str(tmp_path / "samples.db")
+    cotton_cli.run_batch(str(input_path), str(tmp_path / "out"), id_column="样本编号", write_reports=False,
+                         store_path=db_path)
+    with SampleStore(db_path) as store:
+        assert [row["sampled_on"] for row in store.field_trend("F-1")] == ["2024-03-01"]
+        # 缺少田块编号时使用样本编号，缺少日期时使用当天
+        assert [row["sampled_on"] for row in store.field_trend("S-2")] == [date.today().isoformat()]
+
+
+def test_default_path_next_to_module_or_from_env(monkeypatch, tmp_path):
+    module_dir = os.path.dirname(os.path.abspath(cotton_store.__file__))
+    try:
+        monkeypatch.delenv("COTTON_SAMPLES_DB", raising=False)
+        monkeypatch.chdir(tmp_path)
+        assert importlib.reload(cotton_store).DEFAULT_DB_PATH == os.path.join(module_dir, "cotton_samples.db")
+
+        env_path = str(tmp_path / "env.db")
+        monkeypatch.setenv("COTTON_SAMPLES_DB", env_path)
+        assert importlib.reload(cotton_store).DEFAULT_DB_PATH == env_path
+        cotton_store.SampleStore().close()
+        assert not os.listdir(tmp_path)
+    finally:
+        monkeypatch.undo()
+        importlib.reload(cotton_store)
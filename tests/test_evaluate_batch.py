@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+
+from cotton_core import RULES_DB, evaluate_soil, evaluate_soil_batch
+
+
+def boundary_values(thresholds):
+    """分级阈值本身及其两侧的取值"""
+    values = []
+    for threshold in thresholds:
+        values += [threshold - 0.01, threshold, threshold + 0.01]
+    return values + [0.0, thresholds[-1] * 10]
+
+
+def test_batch_matches_evaluate_soil_on_boundaries():
+    for item_name, (thresholds, _) in RULES_DB.items():
+        values = boundary_values(thresholds)
+        batch = evaluate_soil_batch(pd.DataFrame({item_name: values}))
+        for row, value in enumerate(values):
+            expected = evaluate_soil({item_name: value})[0]
+            assert batch[f"{item_name}_评估等级"].iloc[row] == expected["评估等级"]
+            assert batch[f"{item_name}_状态"].iloc[row] == expected["状态"]
+
+
+def test_batch_missing_values_and_unknown_columns():
+    samples = pd.DataFrame(
+        {"有机质 g/kg": [10.0, None, "abc", np.nan], "备注": ["a", "b", "c", "d"]},
+        index=[5, 6, 7, 8],
+    )
+    batch = evaluate_soil_batch(samples)
+    assert list(batch.columns) == ["有机质 g/kg_评估等级", "有机质 g/kg_状态"]
+    assert list(batch.index) == [5, 6, 7, 8]
+    assert batch["有机质 g/kg_评估等级"].tolist() == ["极低", None, None, None]
+    assert batch["有机质 g/kg_状态"].tolist() == ["缺乏", None, None, None]
@@ -0,0 +1,36 @@
+import pytest
+
+from cotton_core import FertilizerCalculator, evaluate_soil, generate_comprehensive_recommendations
+
+
+def amount(nutrient_name, value, fertilizer_type, area_mu=2):
+    info = FertilizerCalculator.calculate_deficiency(nutrient_name, value)
+    return FertilizerCalculator.calculate_fertilizer_amount(info, fertilizer_type, area_mu)
+
+
+@pytest.mark.parametrize("nutrient_name, value, fertilizer_type, expected", [
+    # 与改用预编译索引之前的计算结果一致
+    ("碱解氮 ppm", 20, "尿素", ("尿素含N 46.0%", 19.57, 67.08, 134.16, "35.0%")),
+    ("有效磷 ppm", 10, "过磷酸钙", ("过磷酸钙含P2O5 12.0%", 6.25, 31.25, 62.5, "20.0%")),
+    ("有机质 g/kg", 13, "有机肥", ("有机肥含有机质 45.0%", 1.0, 3.33, 6.67, "30.0%")),
+])
+def test_macronutrient_amounts_unchanged(nutrient_name, value, fertilizer_type, expected):
+    result = amount(nutrient_name, value, fertilizer_type)
+    assert (result["content"], result["theoretical_per_mu"], result["actual_per_mu"],
+            result["total_amount"], result["utilization_rate"]) == expected
+
+
+def test_micronutrient_uses_chemical_symbol():
+    result = amount("锌 Zn (mg/kg)", 0.2, "硫酸锌")
+    assert result["content"] == "硫酸锌含Zn 35.0%"
+    assert result["actual_per_mu"] == 4.11
+    assert FertilizerCalculator.NUTRIENT_INDEX["锌 Zn (mg/kg)"]["fertilizers"] == ("硫酸锌",)
+
+    results = evaluate_soil({"锌 Zn (mg/kg)": 0.2})
+    rec = generate_comprehensive_recommendations(results, "北疆", 2)[0]
+    assert [fert["fertilizer"] for fert in rec["通用计算建议"]["肥料用量"]] == ["硫酸锌"]
+
+
+def test_fertilizer_errors():
+    assert amount("碱解氮 ppm", 20, "氯化钾") == {"error": "肥料氯化钾不含所需养分N"}
+    assert amount("碱解氮 ppm", 20, "未知肥料") == {"error": "未知肥料类型"}
@@ -0,0 +1,116 @@
+import json
+import os
+
+import pytest
+
+import cotton_core
+from cotton_core import (
+    KNOWLEDGE_BASE_PATH,
+    REGION_PROFILES,
+    assess_sample,
+    assessment_cache_info,
+    current_knowledge_base,
+    evaluate_soil,
+    get_region_profile,
+    knowledge_base_error,
+    refresh_knowledge_base,
+    register_region_profile,
+    reload_knowledge_base,
+)
+
+OM = "有机质 g/kg"
+
+
+def read_kb():
+    with open(KNOWLEDGE_BASE_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_kb(path, data, mtime_ns):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+@pytest.fixture
+def kb_file(tmp_path, monkeypatch):
+    """使用临时知识库文件，测试结束后恢复仓库中的知识库"""
+    path = str(tmp_path / "kb.json")
+    write_kb(path, read_kb(), 10 ** 18)
+    reload_knowledge_base(path)
+    monkeypatch.setattr(cotton_core, "KNOWLEDGE_BASE_CHECK_INTERVAL", 0.0)
+    yield path
+    REGION_PROFILES.pop("测试区", None)
+    reload_knowledge_base(KNOWLEDGE_BASE_PATH)
+
+
+def test_refresh_swaps_in_new_version(kb_file):
+    old_profile = get_region_profile("南疆")
+    assert not refresh_knowledge_base()
+    data = read_kb()
+    data["version"] = "test.2"
+    data["regions"]["南疆"][OM]["thresholds"] = [5.0, 9.0, 11.0]
+    write_kb(kb_file, data, 2 * 10 ** 18)
+
+    assert refresh_knowledge_base()
+    assert current_knowledge_base().version == "test.2"
+    assert evaluate_soil({OM: 10.0}, "南疆")[0]["评估等级"] == "中"
+    # 已取得的旧区域标准继续使用原来的版本
+    assert evaluate_soil({OM: 10.0}, old_profile)[0]["评估等级"] == "低"
+    assert old_profile.kb is not current_knowledge_base()
+
+
+def test_invalid_file_keeps_current_version(kb_file):
+    version = current_knowledge_base().version
+    data = read_kb()
+    data["nutrients"][OM]["thresholds"] = [18.0, 15.0, 12.0]
+    write_kb(kb_file, data, 3 * 10 ** 18)
+
+    assert not refresh_knowledge_base()
+    assert "递增" in knowledge_base_error()
+    assert current_knowledge_base().version == version
+    with pytest.raises(ValueError):
+        reload_knowledge_base(kb_file)
+
+
+def test_custom_region_recompiled_on_reload(kb_file):
+    register_region_profile("测试区", {OM: {"thresholds": [5.0, 9.0, 11.0]}})
+    data = read_kb()
+    data["nutrients"][OM]["grades"] = ["很低", "偏低", "适中", "偏高"]
+    write_kb(kb_file, data, 4 * 10 ** 18)
+    reload_knowledge_base(kb_file)
+    profile = get_region_profile("测试区")
+    assert profile.kb is current_knowledge_base()
+    assert evaluate_soil({OM: 10.0}, profile)[0]["评估等级"] == "适中"
+
+
+def test_reload_releases_cached_assessments(kb_file):
+    # 评估缓存以 RegionProfile 为键，切换知识库后不再持有旧版本的区域标准
+    assess_sample({OM: 10.0}, "南疆")
+    assert assessment_cache_info().currsize > 0
+    data = read_kb()
+    data["version"] = "test.3"
+    write_kb(kb_file, data, 5 * 10 ** 18)
+    assert refresh_knowledge_base()
+    assert assessment_cache_info().currsize == 0
+
+    assess_sample({OM: 10.0}, "南疆")
+    reload_knowledge_base(kb_file)
+    assert assessment_cache_info().currsize == 0
+
+
+def test_rule_hashes_follow_stored_columns_only(kb_file):
+    # 利用率和缺乏程度系数不影响入库的等级、状态和缺乏量，修改后无需重算历史记录
+    hashes = dict(get_region_profile("南疆").rule_hashes)
+    data = read_kb()
+    data["utilization_rate"]["有机质"] = 0.5
+    data["grade_factor"]["极低"] = 1.5
+    write_kb(kb_file, data, 6 * 10 ** 18)
+    reload_knowledge_base(kb_file)
+    assert dict(get_region_profile("南疆").rule_hashes) == hashes
+
+    data["soil_conversion"] = 0.2
+    write_kb(kb_file, data, 7 * 10 ** 18)
+    reload_knowledge_base(kb_file)
+    changed = get_region_profile("南疆").rule_hashes
+    assert all(changed[item_name] != old_hash for item_name, old_hash in hashes.items())
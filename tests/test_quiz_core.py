@@ -0,0 +1,240 @@
+import json
+import os
+import random
+
+import pytest
+
+from quiz_core import (
+    _EMBED_PATTERN,
+    AnswerPool,
+    DistractorIndex,
+    QuestionBank,
+    answer_features,
+    embed_bank,
+    normalize_answer,
+    pick_distractors,
+    word_form,
+    write_distractors,
+)
+
+WORD_BANK = [{"answer": answer} for answer in [
+    "running", "jumping", "swimming", "quickly", "slowly", "happiness", "kindness",
+    "walked", "talked", "in spite of", "due to", "because of",
+]]
+
+# 同一个单词的大小写变体和拼写相近的其他单词
+VARIANT_BANK = [{"answer": answer} for answer in
+                ["range", "Range", "RANGE", "ranges", "orange", "rang", "arrange", "grange", "strange"]]
+
+
+def test_answer_pool_dedupes_in_order():
+    pool = AnswerPool([{"answer": a} for a in ["proof", "assume", "proof", "range", "assume"]])
+    assert pool.answers == ("proof", "assume", "range")
+    assert len(pool) == 3
+
+
+def test_sample_distractors_distinct_without_correct_answer():
+    pool = AnswerPool([{"answer": f"word{i}"} for i in range(100)])
+    rng = random.Random(0)
+    for _ in range(200):
+        chosen = pool.sample_distractors("word7", k=3, rng=rng)
+        assert len(set(chosen)) == 3
+        assert "word7" not in chosen
+
+
+def test_small_pool_returns_all_other_answers():
+    pool = AnswerPool([{"answer": a} for a in ["cat", "dog", "bird", "dog"]])
+    assert sorted(pool.sample_distractors("cat", k=3, rng=random.Random(1))) == ["bird", "dog"]
+    # 正确答案不在题库中时同样可用
+    assert sorted(pool.sample_distractors("fish", k=5, rng=random.Random(1))) == ["bird", "cat", "dog"]
+
+
+def test_build_options_contains_correct_answer():
+    pool = AnswerPool([{"answer": f"word{i}"} for i in range(20)])
+    options = pool.build_options("word3", rng=random.Random(2))
+    assert len(options) == 4 and len(set(options)) == 4
+    assert "word3" in options
+
+
+@pytest.mark.parametrize("word, form", [
+    ("running", "ing"), ("sing", "base"), ("walked", "ed"), ("red", "base"),
+    ("quickly", "ly"), ("cats", "s"), ("glass", "base"), ("status", "base"),
+])
+def test_word_form(word, form):
+    assert word_form(word) == form
+
+
+def test_answer_features():
+    words, form, pos, length, grams = answer_features("  Due   TO ")
+    assert (words, form, pos, length) == (2, "base", "prep", 6)
+    assert " du" in grams and "to " in grams
+    assert answer_features("happiness")[2] == "noun"
+    assert normalize_answer("  Due   TO ") == "due to"
+
+
+def test_neighbours_share_word_form():
+    index = DistractorIndex(WORD_BANK, top_k=2)
+    assert set(index.neighbours("running")) == {"jumping", "swimming"}
+    assert set(index.neighbours("quickly")) >= {"slowly"}
+    assert index.neighbours("due to")[0] == "because of"
+    # 不在题库中的答案也能查询，但不缓存
+    assert index.neighbours("walking")
+    assert len(index._neighbours) == 3
+
+
+def test_precompute_and_sample_from_neighbours():
+    index = DistractorIndex(WORD_BANK, top_k=4).precompute()
+    assert len(index._neighbours) == len(WORD_BANK)
+    rng = random.Random(3)
+    for answer in index.answers:
+        chosen = index.sample_distractors(answer, k=3, rng=rng)
+        assert len(set(chosen)) == 3 and answer not in chosen
+        assert set(chosen) <= set(index.neighbours(answer))
+
+
+def write_bank(path, answers):
+    with open(path, "w", encoding="utf-8") as f:
+        for answer in answers:
+            f.write(json.dumps({"question": f"_____ {answer}", "answer": answer}) + "\n")
+
+
+def test_question_bank_reads_by_index(tmp_path):
+    path = str(tmp_path / "bank.jsonl")
+    write_bank(path, ["a", "b", "c"])
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("\n")
+    bank = QuestionBank(path)
+    assert len(bank) == 3
+    assert bank[1]["answer"] == "b"
+    assert [question["answer"] for question in bank] == ["a", "b", "c"]
+    with pytest.raises(IndexError):
+        bank[3]
+    bank.close()
+
+    # 第二次打开时直接映射已保存的索引
+    bank = QuestionBank(path)
+    assert bank._mapping is not None and bank[2]["answer"] == "c"
+    bank.close()
+
+
+def test_question_bank_rebuilds_stale_index(tmp_path):
+    path = str(tmp_path / "bank.jsonl")
+    write_bank(path, ["a", "b"])
+    QuestionBank(path).close()
+    write_bank(path, ["a", "b", "longer"])
+    bank = QuestionBank(path)
+    assert len(bank) == 3 and bank[2]["answer"] == "longer"
+    bank.close()
+
+
+def test_shipped_bank_loads():
+    bank = QuestionBank()
+    assert len(bank) == 75
+    assert all(question["answer"] for question in bank)
+    bank.close()
+
+
+def test_embed_bank_replaces_fallback(tmp_path):
+    html_path = tmp_path / "page.html"
+    html_path.write_text("<script>\n    const FALLBACK_QUESTION_BANK = [\n        {}\n    ];\n</script>\n",
+                         encoding="utf-8")
+    assert embed_bank([{"answer": "a"}, {"answer": "é"}], str(html_path)) == 2
+    html = html_path.read_text(encoding="utf-8")
+    assert '{"answer": "a"},\n            {"answer": "é"}\n    ];' in html
+    plain_path = tmp_path / "plain.html"
+    plain_path.write_text("<p></p>", encoding="utf-8")
+    with pytest.raises(ValueError):
+        embed_bank([], str(plain_path))
+
+
+def test_neighbours_skip_case_variants():
+    index = DistractorIndex(VARIANT_BANK)
+    neighbours = index.neighbours("rang")
+    keys = [normalize_answer(answer) for answer in neighbours]
+    assert len(keys) == len(set(keys))
+    assert "rang" not in keys
+    assert "range" in keys
+
+
+def test_neighbours_exclude_variants_of_correct_answer():
+    index = DistractorIndex(VARIANT_BANK)
+    assert all(normalize_answer(answer) != "range" for answer in index.neighbours("Range"))
+
+
+def test_sample_distractors_distinct_ignoring_case():
+    index = DistractorIndex(VARIANT_BANK)
+    rng = random.Random(0)
+    for _ in range(200):
+        chosen = index.sample_distractors("rang", k=3, rng=rng)
+        keys = {normalize_answer(answer) for answer in chosen}
+        assert len(keys) == 3
+        assert "rang" not in keys
+
+
+def test_sample_distractors_fill_without_case_variants():
+    # 近邻不足时补足的答案也不能只差大小写
+    index = DistractorIndex([{"answer": a} for a in ["cat", "Dog", "DOG", "dog ", "bird"]], top_k=1)
+    rng = random.Random(1)
+    for _ in range(50):
+        chosen = index.sample_distractors("cat", k=3, rng=rng)
+        assert sorted(normalize_answer(answer) for answer in chosen) == ["bird", "dog"]
+
+
+def test_question_bank_refresh_reopens_in_place(tmp_path):
+    path = str(tmp_path / "bank.jsonl")
+    write_bank(path, ["a", "b"])
+    bank = QuestionBank(path)
+    old_file = bank._file
+    assert not bank.refresh()
+    write_bank(path, ["a", "b", "c"])
+    os.utime(path, ns=(0, 10 ** 9))
+    assert bank.refresh()
+    assert old_file.closed
+    assert len(bank) == 3
+    assert bank[2]["answer"] == "c"
+    bank.close()
+    assert bank._file is None
+    with pytest.raises(IndexError):
+        bank[0]
+
+
+def test_write_distractors_adds_field(tmp_path):
+    path = str(tmp_path / "bank.jsonl")
+    write_bank(path, ["range", "Range", "orange", "rang", "strange"])
+    bank = QuestionBank(path)
+    assert write_distractors(bank, top_k=3) == 5
+    assert len(bank) == 5
+    first = bank[0]
+    keys = [normalize_answer(answer) for answer in first["distractors"]]
+    assert len(keys) == len(set(keys)) == 3
+    assert "range" not in keys
+    bank.close()
+
+    # 调用方已关闭的题库：照常写入，不会被重新打开
+    assert write_distractors(bank, top_k=3) == 5
+    assert bank.closed and not bank.refresh()
+    with pytest.raises(IndexError):
+        bank[0]
+
+
+def test_embedded_fallback_matches_shipped_bank():
+    # 修改题库后运行 python quiz_core.py --distractors --embed 选词填空练习v5.html 同步网页版
+    html_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "选词填空练习v5.html")
+    with open(html_path, encoding="utf-8", newline="") as f:
+        embedded = json.loads("[" + _EMBED_PATTERN.search(f.read()).group(2) + "]")
+    bank = QuestionBank()
+    assert embedded == list(bank)
+    bank.close()
+
+
+def test_pick_distractors_skips_variants():
+    chosen = pick_distractors("Range", ["range", "RANGE", "orange", "Orange", "grange"], k=3, rng=random.Random(0))
+    assert sorted(normalize_answer(answer) for answer in chosen) == ["grange", "orange"]
+
+
+def test_embed_bank_keeps_crlf(tmp_path):
+    html_path = tmp_path / "page.html"
+    html_path.write_bytes(b"<script>\r\n    const FALLBACK_QUESTION_BANK = [\r\n        {}\r\n    ];\r\n</script>\r\n")
+    assert embed_bank([{"answer": "a"}, {"answer": "b"}], str(html_path)) == 2
+    data = html_path.read_bytes()
+    assert data.count(b"\n") == data.count(b"\r\n") == 6
@@ -0,0 +1,59 @@
+import os
+import time
+
+import pytest
+
+from quiz_core import QuestionBank
+
+pytest.importorskip("streamlit.testing.v1")
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+PAGE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "英语选词填空.py")
+
+
+@pytest.fixture
+def app():
+    app = AppTest.from_file(PAGE, default_timeout=60).run()
+    next(b for b in app.button if b.label == "📝 顺序").click().run()
+    assert not app.exception
+    return app
+
+
+def current_answer(app):
+    bank = QuestionBank()
+    try:
+        return bank[app.session_state["queue"][app.session_state["current_q_index"]]]["answer"]
+    finally:
+        bank.close()
+
+
+def click_option(app, answer):
+    next(b for b in app.button if b.label == f"🔘 {answer}").click().run()
+    assert not app.exception
+
+
+def test_correct_answer_schedules_auto_advance(app):
+    start = time.perf_counter()
+    click_option(app, current_answer(app))
+    # 答对后不在脚本中等待，只记下切题时间
+    assert time.perf_counter() - start < 1.0
+    assert app.session_state["answer_state"] == "correct"
+    assert app.session_state["advance_at"] > time.time()
+    assert app.session_state["current_q_index"] == 0
+
+    app.session_state["advance_at"] = time.time() - 1
+    app.run()
+    assert not app.exception
+    assert app.session_state["current_q_index"] == 1
+    assert app.session_state["answer_state"] == "unanswered"
+    assert app.session_state["advance_at"] is None
+
+
+def test_wrong_answer_waits_for_next_button(app):
+    answer = current_answer(app)
+    wrong = next(option for option in app.session_state["current_options"] if option != answer)
+    click_option(app, wrong)
+    assert app.session_state["answer_state"] == "wrong"
+    assert app.session_state["advance_at"] is None
+    next(b for b in app.button if b.label == "下一题 ➜").click().run()
+    assert app.session_state["current_q_index"] == 1
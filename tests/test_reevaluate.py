@@ -0,0 +1,57 @@
+import sqlite3
+
+import cotton_store
+from cotton_core import REGION_PROFILES, RegionProfile, assess_sample
+from cotton_store import SampleStore
+
+OM = "有机质 g/kg"
+ZN = "锌 Zn (mg/kg)"
+
+
+def save_samples(store):
+    for field_id, region, om in [("F-1", "南疆", 10.0), ("F-2", "南疆", 14.0), ("F-3", "北疆", 10.0)]:
+        assessment = assess_sample({OM: om, ZN: 0.4}, region, 2)
+        store.save(field_id, region, "2024-03-01", 2, assessment.results, assessment.recommendations)
+
+
+def om_grades(store):
+    return {field_id: store.field_trend(field_id, "有机质")[0]["grade"] for field_id in ("F-1", "F-2", "F-3")}
+
+
+def test_only_changed_items_get_new_hash():
+    base = REGION_PROFILES["南疆"]
+    changed = RegionProfile("南疆", {OM: {"thresholds": [12.0, 15.0, 18.0], "target_range": (12, 20)}})
+    assert changed.rule_hashes[OM] != base.rule_hashes[OM]
+    assert {item: h for item, h in changed.rule_hashes.items() if item != OM} == \
+        {item: h for item, h in base.rule_hashes.items() if item != OM}
+
+
+def test_reevaluate_only_stale_rows(tmp_path, monkeypatch):
+    with SampleStore(str(tmp_path / "samples.db")) as store:
+        save_samples(store)
+        assert store.reevaluate_stale() == {}
+        assert om_grades(store) == {"F-1": "低", "F-2": "中", "F-3": "极低"}
+
+        # 南疆有机质改用北疆的分级阈值
+        monkeypatch.setitem(REGION_PROFILES, "南疆", RegionProfile("南疆", {
+            OM: {"thresholds": [12.0, 15.0, 18.0], "target_range": (12, 20)}}))
+        assert store.reevaluate_stale() == {("南疆", OM): 2}
+        assert om_grades(store) == {"F-1": "极低", "F-2": "低", "F-3": "极低"}
+        assert store.reevaluate_stale() == {}
+
+
+def test_old_database_gets_rule_hash_column(tmp_path, capsys):
+    path = str(tmp_path / "old.db")
+    with SampleStore(path) as store:
+        save_samples(store)
+    # 模拟旧版数据库：去掉 rule_hash 列
+    conn = sqlite3.connect(path)
+    conn.execute("DROP INDEX idx_measurements_item_hash")
+    conn.execute("ALTER TABLE measurements DROP COLUMN rule_hash")
+    conn.commit()
+    conn.close()
+
+    assert cotton_store.main([path]) == 0
+    assert "完成：共更新 6 条记录" in capsys.readouterr().out
+    with SampleStore(path) as store:
+        assert store.reevaluate_stale() == {}
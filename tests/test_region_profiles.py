@@ -0,0 +1,64 @@
+import pandas as pd
+import pytest
+
+from cotton_core import (
+    REGION_PROFILES,
+    RegionProfile,
+    evaluate_soil,
+    evaluate_soil_batch,
+    generate_comprehensive_recommendations,
+    get_region_profile,
+    register_region_profile,
+)
+
+OM = "有机质 g/kg"
+
+
+def om_recommendation(region):
+    results = evaluate_soil({OM: 10.0}, region)
+    return results[0], generate_comprehensive_recommendations(results, region, 2)[0]
+
+
+def test_regions_do_not_leak_into_each_other():
+    north_before = om_recommendation("北疆")
+    south_result, south_rec = om_recommendation("南疆")
+    north_result, north_rec = om_recommendation("北疆")
+    assert (north_result, north_rec) == north_before
+    assert (north_result["评估等级"], north_rec["目标范围"]) == ("极低", "16-25")
+    assert (south_result["评估等级"], south_rec["目标范围"]) == ("低", "12-20")
+
+
+def test_batch_uses_region_rules():
+    batch = evaluate_soil_batch(pd.DataFrame({OM: [10.0]}), "南疆")
+    assert batch[f"{OM}_评估等级"].tolist() == ["低"]
+
+
+def test_profile_is_read_only():
+    profile = get_region_profile("南疆")
+    with pytest.raises(AttributeError):
+        profile.rules = {}
+    with pytest.raises(TypeError):
+        profile.rules[OM] = ((1.0, 2.0, 3.0), ("a", "b", "c", "d"))
+    assert get_region_profile(profile) is profile
+
+
+@pytest.mark.parametrize("overrides", [
+    {OM: {"thresholds": [8.0, 12.0]}},
+    {OM: {"thresholds": [16.0, 12.0, 8.0]}},
+    {OM: {"target_range": (20, 12)}},
+    {"未知项目": {"thresholds": [1.0]}},
+])
+def test_invalid_overrides_rejected(overrides):
+    with pytest.raises(ValueError):
+        RegionProfile("测试", overrides)
+
+
+def test_register_custom_region():
+    profile = register_region_profile("测试区", {OM: {"thresholds": [5.0, 9.0, 11.0], "target_range": (9, 15)}})
+    try:
+        assert get_region_profile("测试区") is profile
+        assert evaluate_soil({OM: 10.0}, "测试区")[0]["评估等级"] == "中"
+    finally:
+        REGION_PROFILES.pop("测试区")
+    with pytest.raises(ValueError):
+        get_region_profile("东疆")
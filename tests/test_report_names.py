@@ -0,0 +1,58 @@
+import os
+import zipfile
+
+import pandas as pd
+import pytest
+
+import cotton_cli
+from cotton_core import ReportArchive, report_name
+
+
+def test_report_name_dedupes_within_batch():
+    used = set()
+    names = [report_name(sample_id, used) for sample_id in ["A", "A", "a", "A_2", "A", "B:1", "B/1"]]
+    assert names == ["A", "A_2", "a_3", "A_2_2", "A_4", "B_1", "B_1_2"]
+    assert len({name.lower() for name in names}) == len(names)
+
+
+def duplicate_samples(path):
+    pd.DataFrame({
+        "样本编号": ["F-1", "F-1", "F-2", "F-1"],
+        "区域": ["北疆", "南疆", "北疆", "北疆"],
+        "有机质 g/kg": [8.0, 12.0, 15.0, 20.0],
+    }).to_csv(path, index=False)
+
+
+def test_run_batch_keeps_reports_of_duplicate_ids(tmp_path):
+    input_path = str(tmp_path / "samples.csv")
+    duplicate_samples(input_path)
+    output_dir = tmp_path / "out"
+    assert cotton_cli.run_batch(input_path, str(output_dir), id_column="样本编号") == 4
+    files = sorted(os.listdir(output_dir / "reports"))
+    assert files == ["F-1.txt", "F-1_2.txt", "F-1_3.txt", "F-2.txt"]
+    assert "南疆" in (output_dir / "reports" / "F-1_2.txt").read_text(encoding="utf-8")
+
+
+def zip_members(path):
+    with zipfile.ZipFile(path) as archive:
+        return sorted(archive.namelist())
+
+
+def test_report_archive_dedupes_members(tmp_path):
+    path = tmp_path / "reports.zip"
+    with ReportArchive(str(path)) as archive:
+        assert archive.add("F-1", "北疆", []) == "F-1.txt"
+        assert archive.add("F-1", "北疆", []) == "F-1_2.txt"
+        assert archive.add_file("f-1.txt", "x") == "f-1_3.txt"
+        assert archive.add_file("F-1.csv", "x") == "F-1.csv"
+    assert zip_members(path) == ["F-1.csv", "F-1.txt", "F-1_2.txt", "f-1_3.txt"]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_run_batch_zip_has_unique_members(tmp_path, workers):
+    input_path = str(tmp_path / "samples.csv")
+    duplicate_samples(input_path)
+    output_dir = tmp_path / "out"
+    cotton_cli.run_batch(input_path, str(output_dir), id_column="样本编号", zip_reports=True,
+                         workers=workers, parallel_chunk=1)
+    assert zip_members(output_dir / "reports.zip") == ["F-1.txt", "F-1_2.txt", "F-1_3.txt", "F-2.txt"]
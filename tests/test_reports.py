@@ -0,0 +1,85 @@
+import io
+import os
+import zipfile
+from datetime import datetime
+
+import pytest
+
+import cotton_cli
+from cotton_core import ReportArchive, assess_sample, render_report, report_name, summarize_assessment
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+GENERATED_AT = datetime(2024, 3, 1, 8, 0, 0)
+MEASUREMENTS = {"有机质 g/kg": 10.0, "碱解氮 ppm": 35.0, "速效钾 ppm": 260.0, "锌 Zn (mg/kg)": 0.4}
+
+
+def recommendations():
+    return assess_sample(MEASUREMENTS, "南疆", 20).recommendations
+
+
+def render(region="南疆", fmt="text"):
+    sink = io.StringIO()
+    render_report(sink, region, recommendations(), 20, fmt, generated_at=GENERATED_AT)
+    return sink.getvalue()
+
+
+def test_text_report_matches_previous_output():
+    # report_text.txt 为改用模板之前 export_comprehensive_advice 的输出
+    with open(os.path.join(DATA_DIR, "report_text.txt"), encoding="utf-8", newline="") as f:
+        assert render() == f.read()
+
+
+def test_report_is_streamed_in_fragments():
+    writes = []
+
+    class Sink:
+        def write(self, text):
+            writes.append(text)
+
+    render_report(Sink(), "南疆", recommendations(), 20, "markdown", generated_at=GENERATED_AT)
+    assert len(writes) > 10
+    assert "".join(writes) == render(fmt="markdown")
+    assert writes[0].startswith("# ")
+
+
+def test_html_escapes_fields():
+    report = render("<b>南疆</b>", "html")
+    assert "&lt;b&gt;南疆&lt;/b&gt;" in report
+    assert "<b>南疆" not in report
+    with pytest.raises(ValueError):
+        render(fmt="pdf")
+
+
+def test_report_name_sanitizes():
+    assert report_name("F/001 a") == "F_001_a"
+    assert report_name("..") == "sample"
+
+
+def test_summarize_assessment():
+    assessment = assess_sample(MEASUREMENTS, "南疆", 20)
+    row = summarize_assessment("F-1", "南疆", 20.0, assessment.results)
+    assert row == {"样本编号": "F-1", "区域": "南疆", "面积(亩)": 20.0, "检测项数": 4,
+                   "缺乏项数": 3, "丰富项数": 1, "缺乏养分": "有机质、碱解氮、锌"}
+
+
+def test_report_archive_streams_entries(tmp_path):
+    path = tmp_path / "reports.zip"
+    with ReportArchive(str(path), "markdown") as archive:
+        archive.add("F-1", "南疆", recommendations(), 20)
+        archive.add("F-2", "北疆", [], 1)
+        archive.add_file("汇总.csv", "样本编号\nF-1\nF-2\n")
+    with zipfile.ZipFile(path) as archive:
+        assert sorted(archive.namelist()) == ["F-1.md", "F-2.md", "汇总.csv"]
+        assert "南疆" in archive.read("F-1.md").decode("utf-8")
+
+
+def test_cli_html_reports_in_zip(tmp_path):
+    input_path = tmp_path / "samples.csv"
+    input_path.write_text("样本编号,区域,有机质 g/kg\nF-1,南疆,10\nF-2,北疆,20\n", encoding="utf-8")
+    output_dir = tmp_path / "out"
+    cotton_cli.main([str(input_path), "-o", str(output_dir), "--id-column", "样本编号",
+                     "--report-format", "html", "--zip"])
+    assert not (output_dir / "reports").exists()
+    with zipfile.ZipFile(output_dir / "reports.zip") as archive:
+        assert sorted(archive.namelist()) == ["F-1.html", "F-2.html"]
+        assert archive.read("F-1.html").decode("utf-8").startswith("<!DOCTYPE html>")
@@ -0,0 +1,79 @@
+import pytest
+
+from quiz_core import (
+    DAY_SECONDS,
+    QUALITY_CORRECT,
+    QUALITY_WRONG,
+    RELEARN_SECONDS,
+    STATUS_CORRECT,
+    STATUS_NEW,
+    STATUS_WRONG,
+    ReviewScheduler,
+)
+
+NOW = 1_000_000.0
+
+
+def test_due_orders_by_due_time():
+    scheduler = ReviewScheduler()
+    scheduler.review(3, QUALITY_CORRECT, now=NOW - 3 * DAY_SECONDS)  # 1 天后到期
+    scheduler.review(1, QUALITY_WRONG, now=NOW - 10)  # 1 分钟后到期，尚未到期
+    scheduler.review(7, QUALITY_WRONG, now=NOW - 2 * RELEARN_SECONDS)
+    scheduler.review(5, QUALITY_CORRECT, now=NOW - 2 * DAY_SECONDS)
+    assert scheduler.due(NOW) == [3, 5, 7]
+    assert scheduler.due(NOW, limit=2) == [3, 5]
+    assert scheduler.next_due(NOW) == 3
+    # 查询不改变堆中的记录
+    assert scheduler.due(NOW + RELEARN_SECONDS) == [3, 5, 7, 1]
+
+
+def test_review_again_replaces_old_heap_entry():
+    scheduler = ReviewScheduler()
+    scheduler.review(1, QUALITY_WRONG, now=NOW - DAY_SECONDS)
+    scheduler.review(2, QUALITY_WRONG, now=NOW - DAY_SECONDS + 1)
+    scheduler.review(1, QUALITY_CORRECT, now=NOW)
+    assert scheduler.due(NOW) == [2]
+    assert scheduler.next_due_time() == NOW - DAY_SECONDS + 1 + RELEARN_SECONDS
+
+
+def test_intervals_grow_and_counts_follow_status():
+    scheduler = ReviewScheduler()
+    intervals = [scheduler.review(1, QUALITY_CORRECT, now=NOW).interval for _ in range(4)]
+    assert intervals[:2] == [1, 6]
+    assert intervals[2] > 6 and intervals[3] > intervals[2]
+    scheduler.review(2, QUALITY_WRONG, now=NOW)
+    assert (scheduler.done_count, scheduler.correct_count, scheduler.wrong_count) == (2, 1, 1)
+    assert [scheduler.status(i) for i in (0, 1, 2)] == [STATUS_NEW, STATUS_CORRECT, STATUS_WRONG]
+
+
+def test_backup_round_trip_and_legacy_list():
+    scheduler = ReviewScheduler()
+    scheduler.review(0, QUALITY_CORRECT, now=NOW)
+    scheduler.review(2, QUALITY_WRONG, now=NOW)
+    restored = ReviewScheduler.from_backup(scheduler.to_backup(), bank_size=3, now=NOW)
+    assert restored.due(NOW + RELEARN_SECONDS) == [2]
+    legacy = ReviewScheduler.from_backup([1, 0, 2], bank_size=3, now=NOW)
+    assert legacy.due(NOW) == [2]
+    assert legacy.due(NOW + DAY_SECONDS) == [2, 0]
+    with pytest.raises(ValueError):
+        ReviewScheduler.from_backup([1, 0], bank_size=3)
+
+
+@pytest.mark.parametrize("record", [
+    [0, "2.5", 1, 1, 0, NOW, STATUS_CORRECT],  # 难度系数为字符串
+    [0, 0.5, 1, 1, 0, NOW, STATUS_CORRECT],  # 难度系数低于下限
+    [0, 2.5, -1, 1, 0, NOW, STATUS_CORRECT],  # 间隔为负
+    [0, 2.5, 1.5, 1, 0, NOW, STATUS_CORRECT],  # 间隔不是整数天
+    [0, 2.5, 1, None, 0, NOW, STATUS_CORRECT],
+    [0, 2.5, 1, 1, 0, "tomorrow", STATUS_CORRECT],
+    [0, 2.5, 1, 1, 0, float("inf"), STATUS_CORRECT],
+    [True, 2.5, 1, 1, 0, NOW, STATUS_CORRECT],
+    [0, 2.5, 1, 1, 0, NOW, STATUS_NEW],
+    [0, 2.5, 1, 1, 0, NOW],
+    "0,2.5,1",
+])
+def test_backup_rejects_invalid_card_fields(record):
+    with pytest.raises(ValueError, match="无效的复习记录"):
+        ReviewScheduler.from_backup({"version": 2, "cards": [record]}, bank_size=3)
+    with pytest.raises(ValueError):
+        ReviewScheduler.from_backup({"version": 2, "cards": {"0": record}}, bank_size=3)